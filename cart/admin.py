@@ -11,18 +11,22 @@ class CartItemInline(admin.TabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ["user", "get_total_items", "get_total", "created_at", "updated_at"]
+    list_display = ["user", "item_count", "get_total", "created_at", "updated_at"]
     list_filter = ["created_at", "updated_at"]
     search_fields = ["user__email"]
     inlines = [CartItemInline]
-    readonly_fields = ["created_at", "updated_at"]
+    readonly_fields = ["item_count", "subtotal", "version", "created_at", "updated_at"]
+    list_select_related = ["user"]
 
-    def get_total_items(self, obj):
-        return obj.get_total_items()
-    get_total_items.short_description = "Items"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline edits bypass the cart views that keep the totals current.
+        form.instance.refresh_totals()
 
     def get_total(self, obj):
-        return f"${obj.get_total():.2f}"
+        if obj.subtotal is None:
+            return "Repriced on next view"
+        return f"${obj.subtotal:.2f}"
     get_total.short_description = "Total"
 
 
@@ -31,6 +35,26 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ["cart", "product", "quantity", "get_subtotal", "created_at"]
     list_filter = ["created_at"]
     search_fields = ["cart__user__email", "product__name"]
+    list_select_related = ["cart__user", "product"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("variations")
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.cart.refresh_totals()
+
+    def delete_model(self, request, obj):
+        obj._totals_applied = True
+        super().delete_model(request, obj)
+        obj.cart.refresh_totals()
+
+    def delete_queryset(self, request, queryset):
+        carts = list(Cart.objects.filter(pk__in=queryset.values("cart")))
+        queryset._totals_applied = True
+        super().delete_queryset(request, queryset)
+        for cart in carts:
+            cart.refresh_totals()
 
     def get_subtotal(self, obj):
         return f"${obj.get_subtotal():.2f}"
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def seed_totals(apps, schema_editor):
+    """Count existing items; leave subtotals to be priced on first read."""
+    Cart = apps.get_model("cart", "Cart")
+    CartItem = apps.get_model("cart", "CartItem")
+    quantities = (
+        CartItem.objects.filter(cart=OuterRef("pk"))
+        .values("cart")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    Cart.objects.update(item_count=Coalesce(Subquery(quantities), 0))
+    Cart.objects.filter(item_count__gt=0).update(subtotal=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="subtotal",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(seed_totals, migrations.RunPython.noop),
+    ]
@@ -1,34 +1,102 @@
 from django.db import models
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
 from store.models import Product, ProductVariation
 
 
+class CartQuerySet(models.QuerySet):
+    def mark_stale(self):
+        """Set the stored subtotal to NULL so totals are recomputed on the next read."""
+        return self.update(subtotal=None, version=F("version") + 1, updated_at=timezone.now())
+
+    def invalidate_subtotals(self, product_ids=(), variation_ids=()):
+        """Mark stored subtotals stale for carts holding changed products or variations.
+
+        The subtotal is recomputed the next time it is read.
+        """
+        lookups = models.Q(items__product_id__in=list(product_ids))
+        lookups |= models.Q(items__variations__in=list(variation_ids))
+        cart_ids = self.filter(lookups).values("pk")
+        return Cart.objects.filter(pk__in=cart_ids).mark_stale()
+
+
 class Cart(models.Model):
-    """Cart model for authenticated users."""
+    """Cart model for authenticated users.
+
+    ``item_count`` and ``subtotal`` are running totals the cart views keep
+    up to date with ``F()`` updates, so the badge reads them from one row.
+    ``subtotal`` is NULL after a price change or a deletion made elsewhere
+    until both totals are recomputed, and ``version`` moves on every change.
+    """
     
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="cart"
     )
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0, null=True)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         """Return a label for the cart owner."""
         return f"Cart for {self.user.email}"
 
+    def summary(self, cards=False):
+        """Return priced lines, item count and total from one prefetch."""
+        from .summary import summarize
+
+        return summarize(self, cards)
+
     def get_total(self):
         """Calculate total cart value."""
-        return sum(item.get_subtotal() for item in self.items.all())
+        return self.summary().total
 
     def get_total_items(self):
         """Get total number of items in cart."""
-        return sum(item.quantity for item in self.items.all())
+        if "items" in getattr(self, "_prefetched_objects_cache", {}):
+            return sum(item.quantity for item in self.items.all())
+        return self.items.aggregate(count=Sum("quantity"))["count"] or 0
+
+    def apply_change(self, count_delta, subtotal_delta):
+        """Move the running totals by a line change in one atomic UPDATE."""
+        Cart.objects.filter(pk=self.pk).update(
+            # Clamped so drift from rows changed outside the views cannot break
+            # the positive-integer constraint.
+            item_count=Greatest(F("item_count") + count_delta, Value(0)),
+            subtotal=F("subtotal") + subtotal_delta,
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+
+    def refresh_totals(self):
+        """Recompute the running totals from the items and store them."""
+        summary = self.summary()
+        Cart.objects.filter(pk=self.pk).update(
+            item_count=summary.item_count,
+            subtotal=summary.total,
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+        self.item_count, self.subtotal = summary.item_count, summary.total
+        return summary
 
     def clear(self):
         """Clear all items from cart."""
-        self.items.all().delete()
+        items = self.items.all()
+        items._totals_applied = True
+        items.delete()
+        Cart.objects.filter(pk=self.pk).update(
+            item_count=0, subtotal=0, version=F("version") + 1, updated_at=timezone.now()
+        )
 
 
 class CartItem(models.Model):
@@ -50,14 +118,7 @@ class CartItem(models.Model):
 
     def get_subtotal(self):
         """Calculate subtotal for this item including variations."""
-        base_price = self.product.price
-
-        variation_adjustment = sum(
-            variation.price_adjustment for variation in self.variations.all()
-        )
-
-        item_price = base_price + variation_adjustment
-        return item_price * self.quantity
+        return self.get_item_price() * self.quantity
 
     def get_item_price(self):
         """Get single item price including variations."""
@@ -66,3 +127,49 @@ class CartItem(models.Model):
             variation.price_adjustment for variation in self.variations.all()
         )
         return base_price + variation_adjustment
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductVariation)
+def invalidate_subtotals_on_price_change(sender, instance, created, raw=False, **kwargs):
+    """Mark carts stale when a saved product or variation has a new price."""
+    if raw or created:
+        return
+    field = "price" if sender is Product else "price_adjustment"
+    loaded = instance.__dict__.get(f"_loaded_{field}")
+    price = getattr(instance, field)
+    setattr(instance, f"_loaded_{field}", price)
+    if loaded is not None and loaded == price:
+        return
+    if sender is Product:
+        Cart.objects.invalidate_subtotals(product_ids=[instance.pk])
+    else:
+        Cart.objects.invalidate_subtotals(variation_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=ProductVariation)
+def invalidate_subtotals_on_delete(sender, instance, **kwargs):
+    """Deleting a product drops its cart lines, a variation its price adjustment.
+
+    Runs before the delete so the carts can still be found.
+    """
+    if sender is Product:
+        Cart.objects.invalidate_subtotals(product_ids=[instance.pk])
+    else:
+        Cart.objects.invalidate_subtotals(variation_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=CartItem)
+def invalidate_totals_on_item_delete(sender, instance, origin=None, **kwargs):
+    """Mark the cart stale when a line is deleted outside the cart views.
+
+    The views, ``Cart.clear`` and the admin set ``_totals_applied`` on what
+    they delete because they update the totals themselves. Cascades from a
+    product delete are covered by ``invalidate_subtotals_on_delete``.
+    """
+    if getattr(origin, "_totals_applied", False):
+        return
+    if getattr(origin, "model", type(origin)) is not CartItem:
+        return
+    Cart.objects.filter(pk=instance.cart_id).mark_stale()
@@ -0,0 +1,120 @@
+"""Cart lines and totals computed from one prefetch instead of per-line queries.
+
+``summarize`` loads a cart's items with their products and variations in a
+fixed number of queries and does the pricing in memory, so line prices,
+subtotals, the item count and the grand total all come from the same pass
+whatever the size of the cart. ``summarize_session`` does the same for a
+guest cart kept in the session, with one ``in_bulk`` per model.
+
+``stored_totals`` reads the badge numbers from the running totals on the
+``Cart`` row instead, pricing the cart only when a price change has left
+the stored subtotal stale.
+"""
+from decimal import Decimal
+
+from django.db.models import Prefetch
+
+from store.models import Product, ProductVariation
+
+from .models import CartItem
+
+
+class CartLine:
+    """One priced cart line; ``variations`` is a list, not a manager."""
+
+    def __init__(self, product, quantity, variations=(), id=0, item_key=""):
+        self.id = id
+        self.product = product
+        self.quantity = quantity
+        self.variations = list(variations)
+        self.item_key = item_key
+        self.item_price = product.price + sum(
+            (variation.price_adjustment for variation in self.variations), Decimal("0")
+        )
+        self.subtotal = self.item_price * quantity
+
+    @property
+    def variation_ids(self):
+        return [variation.pk for variation in self.variations]
+
+
+class CartSummary:
+    """Priced lines with the cart's item count and total."""
+
+    def __init__(self, lines=()):
+        self.lines = list(lines)
+        self.item_count = sum(line.quantity for line in self.lines)
+        self.total = sum((line.subtotal for line in self.lines), Decimal("0"))
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+def line_queryset(cards=False):
+    """Cart items with what pricing needs; ``cards`` adds product card images."""
+    items = CartItem.objects.order_by("created_at", "id").prefetch_related("variations")
+    if cards:
+        return items.prefetch_related(Prefetch("product", queryset=Product.objects.for_cards()))
+    return items.select_related("product")
+
+
+def summarize(cart, cards=False):
+    """Return the ``CartSummary`` of a saved cart.
+
+    Uses an ``items`` prefetch already on the cart (e.g. from an admin
+    changelist) instead of querying again.
+    """
+    if "items" in getattr(cart, "_prefetched_objects_cache", {}):
+        items = cart.items.all()
+    else:
+        items = line_queryset(cards).filter(cart=cart)
+    return CartSummary(
+        CartLine(item.product, item.quantity, item.variations.all(), id=item.pk) for item in items
+    )
+
+
+def summarize_session(session_cart, cards=False):
+    """Return the ``CartSummary`` of a guest cart stored in the session.
+
+    Lines whose product no longer exists are skipped, as are unknown
+    variation ids.
+    """
+    products = Product.objects.all()
+    if cards:
+        products = products.for_cards()
+    products = products.in_bulk({int(data["product_id"]) for data in session_cart.values()})
+    variations = ProductVariation.objects.in_bulk({
+        int(variation_id)
+        for data in session_cart.values()
+        for variation_id in data.get("variation_ids") or []
+    })
+    lines = []
+    for item_key, data in session_cart.items():
+        product = products.get(int(data["product_id"]))
+        if product is None:
+            continue
+        lines.append(CartLine(
+            product,
+            data["quantity"],
+            [variations[int(pk)] for pk in data.get("variation_ids") or [] if int(pk) in variations],
+            item_key=item_key,
+        ))
+    return CartSummary(lines)
+
+
+def stored_totals(user_id):
+    """Return ``{"count", "total"}`` of a user's cart from its stored columns."""
+    from .models import Cart
+
+    cart = Cart.objects.filter(user_id=user_id).only("item_count", "subtotal").first()
+    if cart is None:
+        return {"count": 0, "total": Decimal("0")}
+    if cart.subtotal is None:
+        cart.refresh_totals()
+    return {"count": cart.item_count, "total": cart.subtotal}
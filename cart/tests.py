@@ -1,7 +1,241 @@
-from django.test import TestCase
+from decimal import Decimal
 
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-class CartTests(TestCase):
-    """Placeholder cart test suite."""
+from core.context_processors import cart_context
+from store.models import Product, ProductVariation
 
-    pass
+from .models import Cart, CartItem
+from .summary import stored_totals, summarize_session
+from .utils import merge_carts
+
+User = get_user_model()
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="shopper@example.com", password="password123")
+        self.cart = Cart.objects.create(user=self.user)
+
+    def _add_lines(self, count):
+        start = self.cart.items.count()
+        for index in range(start, start + count):
+            product = Product.objects.create(
+                name=f"Chair {index}", description="Chair", price=Decimal("50.00"), stock=10
+            )
+            variation = ProductVariation.objects.create(
+                product=product, variation_type="color", name=f"Oak {index}", price_adjustment=Decimal("5.00")
+            )
+            item = CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+            item.variations.add(variation)
+
+    def test_summary_prices_every_line_in_two_queries(self):
+        self._add_lines(20)
+
+        with self.assertNumQueries(2):
+            summary = self.cart.summary()
+            lines = list(summary)
+
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(lines[0].item_price, Decimal("55.00"))
+        self.assertEqual(lines[0].subtotal, Decimal("110.00"))
+        self.assertEqual(summary.item_count, 40)
+        self.assertEqual(summary.total, Decimal("2200.00"))
+        self.assertEqual(self.cart.get_total(), summary.total)
+        self.assertEqual(self.cart.get_total_items(), 40)
+
+    def test_cart_page_queries_do_not_grow_with_lines(self):
+        self.client.force_login(self.user)
+        self._add_lines(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("cart:view"))
+        self._add_lines(10)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse("cart:view"))
+
+        self.assertEqual(len(large), len(small))
+        self.assertContains(response, "Variations: Oak 11")
+        self.assertEqual(response.context["cart_count"], 24)
+        self.assertEqual(response.context["total"], Decimal("1320.00"))
+
+
+class SessionCartTests(TestCase):
+    def _session_cart(self, count, start=0):
+        cart = {}
+        for index in range(start, start + count):
+            product = Product.objects.create(
+                name=f"Lamp {index}", description="Lamp", price=Decimal("20.00"), stock=10
+            )
+            variation = ProductVariation.objects.create(
+                product=product, variation_type="size", name=f"Tall {index}", price_adjustment=Decimal("2.50")
+            )
+            cart[f"{product.pk}_{variation.pk}"] = {
+                "product_id": product.pk,
+                "quantity": 2,
+                "variation_ids": [variation.pk],
+            }
+        return cart
+
+    def test_hydrates_all_lines_with_one_query_per_model(self):
+        cart = self._session_cart(15)
+        cart["999999"] = {"product_id": 999999, "quantity": 1, "variation_ids": []}
+
+        with self.assertNumQueries(2):
+            summary = summarize_session(cart)
+
+        self.assertEqual(len(summary), 15)
+        self.assertEqual(summary.lines[0].item_price, Decimal("22.50"))
+        self.assertEqual(summary.item_count, 30)
+        self.assertEqual(summary.total, Decimal("675.00"))
+
+    def test_cart_page_queries_do_not_grow_with_lines(self):
+        session = self.client.session
+        session["cart"] = self._session_cart(2)
+        session.save()
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("cart:view"))
+
+        session["cart"].update(self._session_cart(10, start=2))
+        session.save()
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse("cart:view"))
+
+        self.assertEqual(len(large), len(small))
+        self.assertContains(response, "Variations: Tall 11")
+        self.assertEqual(response.context["total"], Decimal("540.00"))
+
+    def _merge(self, session_cart):
+        user = User.objects.get_or_create(email="merge@example.com")[0]
+        request = RequestFactory().post("/")
+        request.session = self.client.session
+        request.session["cart"] = session_cart
+        with CaptureQueriesContext(connection) as queries:
+            merge_carts(request, user)
+        self.assertEqual(request.session["cart"], {})
+        return Cart.objects.get(user=user), len(queries)
+
+    def test_login_merge_queries_do_not_grow_with_lines(self):
+        self._merge(self._session_cart(2))
+        kept = CartItem.objects.first()
+        repeat = {str(kept.product_id): {"product_id": kept.product_id, "quantity": 1}}
+        _cart, small = self._merge({**self._session_cart(1, start=2), **repeat})
+        cart, large = self._merge({**self._session_cart(10, start=3), **repeat})
+
+        self.assertEqual(large, small)
+        self.assertEqual(cart.items.count(), 13)
+        self.assertEqual(CartItem.objects.get(pk=kept.pk).quantity, 4)
+        self.assertEqual((cart.item_count, cart.subtotal), (28, Decimal("630.00")))
+        self.assertEqual(cart.subtotal, cart.summary().total)
+
+
+class CartContextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="badge@example.com", password="password123")
+        self.sofa = Product.objects.create(name="Sofa", description="Sofa", price=Decimal("300.00"), stock=5)
+
+    def _request(self, user=None):
+        request = RequestFactory().get("/")
+        request.user = user or self.user
+        request.session = {}
+        return request
+
+    def test_nothing_runs_until_the_badge_is_read(self):
+        with self.assertNumQueries(0):
+            context = cart_context(self._request())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(int(context["cart_count"]), 0)
+            self.assertEqual(context["cart_total"], 0)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_badge_reads_the_stored_totals(self):
+        cart = Cart.objects.create(user=self.user, item_count=3, subtotal=Decimal("900.00"))
+        CartItem.objects.create(cart=cart, product=self.sofa, quantity=3)
+
+        with self.assertNumQueries(1):
+            context = cart_context(self._request())
+            self.assertEqual(int(context["cart_count"]), 3)
+            self.assertEqual(context["cart_total"], Decimal("900.00"))
+
+        self.sofa.price = Decimal("250.00")
+        self.sofa.save()
+        cart.refresh_from_db()
+        self.assertIsNone(cart.subtotal)
+        self.assertEqual(cart_context(self._request())["cart_total"], Decimal("750.00"))
+        cart.refresh_from_db()
+        self.assertEqual(cart.subtotal, Decimal("750.00"))
+
+    def test_guest_count_needs_no_queries(self):
+        request = self._request(AnonymousUser())
+        request.session = {"cart": {str(self.sofa.pk): {"product_id": self.sofa.pk, "quantity": 2}}}
+        with self.assertNumQueries(0):
+            self.assertEqual(int(cart_context(request)["cart_count"]), 2)
+
+
+class RunningTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="totals@example.com", password="password123")
+        self.client.force_login(self.user)
+        self.desk = Product.objects.create(name="Desk", description="Desk", price=Decimal("120.00"), stock=10)
+        self.walnut = ProductVariation.objects.create(
+            product=self.desk, variation_type="color", name="Walnut", price_adjustment=Decimal("15.00")
+        )
+
+    def _totals(self):
+        cart = Cart.objects.get(user=self.user)
+        return cart.item_count, cart.subtotal
+
+    def test_views_keep_the_stored_totals_in_step(self):
+        url = reverse("cart:add", args=[self.desk.pk])
+        self.client.post(url, {"quantity": 2})
+        self.assertEqual(self._totals(), (2, Decimal("240.00")))
+
+        self.client.post(url, {"quantity": 1, "variations": [self.walnut.pk]})
+        self.assertEqual(self._totals(), (3, Decimal("405.00")))
+
+        item = CartItem.objects.get(cart__user=self.user)
+        self.client.post(reverse("cart:update", args=[item.pk]), {"quantity": 1})
+        self.assertEqual(self._totals(), (1, Decimal("135.00")))
+
+        self.client.post(reverse("cart:remove", args=[item.pk]))
+        self.assertEqual(self._totals(), (0, Decimal("0.00")))
+
+    def test_price_change_marks_holding_carts_stale(self):
+        self.client.post(reverse("cart:add", args=[self.desk.pk]), {"quantity": 2, "variations": [self.walnut.pk]})
+        other = Cart.objects.create(user=User.objects.create_user(email="other@example.com", password="password123"))
+
+        self.walnut.price_adjustment = Decimal("30.00")
+        self.walnut.save()
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertIsNone(cart.subtotal)
+        other.refresh_from_db()
+        self.assertEqual(other.subtotal, Decimal("0.00"))
+        self.assertEqual(self.client.get(reverse("cart:view")).context["total"], Decimal("300.00"))
+
+    def test_non_price_saves_keep_the_stored_subtotal(self):
+        self.client.post(reverse("cart:add", args=[self.desk.pk]), {"quantity": 1})
+        desk = Product.objects.get(pk=self.desk.pk)
+        desk.description = "Solid desk"
+        desk.save()
+        self.assertEqual(self._totals(), (1, Decimal("120.00")))
+
+    def test_deletes_outside_the_views_mark_carts_stale(self):
+        lamp = Product.objects.create(name="Lamp", description="Lamp", price=Decimal("40.00"), stock=10)
+        self.client.post(reverse("cart:add", args=[self.desk.pk]), {"quantity": 1, "variations": [self.walnut.pk]})
+        self.client.post(reverse("cart:add", args=[lamp.pk]), {"quantity": 2})
+        self.assertEqual(self._totals(), (3, Decimal("215.00")))
+
+        lamp.delete()
+        self.assertEqual(stored_totals(self.user.pk), {"count": 1, "total": Decimal("135.00")})
+
+        self.walnut.delete()
+        self.assertEqual(stored_totals(self.user.pk), {"count": 1, "total": Decimal("120.00")})
+
+        CartItem.objects.filter(cart__user=self.user).delete()
+        self.assertEqual(stored_totals(self.user.pk), {"count": 0, "total": Decimal("0")})
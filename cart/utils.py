@@ -1,4 +1,6 @@
 from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
 from .models import Cart, CartItem
 from store.models import Product, ProductVariation
 
@@ -71,26 +73,33 @@ def remove_from_session_cart(request, product_id, variation_ids=None):
 
 def get_session_cart_total(request):
     """Calculate total for session cart."""
-    cart = get_session_cart(request)
-    total = 0
-    
-    for item_data in cart.values():
-        try:
-            product = Product.objects.get(id=item_data["product_id"])
-            quantity = item_data["quantity"]
-            price = product.price
-
-            if item_data.get("variation_ids"):
-                variations = ProductVariation.objects.filter(
-                    id__in=item_data["variation_ids"]
-                )
-                price += sum(v.price_adjustment for v in variations)
-            
-            total += price * quantity
-        except Product.DoesNotExist:
-            continue
-    
-    return total
+    return get_session_cart_summary(request).total
+
+
+def get_session_cart_summary(request, cards=False):
+    """Priced lines, item count and total of the session cart."""
+    from .summary import summarize_session
+
+    return summarize_session(get_session_cart(request), cards)
+
+
+def get_cart_totals(request):
+    """Return the cart's ``{"count", "total"}``, memoized on the request.
+
+    Logged-in users' totals are the running totals stored on their cart;
+    guest totals are priced from the session.
+    """
+    totals = getattr(request, "_cart_totals", None)
+    if totals is None:
+        if request.user.is_authenticated:
+            from .summary import stored_totals
+
+            totals = stored_totals(request.user.pk)
+        else:
+            summary = get_session_cart_summary(request)
+            totals = {"count": summary.item_count, "total": summary.total}
+        request._cart_totals = totals
+    return totals
 
 
 def get_session_cart_count(request):
@@ -100,38 +109,79 @@ def get_session_cart_count(request):
 
 
 def merge_carts(request, user):
-    """Merge session cart into user cart on login."""
+    """Merge session cart into user cart on login.
+
+    Runs a fixed number of queries whatever the size of the guest cart:
+    products, variations and the user's existing lines are loaded once,
+    new lines are bulk created, quantities bulk updated and the cart
+    totals moved by one ``F()`` update. A product in several session lines
+    (different variations) becomes one line carrying the last variations
+    chosen, as the cart holds one line per product.
+    """
+    from .summary import CartLine
+
     session_cart = get_session_cart(request)
     
     if not session_cart:
         return
     
-    cart, created = Cart.objects.get_or_create(user=user)
-    
+    merged = {}
     for item_data in session_cart.values():
-        try:
-            product = Product.objects.get(id=item_data["product_id"])
-            quantity = item_data["quantity"]
-            variation_ids = item_data.get("variation_ids", [])
-
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-            )
-
-            if not created:
-                cart_item.quantity += quantity
+        product_id = int(item_data["product_id"])
+        quantity, variation_ids = merged.get(product_id, (0, []))
+        merged[product_id] = (
+            quantity + item_data["quantity"],
+            [int(pk) for pk in item_data.get("variation_ids") or []] or variation_ids,
+        )
+    products = Product.objects.in_bulk(merged)
+    variations = ProductVariation.objects.in_bulk({
+        pk for _quantity, variation_ids in merged.values() for pk in variation_ids
+    })
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        existing = {
+            item.product_id: item
+            for item in CartItem.objects.select_for_update()
+            .filter(cart=cart, product_id__in=products)
+            .prefetch_related("variations")
+        }
+        now = timezone.now()
+        to_create, to_update, chosen = [], [], {}
+        count_delta, subtotal_delta = 0, 0
+        for product_id, (quantity, variation_ids) in merged.items():
+            product = products.get(product_id)
+            if product is None:
+                continue
+            item = existing.get(product_id)
+            if item is None:
+                item = CartItem(cart=cart, product=product, quantity=quantity)
+                to_create.append(item)
+                current = []
             else:
-                cart_item.quantity = quantity
-
-            cart_item.save()
-
+                current = list(item.variations.all())
+                subtotal_delta -= CartLine(product, item.quantity, current).subtotal
+                item.quantity += quantity
+                item.updated_at = now
+                to_update.append(item)
             if variation_ids:
-                variations = ProductVariation.objects.filter(id__in=variation_ids)
-                cart_item.variations.set(variations)
-        
-        except Product.DoesNotExist:
-            continue
+                current = [variations[pk] for pk in variation_ids if pk in variations]
+                chosen[product_id] = current
+            count_delta += quantity
+            subtotal_delta += CartLine(product, item.quantity, current).subtotal
+
+        CartItem.objects.bulk_create(to_create)
+        CartItem.objects.bulk_update(to_update, ["quantity", "updated_at"])
+        if chosen:
+            Through = CartItem.variations.through
+            items = {item.product_id: item for item in to_create + to_update}
+            Through.objects.filter(cartitem__in=[items[pk].pk for pk in chosen]).delete()
+            Through.objects.bulk_create([
+                Through(cartitem_id=items[product_id].pk, productvariation_id=variation.pk)
+                for product_id, selected in chosen.items()
+                for variation in selected
+            ])
+        cart.apply_change(count_delta, subtotal_delta)
 
     request.session["cart"] = {}
     request.session.modified = True
@@ -3,19 +3,28 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from store.models import Product, ProductVariation
 from .models import Cart, CartItem
 from .utils import (
     get_cart,
+    get_cart_totals,
     get_session_cart,
     add_to_session_cart,
     update_session_cart_item,
     remove_from_session_cart,
-    get_session_cart_total,
+    get_session_cart_summary,
     get_session_cart_count,
 )
 
 
+def _locked_items():
+    """Cart items locked for a quantity change, with what pricing the line needs."""
+    return CartItem.objects.select_for_update().select_related("cart", "product").prefetch_related("variations")
+
+
 @require_http_methods(["POST"])
 def add_to_cart(request, product_id):
     """Add product to cart."""
@@ -25,30 +34,40 @@ def add_to_cart(request, product_id):
     
     if variation_ids:
         variation_ids = [int(vid) for vid in variation_ids]
-        variations = ProductVariation.objects.filter(id__in=variation_ids, is_active=True)
-        if variations.count() != len(variation_ids):
+        variations = list(ProductVariation.objects.filter(id__in=variation_ids, is_active=True))
+        if len(variations) != len(variation_ids):
             messages.error(request, "Invalid product variation selected.")
             return redirect("store:product_detail", slug=product.slug)
     else:
         variations = []
     
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_item, item_created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-        )
-        
-        if not item_created:
-            cart_item.quantity += quantity
-        else:
-            cart_item.quantity = quantity
-        
-        cart_item.save()
-        
-        if variations:
-            cart_item.variations.set(variations)
-        
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(user=request.user)
+            cart_item = (
+                CartItem.objects.select_for_update()
+                .prefetch_related("variations")
+                .filter(cart=cart, product=product)
+                .first()
+            )
+            if cart_item is None:
+                cart_item = CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+                old_subtotal = 0
+                price = product.price
+            else:
+                cart_item.product = product
+                old_subtotal = cart_item.get_subtotal()
+                price = cart_item.get_item_price()
+                CartItem.objects.filter(pk=cart_item.pk).update(
+                    quantity=F("quantity") + quantity, updated_at=timezone.now()
+                )
+                cart_item.quantity += quantity
+
+            if variations:
+                cart_item.variations.set(variations)
+                price = product.price + sum(variation.price_adjustment for variation in variations)
+            cart.apply_change(quantity, price * cart_item.quantity - old_subtotal)
+
         messages.success(request, f"{product.name} added to cart!")
     else:
         add_to_session_cart(request, product_id, quantity, variation_ids)
@@ -58,7 +77,7 @@ def add_to_cart(request, product_id):
         return JsonResponse({
             "success": True,
             "message": f"{product.name} added to cart!",
-            "cart_count": get_session_cart_count(request) if not request.user.is_authenticated else cart.get_total_items(),
+            "cart_count": get_session_cart_count(request) if not request.user.is_authenticated else get_cart_totals(request)["count"],
         })
     
     return redirect("cart:view")
@@ -74,14 +93,20 @@ def update_cart_item(request, item_id):
         quantity = 1
 
     if request.user.is_authenticated:
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-        old_quantity = cart_item.quantity
-        if quantity > 0:
-            cart_item.quantity = quantity
-            cart_item.save()
+        with transaction.atomic():
+            cart_item = get_object_or_404(_locked_items(), id=item_id, cart__user=request.user)
+            old_quantity = cart_item.quantity
+            item_price = cart_item.get_item_price()
+            if quantity > 0:
+                CartItem.objects.filter(pk=cart_item.pk).update(quantity=quantity, updated_at=timezone.now())
+            else:
+                cart_item._totals_applied = True
+                cart_item.delete()
+                quantity = 0
+            cart_item.cart.apply_change(quantity - old_quantity, (quantity - old_quantity) * item_price)
+        if quantity:
             messages.success(request, f"Cart updated! Quantity changed from {old_quantity} to {quantity}.")
         else:
-            cart_item.delete()
             messages.success(request, "Item removed from cart!")
     else:
         product_id = request.POST.get("product_id")
@@ -102,8 +127,12 @@ def remove_from_cart(request, item_id):
     """Remove item from cart."""
     if request.user.is_authenticated:
         if item_id > 0:
-            cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-            cart_item.delete()
+            with transaction.atomic():
+                cart_item = get_object_or_404(_locked_items(), id=item_id, cart__user=request.user)
+                subtotal = cart_item.get_subtotal()
+                cart_item._totals_applied = True
+                cart_item.delete()
+                cart_item.cart.apply_change(-cart_item.quantity, -subtotal)
             messages.success(request, "Item removed from cart!")
         else:
             messages.error(request, "Invalid item.")
@@ -136,60 +165,16 @@ def view_cart(request):
     """View cart page."""
     if request.user.is_authenticated:
         cart = get_cart(request)
-        if cart:
-            items = []
-            for cart_item in cart.items.all():
-                items.append({
-                    "id": cart_item.id,
-                    "product": cart_item.product,
-                    "quantity": cart_item.quantity,
-                    "variations": cart_item.variations.all(),
-                    "subtotal": cart_item.get_subtotal(),
-                    "item_price": cart_item.get_item_price(),
-                })
-            total = cart.get_total()
-            cart_count = cart.get_total_items()
-        else:
-            items = []
-            total = 0
-            cart_count = 0
+        summary = cart.summary(cards=True)
     else:
-        session_cart = get_session_cart(request)
-        items = []
-        
-        for item_key, item_data in session_cart.items():
-            try:
-                product = Product.objects.get(id=item_data["product_id"])
-                quantity = item_data["quantity"]
-                variation_ids = item_data.get("variation_ids", [])
-
-                variations = ProductVariation.objects.filter(id__in=variation_ids) if variation_ids else []
-
-                price = product.price
-                if variations:
-                    price += sum(v.price_adjustment for v in variations)
-
-                items.append({
-                    "id": 0,
-                    "product": product,
-                    "quantity": quantity,
-                    "variations": variations,
-                    "subtotal": price * quantity,
-                    "item_price": price,
-                    "item_key": item_key,
-                })
-            except Product.DoesNotExist:
-                continue
-        
-        total = get_session_cart_total(request)
-        cart_count = get_session_cart_count(request)
         cart = None
-    
+        summary = get_session_cart_summary(request, cards=True)
+
     context = {
         "cart": cart,
-        "items": items,
-        "total": total,
-        "cart_count": cart_count,
+        "items": summary.lines,
+        "total": summary.total,
+        "cart_count": summary.item_count,
     }
-    
+
     return render(request, "cart/view.html", context)
@@ -150,7 +150,7 @@ print()
 print("2. If you can't disable it, apply the bucket policy above")
 print("   → But this may still not work if ACLs are blocked")
 print()
-print("3. After fixing, run: python fix_s3_acl.py")
+print("3. After fixing, run: python manage.py media_audit")
 print("   → This will set ACL on existing images")
 print()
 print("4. Test by uploading a new product image")
@@ -1,18 +1,35 @@
+from decimal import Decimal
 from urllib.parse import urlsplit, urlunsplit
 
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject, lazy
 
 
 def cart_context(request):
-    """Context processor to add cart information to all templates."""
-    from cart.utils import get_cart
-    cart = get_cart(request)
-    cart_count = cart.get_total_items() if cart else 0
-    cart_total = cart.get_total() if cart else 0
+    """Context processor to add cart information to all templates.
+
+    Every value is lazy: pages that never read them run no cart queries,
+    and pages that do share one lookup per request.
+    """
+    from cart.models import Cart
+    from cart.utils import get_cart_totals, get_session_cart_count
+
+    def cart_count():
+        if request.user.is_authenticated:
+            return get_cart_totals(request)["count"]
+        # Guest counts need no prices, so skip the product lookups.
+        return get_session_cart_count(request)
+
+    def cart():
+        if not request.user.is_authenticated:
+            return None
+        return Cart.objects.filter(user=request.user).first()
+
     return {
-        "cart": cart,
-        "cart_count": cart_count,
-        "cart_total": cart_total,
+        "cart": SimpleLazyObject(cart),
+        # lazy() proxies keep int/Decimal behaviour for comparisons and filters.
+        "cart_count": lazy(cart_count, int)(),
+        "cart_total": lazy(lambda: get_cart_totals(request)["total"], Decimal)(),
     }
 
 
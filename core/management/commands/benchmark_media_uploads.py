@@ -0,0 +1,141 @@
+import os
+import statistics
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from furniture_store.s3_standin import LocalS3
+from furniture_store.storage import MediaStorage
+
+
+class LegacyMediaStorage(S3Boto3Storage):
+    """The upload path MediaStorage used before the fast path, for comparison.
+
+    After the PUT it slept 0.5s, built a new client, probed candidate keys
+    with ``head_object`` and re-sent the ACL.
+    """
+
+    default_acl = "public-read"
+    file_overwrite = False
+
+    def _save(self, name, content):
+        saved_name = super()._save(name, content)
+        time.sleep(0.5)
+        location = self.location.strip("/")
+        keys = [
+            saved_name,
+            f"{location}/{saved_name}" if not saved_name.startswith(location) else saved_name,
+            saved_name.lstrip("/"),
+            f"/{saved_name}",
+        ]
+        client = boto3.client(
+            "s3",
+            region_name=self.region_name,
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            config=self.client_config,
+        )
+        for key in dict.fromkeys(keys):
+            try:
+                client.head_object(Bucket=self.bucket_name, Key=key)
+            except ClientError:
+                continue
+            client.put_object_acl(Bucket=self.bucket_name, Key=key, ACL="public-read")
+            break
+        return saved_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-image upload latency of the old and current MediaStorage "
+        "paths against a local S3 stand-in (or --endpoint-url, e.g. MinIO)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=20, help="Uploads per variant.")
+        parser.add_argument("--size-kb", type=int, default=150, help="Size of each upload.")
+        parser.add_argument(
+            "--latency-ms",
+            type=int,
+            default=15,
+            help="Delay the stand-in adds to every request, to model network round trips.",
+        )
+        parser.add_argument("--endpoint-url", help="Use this S3-compatible endpoint instead.")
+        parser.add_argument("--bucket", default="benchmark", help="Bucket name.")
+        parser.add_argument(
+            "--skip-legacy",
+            action="store_true",
+            help="Only measure the current path (the legacy one sleeps 0.5s per upload).",
+        )
+
+    def _storage(self, storage_class, endpoint_url, bucket, **extra):
+        return storage_class(
+            bucket_name=bucket,
+            endpoint_url=endpoint_url,
+            access_key="benchmark",
+            secret_key="benchmark",
+            region_name="us-east-1",
+            location="benchmark",
+            client_config=Config(
+                s3={"addressing_style": "path"},
+                signature_version="s3v4",
+                request_checksum_calculation="when_required",
+            ),
+            **extra,
+        )
+
+    def _run(self, label, storage, count, payload, standin):
+        before = sum(standin.requests.values()) if standin else 0
+        timings = []
+        for index in range(count):
+            started = time.perf_counter()
+            storage.save(f"photos/products/{label}-{index}.jpg", ContentFile(payload))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        requests = (sum(standin.requests.values()) - before) / count if standin else None
+        self.stdout.write(
+            f"{label:<16} mean {statistics.mean(timings):8.1f} ms  "
+            f"p50 {timings[len(timings) // 2]:8.1f} ms  "
+            f"p95 {timings[max(int(len(timings) * 0.95) - 1, 0)]:8.1f} ms"
+            + (f"  {requests:.1f} requests/image" if requests is not None else "")
+        )
+        return statistics.mean(timings)
+
+    def _measure(self, options, endpoint_url, standin):
+        payload = os.urandom(options["size_kb"] * 1024)
+        count, bucket = options["count"], options["bucket"]
+        self.stdout.write(f"{count} uploads of {options['size_kb']} KB each to {endpoint_url}")
+
+        # Warm the storage's cached connection so client creation is not timed.
+        fast = self._storage(MediaStorage, endpoint_url, bucket)
+        fast.save("photos/products/warmup.jpg", ContentFile(b"warmup"))
+
+        results = {}
+        if not options["skip_legacy"]:
+            legacy = self._storage(LegacyMediaStorage, endpoint_url, bucket)
+            legacy.save("photos/products/warmup-legacy.jpg", ContentFile(b"warmup"))
+            results["before"] = self._run("before", legacy, count, payload, standin)
+        results["after"] = self._run("after", fast, count, payload, standin)
+        verified = self._storage(MediaStorage, endpoint_url, bucket, verify_rate=1.0)
+        verified.save("photos/products/warmup-verified.jpg", ContentFile(b"warmup"))
+        results["verified"] = self._run("after, verified", verified, count, payload, standin)
+
+        if "before" in results:
+            self.stdout.write(self.style.SUCCESS(
+                f"Fast path is {results['before'] / results['after']:.1f}x faster per image."
+            ))
+
+    def handle(self, *args, **options):
+        if options["count"] < 1:
+            raise CommandError("--count must be at least 1.")
+        if options["endpoint_url"]:
+            self._measure(options, options["endpoint_url"], None)
+            return
+        with LocalS3(latency_ms=options["latency_ms"]) as standin:
+            self._measure(options, standin.endpoint_url, standin)
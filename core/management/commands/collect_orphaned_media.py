@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from core.media import DELETE_BATCH_SIZE, collect_orphans, upload_prefixes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete media files under the models' upload directories that no row "
+        "references (deleted products, replaced images, stale derivatives)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Keep unreferenced files modified more recently than this (uploads not yet saved).",
+        )
+        parser.add_argument("--batch-size", type=int, default=DELETE_BATCH_SIZE, help="Files per delete request.")
+        parser.add_argument("--page-size", type=int, default=1000, help="Keys per S3 listing page.")
+        parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options["batch_size"] <= DELETE_BATCH_SIZE:
+            raise CommandError(f"--batch-size must be between 1 and {DELETE_BATCH_SIZE}.")
+        if options["grace_hours"] < 0:
+            raise CommandError("--grace-hours cannot be negative.")
+        storage = storages["default"]
+        prefixes = upload_prefixes()
+        self.stdout.write(f"Scanning {', '.join(prefixes)} in {type(storage).__name__}")
+
+        counts = collect_orphans(
+            storage,
+            timedelta(hours=options["grace_hours"]),
+            prefixes=prefixes,
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+            page_size=options["page_size"],
+        )
+        elapsed = counts["elapsed"] or 1e-9
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            f"Scanned {counts['scanned']} files in {counts['elapsed']:.1f}s "
+            f"({counts['scanned'] / elapsed:.0f} files/s): {counts['referenced']} referenced, "
+            f"{counts['recent']} within the grace period, {counts['reused']} referenced again during the run."
+        )
+        style = self.style.WARNING if counts["errors"] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{verb} {counts['deleted']} orphaned files ({counts['bytes'] / 1024 / 1024:.1f} MB, "
+            f"{counts['deleted'] / elapsed:.0f} files/s); {counts['errors']} errors."
+        ))
@@ -0,0 +1,91 @@
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from core.media import MediaAudit, referenced_names
+from furniture_store import s3_acl
+
+DEFAULT_CHECKPOINT = ".media_audit.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the media bucket with the files the database references: "
+        "make referenced objects public-read, copy misplaced ones into place "
+        "and report missing and unreferenced objects."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent ACL checks and repairs.")
+        parser.add_argument("--page-size", type=int, default=1000, help="Keys per list_objects_v2 page.")
+        parser.add_argument(
+            "--checkpoint",
+            default=DEFAULT_CHECKPOINT,
+            help="File recording progress after each page; removed when the audit completes.",
+        )
+        parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint.")
+        parser.add_argument("--dry-run", action="store_true", help="Report without changing anything.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        if not 1 <= options["page_size"] <= 1000:
+            raise CommandError("--page-size must be between 1 and 1000.")
+        storage = storages["default"]
+        if not hasattr(storage, "bucket_name"):
+            raise CommandError("media_audit needs S3 media storage (USE_AWS=True).")
+
+        location = storage.location.strip("/")
+        keys = {s3_acl.object_key(storage, name) for name in referenced_names()}
+
+        def candidates(key):
+            # Where older scripts and storage settings put files by mistake.
+            name = key[len(location) + 1:] if location else key
+            return [stray for stray in dict.fromkeys([name, f"{location}/{key}", f"/{key}"]) if stray != key]
+
+        audit = MediaAudit(
+            storage.connection.meta.client,
+            storage.bucket_name,
+            keys,
+            prefix=f"{location}/" if location else "",
+            candidates=candidates,
+            workers=options["workers"],
+            page_size=options["page_size"],
+            checkpoint=options["checkpoint"],
+            dry_run=options["dry_run"],
+            acl=storage.default_acl or "public-read",
+        )
+        resumed = audit.load_checkpoint() if options["resume"] else None
+        if resumed:
+            self.stdout.write(f"Resuming after {resumed['start_after']}")
+        self.stdout.write(f"Auditing {len(keys)} referenced files in s3://{storage.bucket_name}/{audit.prefix}")
+
+        def progress(state):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {state['counts'].get('listed', 0)} objects listed, up to {state['start_after']}")
+
+        try:
+            state = audit.run(resume=options["resume"], on_page=progress)
+        except Exception as error:
+            raise CommandError(
+                f"Audit stopped: {error}. Run again with --resume to continue from the last page."
+            ) from error
+
+        counts = state["counts"]
+        elapsed = state["elapsed"]
+        verb = "would be " if options["dry_run"] else ""
+        self.stdout.write(
+            f"Listed {counts.get('listed', 0)} objects ({counts.get('unreferenced', 0)} unreferenced) "
+            f"and audited {counts.get('referenced', 0)} referenced files in {elapsed:.1f}s "
+            f"({counts.get('listed', 0) / elapsed if elapsed else 0:.0f} objects/s)."
+        )
+        self.stdout.write(
+            f"  public: {counts.get('public', 0)}, ACL {verb}fixed: {counts.get('acl_fixed', 0)}, "
+            f"{verb}relocated: {counts.get('relocated', 0)}, missing: {counts.get('missing', 0)}, "
+            f"errors: {counts.get('errors', 0)}"
+        )
+        for key in state["missing"]:
+            self.stdout.write(f"  missing: {key}")
+        if counts.get("missing", 0) > len(state["missing"]):
+            self.stdout.write(f"  ... and {counts['missing'] - len(state['missing'])} more")
+        style = self.style.WARNING if counts.get("missing") or counts.get("errors") else self.style.SUCCESS
+        self.stdout.write(style("Dry run: nothing was changed." if options["dry_run"] else "Audit complete."))
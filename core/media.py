@@ -0,0 +1,360 @@
+"""Media housekeeping: audit the S3 listing and collect orphaned files.
+
+``referenced_names`` collects every stored file name in one pass per model
+(all ``FileField`` columns plus product image derivatives). ``MediaAudit``
+pages through ``list_objects_v2`` in key order and diffs each page against
+the sorted referenced keys in memory: a referenced key inside the page's key
+range is either listed or missing, so no per-file ``head_object`` is needed.
+Listed keys get their ACL checked and missing ones are looked for under the
+stray prefixes older uploads used, both on a bounded thread pool. After each
+page the position and counts go to a JSON checkpoint, so an interrupted run
+resumes after the last finished page.
+
+``collect_orphans`` goes the other way: it streams the files under the
+models' upload directories and deletes those no row references once they
+are older than a grace period.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from botocore.exceptions import ClientError
+from django.apps import apps
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ALL_USERS_URI = "http://acs.amazonaws.com/groups/global/AllUsers"
+MISSING_SAMPLE_SIZE = 50
+# DeleteObjects accepts at most 1000 keys per request.
+DELETE_BATCH_SIZE = 1000
+
+StoredFile = namedtuple("StoredFile", "name key modified size")
+
+# ``store.derivatives.derivative_name`` in reverse: directory and source stem.
+DERIVATIVE_NAME = re.compile(r"^(?P<directory>(?:.*/)?)derivatives/(?P<stem>.+)-\d+w\.[a-z]+$")
+# Prefix lookups OR-ed into one query; SQLite limits expression depth.
+SOURCE_PREFIXES_PER_QUERY = 100
+
+
+def _file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def referenced_names():
+    """Return the set of media names referenced by any model row."""
+    names = set()
+    for model, field in _file_fields():
+        names.update(
+            model._default_manager.exclude(**{field.name: ""})
+            .exclude(**{f"{field.name}__isnull": True})
+            .values_list(field.name, flat=True)
+            .iterator()
+        )
+    from store.models import ProductImage
+
+    for derivatives in ProductImage.objects.exclude(derivatives={}).values_list("derivatives", flat=True).iterator():
+        for files in derivatives.values():
+            if isinstance(files, dict):
+                names.update(files.values())
+    return names
+
+
+def referenced_among(names):
+    """Return the subset of ``names`` that a model row references.
+
+    Queries only for the given names: one ``__in`` lookup per ``FileField``
+    and one derivatives lookup by the source names they were made from.
+    """
+    names = set(names)
+    found = set()
+    for model, field in _file_fields():
+        found.update(
+            model._default_manager.filter(**{f"{field.name}__in": names}).values_list(field.name, flat=True)
+        )
+    prefixes = sorted({
+        f"{match['directory']}{match['stem']}."
+        for match in map(DERIVATIVE_NAME.match, names - found)
+        if match
+    })
+    from store.models import ProductImage
+
+    for start in range(0, len(prefixes), SOURCE_PREFIXES_PER_QUERY):
+        lookup = Q()
+        for prefix in prefixes[start:start + SOURCE_PREFIXES_PER_QUERY]:
+            lookup |= Q(derivatives__source__startswith=prefix)
+        for derivatives in ProductImage.objects.filter(lookup).values_list("derivatives", flat=True):
+            for files in derivatives.values():
+                if isinstance(files, dict):
+                    found.update(names.intersection(files.values()))
+    return found & names
+
+
+def list_pages(client, bucket, prefix="", page_size=1000, start_after=""):
+    """Yield lists of ``list_objects_v2`` entries, in key order, after ``start_after``."""
+    params = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": page_size}
+    if start_after:
+        params["StartAfter"] = start_after
+    while True:
+        response = client.list_objects_v2(**params)
+        contents = response.get("Contents", [])
+        if contents:
+            yield contents
+        if not response.get("IsTruncated"):
+            return
+        params["ContinuationToken"] = response["NextContinuationToken"]
+
+
+class MediaAudit:
+    """Check referenced keys exist and are public, repairing what it can.
+
+    ``keys`` are the bucket keys the database references. ``candidates(key)``
+    returns other keys a missing object may have been uploaded to; the first
+    that exists is copied into place. With ``dry_run`` nothing is written.
+    """
+
+    OUTCOMES = ("public", "acl_fixed", "relocated", "missing", "errors")
+
+    def __init__(
+        self,
+        client,
+        bucket,
+        keys,
+        prefix="",
+        candidates=None,
+        workers=8,
+        page_size=1000,
+        checkpoint=None,
+        dry_run=False,
+        acl="public-read",
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.keys = sorted(set(keys))
+        self.prefix = prefix
+        self.candidates = candidates or (lambda key: [])
+        self.workers = workers
+        self.page_size = page_size
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.acl = acl
+
+    def load_checkpoint(self):
+        """Return the saved state for this bucket and prefix, or None."""
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return None
+        with open(self.checkpoint) as fp:
+            state = json.load(fp)
+        if (state.get("bucket"), state.get("prefix")) != (self.bucket, self.prefix):
+            return None
+        return state
+
+    def _save_checkpoint(self, state):
+        if not self.checkpoint:
+            return
+        temporary = f"{self.checkpoint}.tmp"
+        with open(temporary, "w") as fp:
+            json.dump(state, fp)
+        os.replace(temporary, self.checkpoint)
+
+    def run(self, resume=False, on_page=None):
+        """Audit the bucket and return the final state (counts and missing sample)."""
+        state = self.load_checkpoint() if resume else None
+        if state is None:
+            state = {
+                "bucket": self.bucket,
+                "prefix": self.prefix,
+                "start_after": "",
+                "counts": {},
+                "missing": [],
+                "elapsed": 0.0,
+            }
+        counts = Counter(state["counts"])
+        started = time.monotonic() - state["elapsed"]
+        position = bisect.bisect_right(self.keys, state["start_after"])
+
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="media-audit") as pool:
+            for page in list_pages(self.client, self.bucket, self.prefix, self.page_size, state["start_after"]):
+                listed = {entry["Key"] for entry in page}
+                last = page[-1]["Key"]
+                end = bisect.bisect_right(self.keys, last, lo=position)
+                due = self.keys[position:end]
+                present = [key for key in due if key in listed]
+                counts["listed"] += len(listed)
+                counts["unreferenced"] += len(listed) - len(present)
+                self._tally(pool, due, listed, counts, state["missing"])
+                position = end
+                state.update(start_after=last, counts=dict(counts), elapsed=time.monotonic() - started)
+                self._save_checkpoint(state)
+                if on_page:
+                    on_page(state)
+            # Referenced keys sorting after the last listed one were never listed.
+            self._tally(pool, self.keys[position:], set(), counts, state["missing"])
+
+        state.update(counts=dict(counts), elapsed=time.monotonic() - started, complete=True)
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return state
+
+    def _tally(self, pool, keys, listed, counts, missing):
+        jobs = [(key, key in listed) for key in keys]
+        for key, outcome in zip(keys, pool.map(lambda job: self._audit(*job), jobs)):
+            counts["referenced"] += 1
+            counts[outcome] += 1
+            if outcome == "missing" and len(missing) < MISSING_SAMPLE_SIZE:
+                missing.append(key)
+
+    def _audit(self, key, listed):
+        try:
+            if listed:
+                return self._check_acl(key)
+            return self._relocate(key)
+        except ClientError as error:
+            logger.warning("Auditing %s failed: %s", key, error)
+            return "errors"
+
+    def _check_acl(self, key):
+        grants = self.client.get_object_acl(Bucket=self.bucket, Key=key)["Grants"]
+        if any(
+            grant["Grantee"].get("URI") == ALL_USERS_URI and grant["Permission"] in ("READ", "FULL_CONTROL")
+            for grant in grants
+        ):
+            return "public"
+        if not self.dry_run:
+            self.client.put_object_acl(Bucket=self.bucket, Key=key, ACL=self.acl)
+        return "acl_fixed"
+
+    def _relocate(self, key):
+        for candidate in self.candidates(key):
+            try:
+                self.client.head_object(Bucket=self.bucket, Key=candidate)
+            except ClientError as error:
+                if error.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                    continue
+                raise
+            if not self.dry_run:
+                self.client.copy_object(
+                    Bucket=self.bucket,
+                    Key=key,
+                    CopySource={"Bucket": self.bucket, "Key": candidate},
+                    ACL=self.acl,
+                )
+            logger.info("Copied stray %s to %s", candidate, key)
+            return "relocated"
+        return "missing"
+
+
+def upload_prefixes():
+    """Directories the models upload to, e.g. ``photos/products/``.
+
+    Only these are garbage collected, so files put in the media root by hand
+    (documentation screenshots, fixtures) are never touched.
+    """
+    prefixes = {
+        field.upload_to.rstrip("/") + "/"
+        for _model, field in _file_fields()
+        if isinstance(field.upload_to, str) and field.upload_to.strip("/")
+    }
+    # Drop prefixes nested in another so nothing is listed twice.
+    return sorted(prefix for prefix in prefixes if not any(
+        prefix != other and prefix.startswith(other) for other in prefixes
+    ))
+
+
+def _s3_files(storage, prefix, page_size):
+    location = storage.location.strip("/")
+    start = len(location) + 1 if location else 0
+    for page in list_pages(
+        storage.connection.meta.client,
+        storage.bucket_name,
+        f"{location}/{prefix}" if location else prefix,
+        page_size,
+    ):
+        for entry in page:
+            yield StoredFile(entry["Key"][start:], entry["Key"], entry["LastModified"], entry["Size"])
+
+
+def _local_files(storage, prefix):
+    root = storage.path("")
+    for directory, _dirs, files in os.walk(storage.path(prefix)):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            yield StoredFile(name, name, datetime.fromtimestamp(stat.st_mtime, dt_timezone.utc), stat.st_size)
+
+
+def _delete(storage, batch):
+    """Delete a batch of files; return how many could not be deleted."""
+    if not hasattr(storage, "bucket_name"):
+        failed = 0
+        for stored in batch:
+            try:
+                storage.delete(stored.name)
+            except OSError as error:
+                logger.warning("Cannot delete %s: %s", stored.name, error)
+                failed += 1
+        return failed
+    response = storage.connection.meta.client.delete_objects(
+        Bucket=storage.bucket_name,
+        Delete={"Objects": [{"Key": stored.key} for stored in batch], "Quiet": True},
+    )
+    for error in response.get("Errors", []):
+        logger.warning("Cannot delete %s: %s", error.get("Key"), error.get("Message"))
+    return len(response.get("Errors", []))
+
+
+def collect_orphans(storage, grace, prefixes=None, dry_run=False, batch_size=DELETE_BATCH_SIZE, page_size=1000):
+    """Delete stored files no model row references and return counts.
+
+    Files modified within ``grace`` are kept: their row may not be committed
+    yet. Just before each batch is deleted its names are looked up again, so
+    a content-addressed file reused by an upload made during the run survives.
+    """
+    prefixes = upload_prefixes() if prefixes is None else prefixes
+    cutoff = timezone.now() - grace
+    counts = Counter()
+    started = time.monotonic()
+    referenced = referenced_names()
+    batch = []
+
+    def flush():
+        reused = referenced_among(stored.name for stored in batch)
+        orphans = [stored for stored in batch if stored.name not in reused]
+        counts["reused"] += len(batch) - len(orphans)
+        failed = 0 if dry_run or not orphans else _delete(storage, orphans)
+        counts["errors"] += failed
+        counts["deleted"] += len(orphans) - failed
+        counts["bytes"] += sum(stored.size for stored in orphans)
+        batch.clear()
+
+    for prefix in prefixes:
+        if hasattr(storage, "bucket_name"):
+            files = _s3_files(storage, prefix, page_size)
+        else:
+            files = _local_files(storage, prefix)
+        for stored in files:
+            counts["scanned"] += 1
+            if stored.name in referenced:
+                counts["referenced"] += 1
+            elif stored.modified > cutoff:
+                counts["recent"] += 1
+            else:
+                batch.append(stored)
+                if len(batch) >= batch_size:
+                    flush()
+    if batch:
+        flush()
+    counts["elapsed"] = time.monotonic() - started
+    return counts
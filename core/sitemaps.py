@@ -1,17 +1,33 @@
+"""Sitemaps for the storefront.
+
+Static pages use Django's sitemap framework. Products are split into
+sections by id range, each streamed from ``.iterator()`` with an image
+sitemap extension, and cached per section keyed by the range's latest
+``updated_at`` so an unchanged section is served without touching products.
+"""
+import hashlib
+from itertools import groupby
+from xml.sax.saxutils import escape
+
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max, Q, Sum
 from django.urls import reverse
-from store.models import Product
-
 
-class ProductSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.8
+from store.caching import get_fragment_cache
+from store.models import Product, ProductImage
 
-    def items(self):
-        return Product.objects.filter(is_active=True)
+SECTION_SIZE = 10000
+MAX_SECTION = 2**31 // SECTION_SIZE
+ITERATOR_CHUNK_SIZE = 2000
+SECTION_CACHE_TIMEOUT = 60 * 60 * 24
+SLUG_PLACEHOLDER = "__slug__"
 
-    def lastmod(self, obj):
-        return obj.updated_at
+SECTION_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+SECTION_FOOTER = "</urlset>\n"
 
 
 class StaticViewSitemap(Sitemap):
@@ -33,3 +49,123 @@ class StaticViewSitemap(Sitemap):
         return reverse(item)
 
 
+def section_bounds(number):
+    """Return the inclusive product id range covered by a section."""
+    return number * SECTION_SIZE + 1, (number + 1) * SECTION_SIZE
+
+
+def product_sections():
+    """Return ``[(number, lastmod)]`` for every id range holding active products."""
+    section = ExpressionWrapper((F("id") - 1) / SECTION_SIZE, output_field=IntegerField())
+    rows = (
+        Product.objects.filter(is_active=True)
+        .annotate(section=section)
+        .values("section")
+        .annotate(lastmod=Max("updated_at"))
+        .order_by("section")
+    )
+    return [(row["section"], row["lastmod"]) for row in rows]
+
+
+def section_cache_key(number, base_url):
+    """Key a section by everything that changes its XML.
+
+    ``updated_at`` moves on product edits, ``cache_version`` on image changes
+    and the active count on deletes.
+    """
+    low, high = section_bounds(number)
+    state = Product.objects.filter(id__range=(low, high)).aggregate(
+        latest=Max("updated_at"),
+        versions=Sum("cache_version"),
+        active=Count("id", filter=Q(is_active=True)),
+    )
+    latest = state["latest"].timestamp() if state["latest"] else 0
+    host = hashlib.md5(base_url.encode(), usedforsecurity=False).hexdigest()[:12]
+    return f"sitemap:products:{number}:{latest:.6f}:{state['versions']}:{state['active']}:{host}"
+
+
+def _absolute(base_url, url):
+    if url.startswith(("http://", "https://")):
+        return url
+    return base_url + url
+
+
+def _image_entries(base_url, images, storage):
+    for _product_id, name, alt_text in images:
+        yield (
+            "    <image:image>\n"
+            f"      <image:loc>{escape(_absolute(base_url, storage.url(name)))}</image:loc>\n"
+            + (f"      <image:title>{escape(alt_text)}</image:title>\n" if alt_text else "")
+            + "    </image:image>\n"
+        )
+
+
+def iter_product_section(number, base_url):
+    """Yield the XML of one product section without loading it into memory.
+
+    Products and their images are read with two id-ordered iterators and
+    merged, so memory stays flat regardless of section size.
+    """
+    low, high = section_bounds(number)
+    product_path = reverse("store:product_detail", kwargs={"slug": SLUG_PLACEHOLDER})
+    storage = ProductImage._meta.get_field("image").storage
+
+    products = (
+        Product.objects.filter(is_active=True, id__range=(low, high))
+        .order_by("id")
+        .values_list("id", "slug", "updated_at")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    images = groupby(
+        ProductImage.objects.filter(product__is_active=True, product__id__range=(low, high))
+        .order_by("product_id", "-is_primary", "order", "id")
+        .values_list("product_id", "image", "alt_text")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE),
+        key=lambda row: row[0],
+    )
+    pending = next(images, None)
+
+    yield SECTION_HEADER
+    for product_id, slug, updated_at in products:
+        loc = _absolute(base_url, product_path.replace(SLUG_PLACEHOLDER, slug))
+        parts = [
+            "  <url>\n",
+            f"    <loc>{escape(loc)}</loc>\n",
+            f"    <lastmod>{updated_at.date().isoformat()}</lastmod>\n",
+            "    <changefreq>weekly</changefreq>\n",
+            "    <priority>0.8</priority>\n",
+        ]
+        while pending is not None and pending[0] < product_id:
+            pending = next(images, None)
+        if pending is not None and pending[0] == product_id:
+            parts.extend(_image_entries(base_url, pending[1], storage))
+            pending = next(images, None)
+        parts.append("  </url>\n")
+        yield "".join(parts)
+    yield SECTION_FOOTER
+
+
+def cached_product_section(number, base_url):
+    """Return a section's XML from the cache, or a generator that fills it.
+
+    Returns None for a section outside the id space or without products.
+    """
+    if number > MAX_SECTION:
+        return None
+    cache = get_fragment_cache()
+    key = section_cache_key(number, base_url)
+    xml = cache.get(key)
+    if xml is not None:
+        return xml
+    low, high = section_bounds(number)
+    if not Product.objects.filter(is_active=True, id__range=(low, high)).exists():
+        return None
+
+    def generate():
+        chunks = []
+        for chunk in iter_product_section(number, base_url):
+            chunks.append(chunk)
+            yield chunk
+        cache.set(key, "".join(chunks), SECTION_CACHE_TIMEOUT)
+
+    return generate()
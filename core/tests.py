@@ -1,7 +1,355 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
+from botocore.config import Config
+from django.contrib import admin
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
 
-class CoreTests(TestCase):
-    """Placeholder core test suite."""
+from furniture_store import s3_acl
+from furniture_store.s3_standin import LocalS3
+from furniture_store.storage import ContentAddressedMediaStorage, MediaStorage
+from marketing.admin import NewsletterSubscriberAdmin
+from marketing.models import NewsletterSubscriber
+from orders.admin import OrderAdmin
+from orders.models import Order, OrderItem
+from store.admin import ProductAdmin
+from store.models import Category, Product, ProductImage, ProductVariation
 
-    pass
+from .media import referenced_among
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "template_fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sitemap-tests",
+    },
+}
+
+
+@override_settings(CACHES=TEST_CACHES, FRAGMENT_CACHE_ALIAS="template_fragments")
+@mock.patch("core.sitemaps.SECTION_SIZE", 2)
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(
+                name=f"Stool {index}", sku=f"STOOL-{index}", description="Stool", price=40, stock=1
+            )
+            for index in range(5)
+        ]
+        ProductImage.objects.create(
+            product=self.products[0], image="photos/products/stool.jpg", alt_text="Stool & rug"
+        )
+        self.first_section = (self.products[0].pk - 1) // 2
+
+    def _section(self, number):
+        response = self.client.get(reverse("sitemap_products", kwargs={"section": number}))
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b"".join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def test_index_lists_static_and_id_range_sections(self):
+        response = self.client.get("/sitemap.xml")
+        self.assertContains(response, reverse("sitemap_static"))
+        self.assertEqual(response.content.decode().count("sitemap-products-"), 3)
+
+    def test_section_streams_products_with_images(self):
+        xml = self._section(self.first_section)
+        self.assertIn(self.products[0].get_absolute_url(), xml)
+        self.assertIn("<image:loc>http://testserver/media/photos/products/stool.jpg</image:loc>", xml)
+        self.assertIn("<image:title>Stool &amp; rug</image:title>", xml)
+        self.assertEqual(xml.count("<url>"), 2 - (self.products[0].pk - 1) % 2)
+
+    def test_section_is_cached_until_a_product_changes(self):
+        self._section(self.first_section)
+        response = self.client.get(reverse("sitemap_products", kwargs={"section": self.first_section}))
+        self.assertFalse(response.streaming)
+
+        self.products[0].is_active = False
+        self.products[0].save()
+        xml = self._section(self.first_section)
+        self.assertNotIn(self.products[0].get_absolute_url(), xml)
+
+    def test_unknown_section_is_not_found(self):
+        response = self.client.get(reverse("sitemap_products", kwargs={"section": 999}))
+        self.assertEqual(response.status_code, 404)
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.sofa = Product.objects.create(name="Sofa", sku="SOFA-1", description="Sofa", price=500, stock=2)
+        self.lamp = Product.objects.create(name="Lamp", sku="LAMP-1", description="Lamp", price=40, stock=9)
+        for name in ("Grey", "Blue"):
+            ProductVariation.objects.create(
+                product=self.sofa, variation_type="color", name=name, stock=1, price_adjustment=10
+            )
+
+    def _rows(self, response):
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_product_export_has_one_row_per_variation(self):
+        product_admin = ProductAdmin(Product, admin.site)
+        with self.assertNumQueries(1):
+            rows = self._rows(product_admin.export_csv(None, Product.objects.all()))
+        self.assertEqual(rows[0][:3], ["ID", "SKU", "Name"])
+        self.assertEqual([row[1] for row in rows[1:]], ["SOFA-1", "SOFA-1", "LAMP-1"])
+        self.assertEqual(rows[1][10], "Grey")
+        self.assertEqual(rows[3][9:], ["", "", "", "", "", ""])
+
+    def test_order_export_includes_line_items(self):
+        order = Order.objects.create(
+            email="buyer@example.com", first_name="Ada", last_name="Byron", phone="1",
+            shipping_street="1 Road", shipping_city="Leeds", shipping_state="WY",
+            shipping_postal_code="LS1", subtotal=540, total=540,
+        )
+        for product in (self.sofa, self.lamp):
+            OrderItem.objects.create(
+                order=order, product=product, product_name=product.name, product_sku=product.sku,
+                quantity=1, price=product.price, subtotal=product.price,
+            )
+        rows = self._rows(OrderAdmin(Order, admin.site).export_csv(None, Order.objects.all()))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row[12] for row in rows[1:]}, {"SOFA-1", "LAMP-1"})
+        self.assertEqual(rows[1][0], order.order_number)
+
+    def test_subscriber_export_streams(self):
+        NewsletterSubscriber.objects.create(email="reader@example.com", name="Reader", is_active=True)
+        subscriber_admin = NewsletterSubscriberAdmin(NewsletterSubscriber, admin.site)
+        rows = self._rows(subscriber_admin.export_csv(None, NewsletterSubscriber.objects.all()))
+        self.assertEqual(rows[0], ["Email", "Name", "Subscribed At", "Is Active"])
+        self.assertEqual(rows[1][:2], ["reader@example.com", "Reader"])
+        rows = self._rows(subscriber_admin.export_latest(None, NewsletterSubscriber.objects.none()))
+        self.assertEqual(len(rows), 2)
+
+
+class MediaStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.standin = LocalS3().__enter__()
+        self.addCleanup(self.standin.__exit__, None, None, None)
+
+    def _storage(self, storage_class=MediaStorage, **kwargs):
+        return storage_class(
+            bucket_name="media-tests",
+            endpoint_url=self.standin.endpoint_url,
+            access_key="test",
+            secret_key="test",
+            region_name="us-east-1",
+            location="media",
+            client_config=Config(
+                s3={"addressing_style": "path"},
+                request_checksum_calculation="when_required",
+            ),
+            **kwargs,
+        )
+
+    def test_upload_trusts_the_put(self):
+        name = self._storage().save("photos/products/sofa.jpg", ContentFile(b"jpeg"))
+
+        self.assertEqual(self.standin.acls[f"media/{name}"], "public-read")
+        self.assertEqual(set(self.standin.requests), {"HeadObject", "PutObject"})
+        self.assertEqual(self.standin.requests["PutObject"], 1)
+
+    def test_sampled_verification_reapplies_missing_acl(self):
+        storage = self._storage(verify_rate=1.0)
+        name = storage.save("photos/products/lamp.jpg", ContentFile(b"jpeg"))
+        self.assertEqual(self.standin.requests["GetObjectAcl"], 1)
+        self.assertTrue(storage.verify_public_read(name))
+
+        self.standin.acls[f"media/{name}"] = "private"
+        client = storage.connection.meta.client
+        acl_queue = s3_acl.AclQueue(client_factory=lambda: client, workers=1, retry_base=0.01)
+        self.addCleanup(acl_queue.shutdown, 1)
+        with mock.patch.object(s3_acl, "_queue", acl_queue):
+            with self.assertLogs("furniture_store.storage", "WARNING"):
+                self.assertFalse(storage.verify_public_read(name))
+            self.assertTrue(acl_queue.flush(timeout=5))
+        self.assertEqual(self.standin.acls[f"media/{name}"], "public-read")
+
+    def test_content_addressed_storage_uploads_duplicates_once(self):
+        storage = self._storage(ContentAddressedMediaStorage)
+        first = storage.save("photos/products/sofa.JPG", ContentFile(b"same bytes"))
+        second = storage.save("photos/products/couch.jpg", ContentFile(b"same bytes"))
+        other = storage.save("photos/products/lamp.jpg", ContentFile(b"other bytes"))
+
+        self.assertEqual(first, second)
+        self.assertRegex(first, r"^photos/products/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$")
+        self.assertNotEqual(other, first)
+        self.assertEqual(self.standin.requests["PutObject"], 2)
+        self.assertEqual(self.standin.objects[f"media/{first}"], b"same bytes")
+
+    def test_benchmark_command_runs_against_standin(self):
+        out = StringIO()
+        call_command("benchmark_media_uploads", count=2, latency_ms=0, skip_legacy=True, stdout=out)
+        self.assertIn("2.0 requests/image", out.getvalue())
+
+
+def s3_media_storages(endpoint_url):
+    return {
+        "default": {
+            "BACKEND": "furniture_store.storage.MediaStorage",
+            "OPTIONS": {
+                "bucket_name": "media-tests",
+                "endpoint_url": endpoint_url,
+                "access_key": "test",
+                "secret_key": "test",
+                "region_name": "us-east-1",
+                "location": "media",
+                "client_config": Config(
+                    s3={"addressing_style": "path"},
+                    request_checksum_calculation="when_required",
+                ),
+            },
+        },
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+
+
+class MediaAuditTests(TestCase):
+    def setUp(self):
+        self.standin = LocalS3().__enter__()
+        self.addCleanup(self.standin.__exit__, None, None, None)
+        storages = override_settings(STORAGES=s3_media_storages(self.standin.endpoint_url))
+        storages.enable()
+        self.addCleanup(storages.disable)
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.checkpoint = os.path.join(workdir.name, "audit.json")
+
+        product = Product.objects.create(name="Chair", description="Chair", price=90)
+        for name in ("public", "private", "stray", "gone"):
+            ProductImage.objects.create(product=product, image=f"photos/products/{name}.jpg")
+        self.standin.store("media/photos/products/public.jpg", b"a", "public-read")
+        self.standin.store("media/photos/products/private.jpg", b"b")
+        self.standin.store("photos/products/stray.jpg", b"c")
+        self.standin.store("media/photos/products/orphan.jpg", b"d", "public-read")
+
+    def _audit(self, **options):
+        out = StringIO()
+        call_command("media_audit", page_size=2, workers=4, checkpoint=self.checkpoint, stdout=out, **options)
+        return out.getvalue()
+
+    def test_audit_repairs_acls_and_misplaced_files(self):
+        output = self._audit()
+
+        self.assertEqual(self.standin.acls["media/photos/products/private.jpg"], "public-read")
+        self.assertEqual(self.standin.objects["media/photos/products/stray.jpg"], b"c")
+        self.assertEqual(self.standin.acls["media/photos/products/stray.jpg"], "public-read")
+        self.assertEqual(self.standin.requests["HeadObject"], 4)
+        self.assertIn("Listed 3 objects (1 unreferenced) and audited 4 referenced files", output)
+        self.assertIn("public: 1, ACL fixed: 1, relocated: 1, missing: 1, errors: 0", output)
+        self.assertIn("missing: media/photos/products/gone.jpg", output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_dry_run_changes_nothing(self):
+        output = self._audit(dry_run=True)
+
+        self.assertEqual(self.standin.acls["media/photos/products/private.jpg"], "private")
+        self.assertNotIn("media/photos/products/stray.jpg", self.standin.objects)
+        self.assertIn("ACL would be fixed: 1, would be relocated: 1", output)
+
+    def test_resume_continues_after_checkpoint(self):
+        with open(self.checkpoint, "w") as fp:
+            json.dump({
+                "bucket": "media-tests",
+                "prefix": "media/",
+                "start_after": "media/photos/products/orphan.jpg",
+                "counts": {"listed": 2, "unreferenced": 1, "referenced": 2, "missing": 2},
+                "missing": ["media/photos/products/a.jpg", "media/photos/products/gone.jpg"],
+                "elapsed": 1.0,
+            }, fp)
+        output = self._audit(resume=True)
+
+        self.assertIn("Resuming after media/photos/products/orphan.jpg", output)
+        self.assertEqual(self.standin.acls["media/photos/products/private.jpg"], "public-read")
+        self.assertIn("Listed 4 objects (1 unreferenced) and audited 5 referenced files", output)
+        self.assertIn("public: 1, ACL fixed: 1, relocated: 1, missing: 2", output)
+
+
+class OrphanedMediaTests(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name="Desk", description="Desk", price=120)
+        ProductImage.objects.create(product=product, image="photos/products/desk.jpg")
+        self.old = time.time() - 3 * 24 * 3600
+
+    def _collect(self, **options):
+        out = StringIO()
+        call_command("collect_orphaned_media", stdout=out, **options)
+        return out.getvalue()
+
+    def test_s3_orphans_are_deleted_in_batches_after_grace_period(self):
+        standin = LocalS3().__enter__()
+        self.addCleanup(standin.__exit__, None, None, None)
+        for key, modified in (
+            ("media/photos/products/desk.jpg", self.old),
+            ("media/photos/products/old-1.jpg", self.old),
+            ("media/photos/products/old-2.jpg", self.old),
+            ("media/photos/products/uploading.jpg", None),
+            ("media/wireframes/home.png", self.old),
+        ):
+            standin.store(key, b"x" * 10, "public-read", modified)
+
+        with override_settings(STORAGES=s3_media_storages(standin.endpoint_url)):
+            output = self._collect(dry_run=True)
+            self.assertIn("Would delete 2 orphaned files", output)
+            self.assertEqual(len(standin.objects), 5)
+
+            output = self._collect(batch_size=1)
+
+        self.assertEqual(standin.requests["DeleteObjects"], 2)
+        self.assertEqual(
+            sorted(standin.objects),
+            ["media/photos/products/desk.jpg", "media/photos/products/uploading.jpg", "media/wireframes/home.png"],
+        )
+        self.assertIn("1 referenced, 1 within the grace period", output)
+        self.assertIn("Deleted 2 orphaned files", output)
+
+    def test_local_orphans_and_files_reused_during_the_run(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        for name in ("photos/products/desk.jpg", "photos/products/gone.jpg", "categories/shared.jpg", "notes/a.txt"):
+            path = os.path.join(media_root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fp:
+                fp.write(b"x")
+            os.utime(path, (self.old, self.old))
+
+        # Rows saved after the initial scan, e.g. a content-addressed upload.
+        Category.objects.create(name="Shared", image="categories/shared.jpg")
+        with override_settings(MEDIA_ROOT=media_root.name), mock.patch(
+            "core.media.referenced_names", return_value=set()
+        ):
+            output = self._collect(batch_size=2)
+
+        remaining = sorted(
+            os.path.relpath(os.path.join(directory, name), media_root.name)
+            for directory, _dirs, files in os.walk(media_root.name)
+            for name in files
+        )
+        self.assertEqual(remaining, ["categories/shared.jpg", "notes/a.txt", "photos/products/desk.jpg"])
+        self.assertIn("2 referenced again during the run", output)
+
+    def test_batch_lookup_checks_only_the_given_names(self):
+        image = ProductImage.objects.get()
+        image.derivatives = {
+            "source": "photos/products/desk.jpg",
+            "webp": {"320": "photos/products/derivatives/desk-320w.webp"},
+        }
+        image.save(update_fields=["derivatives"])
+        names = [
+            "photos/products/desk.jpg",
+            "photos/products/derivatives/desk-320w.webp",
+            "photos/products/derivatives/desk-640w.webp",
+            "photos/products/derivatives/lamp-320w.webp",
+            "categories/gone.jpg",
+        ]
+        self.assertEqual(referenced_among(names), set(names[:2]))
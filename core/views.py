@@ -1,6 +1,48 @@
+from django.contrib.sitemaps.views import x_robots_tag
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+
+from store.conditional import catalog_validators, conditional_catalog_page
+
+from .sitemaps import cached_product_section, product_sections
+
+SITEMAP_CONTENT_TYPE = "application/xml"
 
 
 def custom_404(request, exception):
     """Render a branded 404 page with helpful links."""
     return render(request, "404.html", status=404)
+
+
+def _base_url(request):
+    return f"{request.scheme}://{request.get_host()}"
+
+
+@x_robots_tag
+@conditional_catalog_page(catalog_validators)
+def sitemap_index(request):
+    """List the static sitemap and one section per product id range."""
+    base_url = _base_url(request)
+    sections = [{"location": base_url + reverse("sitemap_static"), "last_mod": None}]
+    for number, lastmod in product_sections():
+        path = reverse("sitemap_products", kwargs={"section": number})
+        sections.append({"location": base_url + path, "last_mod": lastmod})
+    return render(
+        request,
+        "sitemap_index.xml",
+        {"sitemaps": sections},
+        content_type=SITEMAP_CONTENT_TYPE,
+    )
+
+
+@x_robots_tag
+@conditional_catalog_page(catalog_validators)
+def product_sitemap(request, section):
+    """Serve one product section, streamed on a cache miss."""
+    xml = cached_product_section(section, _base_url(request))
+    if xml is None:
+        raise Http404("No such sitemap section.")
+    if isinstance(xml, str):
+        return HttpResponse(xml, content_type=SITEMAP_CONTENT_TYPE)
+    return StreamingHttpResponse(xml, content_type=SITEMAP_CONTENT_TYPE)
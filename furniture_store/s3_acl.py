@@ -0,0 +1,322 @@
+"""Background queue that applies public-read ACLs to uploaded S3 objects.
+
+One bounded queue per process is drained by a small, fixed pool of worker
+threads sharing a single pooled boto3 client. Jobs are deduplicated by key
+while pending, taken in batches, and retried with exponential backoff and
+jitter when S3 has not caught up with the upload yet or throttles us.
+Queue depth, outcomes and enqueue-to-done latency are available from
+``metrics()`` and logged periodically. ``shutdown()`` drains the queue; the
+gunicorn ``worker_exit`` hook and ``atexit`` both call it.
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Error codes worth retrying: the object is not visible yet, or S3 is busy.
+RETRYABLE_CODES = {
+    "404",
+    "NoSuchKey",
+    "NotFound",
+    "SlowDown",
+    "Throttling",
+    "RequestTimeout",
+    "InternalError",
+    "ServiceUnavailable",
+    "500",
+    "503",
+}
+POLL_INTERVAL = 0.5
+METRICS_LOG_INTERVAL = 60
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Return the process-wide S3 client; boto3 clients are thread-safe."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.config import Config
+
+                _client = boto3.client(
+                    "s3",
+                    region_name=getattr(settings, "AWS_S3_REGION_NAME", "") or None,
+                    aws_access_key_id=getattr(settings, "AWS_ACCESS_KEY_ID", ""),
+                    aws_secret_access_key=getattr(settings, "AWS_SECRET_ACCESS_KEY", ""),
+                    config=Config(
+                        max_pool_connections=max(10, getattr(settings, "S3_ACL_WORKERS", 4) * 2),
+                        retries={"max_attempts": 2, "mode": "standard"},
+                    ),
+                )
+    return _client
+
+
+def object_key(storage, name):
+    """Return the key ``storage`` wrote ``name`` to, or None if it is not S3."""
+    if not hasattr(storage, "bucket_name") or not hasattr(storage, "_normalize_name"):
+        return None
+    from storages.utils import clean_name
+
+    return storage._normalize_name(clean_name(name))
+
+
+class AclQueue:
+    """Bounded, deduplicating ACL job queue drained by a fixed thread pool."""
+
+    def __init__(
+        self,
+        client_factory=get_s3_client,
+        workers=4,
+        maxsize=1000,
+        batch_size=25,
+        max_attempts=5,
+        retry_base=0.5,
+        acl="public-read",
+    ):
+        self.client_factory = client_factory
+        self.workers = workers
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.acl = acl
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._jobs = queue.Queue(self.maxsize)
+        self._retries = []
+        self._sequence = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._threads = []
+        self._stopping = False
+        self._last_log = time.monotonic()
+        self._stats = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "dropped": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retried": 0,
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def enqueue(self, bucket, key):
+        """Queue an ACL update; return False if already pending or the queue is full."""
+        if os.getpid() != self._pid:
+            # Forked after threads started (e.g. gunicorn --preload): start afresh.
+            self._reset()
+        job = (bucket, key)
+        with self._lock:
+            if self._stopping:
+                return False
+            if job in self._pending:
+                self._stats["deduplicated"] += 1
+                return False
+            self._pending[job] = time.monotonic()
+            self._stats["enqueued"] += 1
+        try:
+            self._jobs.put_nowait((job, 1))
+        except queue.Full:
+            with self._lock:
+                del self._pending[job]
+                self._stats["dropped"] += 1
+                self._idle.notify_all()
+            logger.warning("S3 ACL queue full; dropped %s", key)
+            return False
+        self._start_workers()
+        return True
+
+    def _start_workers(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"s3-acl-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _next_batch(self):
+        """Return due retries and queued jobs, up to ``batch_size``; None to stop."""
+        now = time.monotonic()
+        batch = []
+        with self._lock:
+            while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self._retries)[2])
+            wait = POLL_INTERVAL
+            if self._retries:
+                wait = min(wait, max(self._retries[0][0] - now, 0.01))
+            finished = self._stopping and not self._pending
+        if finished:
+            return None
+        if not batch:
+            try:
+                batch.append(self._jobs.get(timeout=wait))
+            except queue.Empty:
+                return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        client = None
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if batch and client is None:
+                client = self.client_factory()
+            for job, attempt in batch:
+                self._apply(client, job, attempt)
+            self._maybe_log()
+
+    def _apply(self, client, job, attempt):
+        bucket, key = job
+        try:
+            client.put_object_acl(Bucket=bucket, Key=key, ACL=self.acl)
+        except (ClientError, BotoCoreError) as error:
+            code = ""
+            if isinstance(error, ClientError):
+                code = error.response.get("Error", {}).get("Code", "")
+            retryable = isinstance(error, BotoCoreError) or code in RETRYABLE_CODES
+            if retryable and attempt < self.max_attempts and not self._stopping:
+                delay = self.retry_base * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+                with self._lock:
+                    heapq.heappush(
+                        self._retries,
+                        (time.monotonic() + delay, next(self._sequence), (job, attempt + 1)),
+                    )
+                    self._stats["retried"] += 1
+                return
+            if code == "AccessDenied" or "BlockPublicAccess" in str(error):
+                logger.error(
+                    "Cannot set %s ACL on %s: Block Public Access or IAM permissions deny it",
+                    self.acl, key,
+                )
+            else:
+                logger.warning("Could not set %s ACL on %s after %s attempts: %s", self.acl, key, attempt, error)
+            self._finish(job, "failed")
+        except Exception:
+            logger.exception("Unexpected error setting ACL on %s", key)
+            self._finish(job, "failed")
+        else:
+            self._finish(job, "succeeded")
+
+    def _finish(self, job, outcome):
+        with self._lock:
+            enqueued_at = self._pending.pop(job, None)
+            self._stats[outcome] += 1
+            if enqueued_at is not None:
+                latency = time.monotonic() - enqueued_at
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+            self._idle.notify_all()
+
+    def metrics(self):
+        """Return queue depth, outcome counters and latency in milliseconds."""
+        with self._lock:
+            done = self._stats["succeeded"] + self._stats["failed"]
+            return {
+                "queue_depth": self._jobs.qsize() + len(self._retries),
+                "pending": len(self._pending),
+                "workers": sum(thread.is_alive() for thread in self._threads),
+                **self._stats,
+                "latency_avg_ms": round(self._latency_total / done * 1000, 1) if done else 0.0,
+                "latency_max_ms": round(self._latency_max * 1000, 1),
+            }
+
+    def _maybe_log(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < METRICS_LOG_INTERVAL:
+                return
+            self._last_log = now
+        logger.info("S3 ACL queue metrics", extra={"metrics": self.metrics()})
+
+    def flush(self, timeout=None):
+        """Wait until every pending job is done; return True if the queue drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=10):
+        """Stop taking jobs, drain what is queued and stop the workers."""
+        drained = self.flush(timeout)
+        with self._lock:
+            self._stopping = True
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(POLL_INTERVAL * 2)
+        if not drained:
+            logger.warning("S3 ACL queue shut down with %s jobs pending", len(self._pending))
+        if self._stats["enqueued"]:
+            logger.info("S3 ACL queue metrics", extra={"metrics": self.metrics()})
+        return drained
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide queue configured from settings."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = AclQueue(
+                    workers=getattr(settings, "S3_ACL_WORKERS", 4),
+                    maxsize=getattr(settings, "S3_ACL_QUEUE_SIZE", 1000),
+                    batch_size=getattr(settings, "S3_ACL_BATCH_SIZE", 25),
+                    max_attempts=getattr(settings, "S3_ACL_MAX_ATTEMPTS", 5),
+                    retry_base=getattr(settings, "S3_ACL_RETRY_BASE_SECONDS", 0.5),
+                )
+    return _queue
+
+
+def enqueue_file(storage, name):
+    """Queue a public-read ACL for a file saved through an S3 storage."""
+    key = object_key(storage, name)
+    if key is None:
+        return False
+    return get_queue().enqueue(storage.bucket_name, key)
+
+
+def metrics():
+    return get_queue().metrics() if _queue is not None else {}
+
+
+def shutdown(timeout=10):
+    """Drain the queue if this process ever used it."""
+    if _queue is None:
+        return True
+    return _queue.shutdown(timeout)
+
+
+atexit.register(shutdown)
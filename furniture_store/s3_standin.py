@@ -0,0 +1,224 @@
+"""Minimal in-memory S3 stand-in for benchmarks and tests.
+
+Serves path-style object PUT/GET/HEAD/copy, object ACL GET/PUT,
+ListObjectsV2 and DeleteObjects over HTTP on localhost, with an optional per-request delay to
+model network latency. It does not check signatures and keeps everything in
+memory.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+ACL_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<AccessControlPolicy xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    "<Owner><ID>standin</ID></Owner><AccessControlList>"
+    '<Grant><Grantee xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:type="CanonicalUser"><ID>standin</ID></Grantee>'
+    "<Permission>FULL_CONTROL</Permission></Grant>{public}"
+    "</AccessControlList></AccessControlPolicy>"
+)
+PUBLIC_GRANT = (
+    '<Grant><Grantee xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:type="Group"><URI>http://acs.amazonaws.com/groups/global/AllUsers</URI>'
+    "</Grantee><Permission>READ</Permission></Grant>"
+)
+NO_SUCH_KEY = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    "<Error><Code>NoSuchKey</Code><Message>The specified key does not exist.</Message></Error>"
+)
+LIST_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    "<Name>{bucket}</Name><Prefix>{prefix}</Prefix><KeyCount>{count}</KeyCount>"
+    "<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{truncated}</IsTruncated>{token}{contents}"
+    "</ListBucketResult>"
+)
+LIST_ENTRY = (
+    "<Contents><Key>{key}</Key><LastModified>{modified}</LastModified>"
+    '<ETag>"{etag}"</ETag><Size>{size}</Size><StorageClass>STANDARD</StorageClass></Contents>'
+)
+COPY_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<CopyObjectResult><LastModified>{modified}</LastModified><ETag>"{etag}"</ETag></CopyObjectResult>'
+)
+
+DELETE_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<DeleteResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{deleted}</DeleteResult>'
+)
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _target(self):
+        """Return ``(key, query)``; ``key`` is "" for bucket-level requests."""
+        parts = urlsplit(self.path)
+        path = unquote(parts.path.lstrip("/"))
+        key = path.split("/", 1)[1] if "/" in path else ""
+        return key, parse_qs(parts.query, keep_blank_values=True)
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _begin(self, operation):
+        standin = self.server.standin
+        if standin.latency:
+            time.sleep(standin.latency)
+        with standin.lock:
+            standin.requests[operation] += 1
+        return standin
+
+    def do_PUT(self):
+        key, query = self._target()
+        acl = "acl" in query
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        copy_source = self.headers.get("x-amz-copy-source")
+        operation = "PutObjectAcl" if acl else "CopyObject" if copy_source else "PutObject"
+        standin = self._begin(operation)
+        with standin.lock:
+            if acl:
+                if key not in standin.objects:
+                    return self._reply(404, NO_SUCH_KEY.encode())
+                standin.acls[key] = self.headers.get("x-amz-acl", "private")
+                return self._reply(200)
+            if copy_source:
+                source = unquote(copy_source).lstrip("/").split("/", 1)[-1]
+                if source not in standin.objects:
+                    return self._reply(404, NO_SUCH_KEY.encode(), {"Content-Type": "application/xml"})
+                body = standin.objects[source]
+            standin.store(key, body, self.headers.get("x-amz-acl", "private"))
+        etag = hashlib.md5(body).hexdigest()
+        if copy_source:
+            xml = COPY_XML.format(modified=_timestamp(standin.modified[key]), etag=etag).encode()
+            return self._reply(200, xml, {"Content-Type": "application/xml"})
+        self._reply(200, headers={"ETag": f'"{etag}"'})
+
+    def do_GET(self):
+        key, query = self._target()
+        if not key:
+            return self._list(query)
+        acl = "acl" in query
+        standin = self._begin("GetObjectAcl" if acl else "GetObject")
+        with standin.lock:
+            body = standin.objects.get(key)
+            public = standin.acls.get(key) == "public-read"
+        if body is None:
+            return self._reply(404, NO_SUCH_KEY.encode(), {"Content-Type": "application/xml"})
+        if acl:
+            xml = ACL_XML.format(public=PUBLIC_GRANT if public else "").encode()
+            return self._reply(200, xml, {"Content-Type": "application/xml"})
+        self._reply(200, body, {"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def _list(self, query):
+        standin = self._begin("ListObjectsV2")
+        bucket = unquote(urlsplit(self.path).path.strip("/"))
+        prefix = query.get("prefix", [""])[0]
+        max_keys = int(query.get("max-keys", ["1000"])[0])
+        # The continuation token is simply the last key of the previous page.
+        after = query.get("continuation-token", query.get("start-after", [""]))[0]
+        with standin.lock:
+            keys = sorted(key for key in standin.objects if key.startswith(prefix) and key > after)
+            page = [(key, standin.objects[key], standin.modified[key]) for key in keys[:max_keys]]
+        truncated = len(keys) > max_keys
+        xml = LIST_XML.format(
+            bucket=escape(bucket),
+            prefix=escape(prefix),
+            count=len(page),
+            max_keys=max_keys,
+            truncated="true" if truncated else "false",
+            token=f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if truncated else "",
+            contents="".join(
+                LIST_ENTRY.format(
+                    key=escape(key),
+                    modified=_timestamp(modified),
+                    etag=hashlib.md5(body).hexdigest(),
+                    size=len(body),
+                )
+                for key, body, modified in page
+            ),
+        )
+        self._reply(200, xml.encode(), {"Content-Type": "application/xml"})
+
+    def do_POST(self):
+        _key, query = self._target()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if "delete" not in query:
+            return self._reply(501)
+        standin = self._begin("DeleteObjects")
+        request = ElementTree.fromstring(body)
+        keys = [element.text for element in request.iter() if element.tag.rsplit("}", 1)[-1] == "Key"]
+        quiet = any(
+            element.tag.rsplit("}", 1)[-1] == "Quiet" and element.text == "true" for element in request.iter()
+        )
+        with standin.lock:
+            for key in keys:
+                standin.objects.pop(key, None)
+                standin.acls.pop(key, None)
+                standin.modified.pop(key, None)
+        deleted = "" if quiet else "".join(f"<Deleted><Key>{escape(key)}</Key></Deleted>" for key in keys)
+        self._reply(200, DELETE_XML.format(deleted=deleted).encode(), {"Content-Type": "application/xml"})
+
+    def do_HEAD(self):
+        key, _query = self._target()
+        standin = self._begin("HeadObject")
+        with standin.lock:
+            body = standin.objects.get(key)
+        if body is None:
+            return self._reply(404)
+        self._reply(200, body, {"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+
+class LocalS3:
+    """Context manager running the stand-in on a free localhost port."""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.objects = {}
+        self.acls = {}
+        self.modified = {}
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def store(self, key, body, acl="private", modified=None):
+        """Put an object without a request, e.g. to seed a test or benchmark."""
+        self.objects[key] = body
+        self.acls[key] = acl
+        self.modified[key] = time.time() if modified is None else modified
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
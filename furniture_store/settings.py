@@ -4,6 +4,7 @@ from pathlib import Path
 from urllib.parse import urlparse
 import importlib
 import os
+import tempfile
 
 _dj_database_url_spec = importlib.util.find_spec("dj_database_url")
 if _dj_database_url_spec:
@@ -253,6 +254,8 @@ if USE_AWS:
     AWS_S3_OBJECT_PARAMETERS = {
         "CacheControl": "max-age=86400",
     }
+    # Fraction of uploads whose ACL is read back and re-applied if missing.
+    MEDIA_UPLOAD_VERIFY_RATE = config("MEDIA_UPLOAD_VERIFY_RATE", default=0.0, cast=float)
 
     STORAGES = {
         "default": {
@@ -282,6 +285,19 @@ if USE_AWS:
     WHITENOISE_USE_FINDERS = True
     WHITENOISE_AUTOREFRESH = True
 
+# Responsive product image derivatives (store.derivatives).
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+IMAGE_DERIVATIVE_FORMATS = config("IMAGE_DERIVATIVE_FORMATS", default="webp,jpeg", cast=Csv())
+IMAGE_DERIVATIVE_QUALITY = config("IMAGE_DERIVATIVE_QUALITY", default=80, cast=int)
+IMAGE_DERIVATIVE_WORKERS = config("IMAGE_DERIVATIVE_WORKERS", default=2, cast=int)
+
+# Background queue that applies public-read ACLs to uploaded product images.
+S3_ACL_WORKERS = config("S3_ACL_WORKERS", default=4, cast=int)
+S3_ACL_QUEUE_SIZE = config("S3_ACL_QUEUE_SIZE", default=1000, cast=int)
+S3_ACL_BATCH_SIZE = config("S3_ACL_BATCH_SIZE", default=25, cast=int)
+S3_ACL_MAX_ATTEMPTS = config("S3_ACL_MAX_ATTEMPTS", default=5, cast=int)
+S3_ACL_RETRY_BASE_SECONDS = config("S3_ACL_RETRY_BASE_SECONDS", default=0.5, cast=float)
+
 if not USE_AWS:
     STATIC_URL = "/static/"
     STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -308,6 +324,37 @@ if not USE_AWS:
     WHITENOISE_USE_FINDERS = True
     WHITENOISE_AUTOREFRESH = True
 
+# Store media under the SHA-256 of its content so identical uploads share one file.
+MEDIA_CONTENT_ADDRESSED = config("MEDIA_CONTENT_ADDRESSED", default=False, cast=bool)
+if MEDIA_CONTENT_ADDRESSED:
+    STORAGES["default"]["BACKEND"] = (
+        "furniture_store.storage.ContentAddressedMediaStorage"
+        if USE_AWS
+        else "furniture_store.storage.ContentAddressedFileSystemStorage"
+    )
+    print(f"[SETTINGS]   Content-addressed media: {STORAGES['default']['BACKEND']}", file=sys.stderr)
+
+
+FRAGMENT_CACHE_ALIAS = "template_fragments"
+FRAGMENT_CACHE_TIMEOUT = config("FRAGMENT_CACHE_TIMEOUT", default=86400, cast=int)
+
+# Mixed into catalog ETags so a deploy with new templates invalidates them.
+CATALOG_ETAG_RELEASE = config("HEROKU_RELEASE_VERSION", default="")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    FRAGMENT_CACHE_ALIAS: {
+        "BACKEND": config(
+            "FRAGMENT_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": config("FRAGMENT_CACHE_LOCATION", default="")
+        or os.path.join(tempfile.gettempdir(), "comfyzone-fragments"),
+        "TIMEOUT": FRAGMENT_CACHE_TIMEOUT,
+    },
+}
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -352,6 +399,12 @@ STRIPE_PUBLISHABLE_KEY = config("STRIPE_PUBLISHABLE_KEY", default="")
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="")
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="")
 
+# Stock is held for this long while a Stripe Checkout session is open. Stripe
+# requires session expiry between 30 minutes and 24 hours.
+INVENTORY_HOLD_MINUTES = config("INVENTORY_HOLD_MINUTES", default=35, cast=int)
+# Variation stock defaults to 0; enable once variations carry real counts.
+INVENTORY_TRACK_VARIATION_STOCK = config("INVENTORY_TRACK_VARIATION_STOCK", default=False, cast=bool)
+
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
@@ -384,5 +437,9 @@ LOGGING = {
             "handlers": ["console"],
             "level": "INFO",
         },
+        "furniture_store.s3_acl": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
     },
 }
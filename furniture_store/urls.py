@@ -22,10 +22,10 @@ from django.contrib.sitemaps.views import sitemap
 from django.urls import include, path
 from django.views.generic import TemplateView
 
-from core.sitemaps import ProductSitemap, StaticViewSitemap
+from core.sitemaps import StaticViewSitemap
+from core.views import product_sitemap, sitemap_index
 
 sitemaps = {
-    'products': ProductSitemap,
     'static': StaticViewSitemap,
 }
 
@@ -39,11 +39,17 @@ urlpatterns = [
     path("payments/", include("payments.urls")),
     path("reviews/", include("reviews.urls")),
     path("marketing/", include("marketing.urls")),
+    path("sitemap.xml", sitemap_index, name="sitemap_index"),
     path(
-        "sitemap.xml",
+        "sitemap-static.xml",
         sitemap,
         {"sitemaps": sitemaps},
-        name="django.contrib.sitemaps.views.sitemap",
+        name="sitemap_static",
+    ),
+    path(
+        "sitemap-products-<int:section>.xml",
+        product_sitemap,
+        name="sitemap_products",
     ),
     path(
         "robots.txt",
@@ -0,0 +1,11 @@
+"""Gunicorn settings, loaded automatically from the project root."""
+from decouple import config
+
+graceful_timeout = config("GUNICORN_GRACEFUL_TIMEOUT", default=30, cast=int)
+
+
+def worker_exit(server, worker):
+    """Finish queued S3 ACL updates before the worker process exits."""
+    from furniture_store import s3_acl
+
+    s3_acl.shutdown(timeout=max(graceful_timeout - 5, 1))
@@ -1,8 +1,15 @@
 from django.contrib import admin
-from django.http import HttpResponse
-import csv
+
+from core.exports import stream_csv
 from .models import MarketingLead, NewsletterSubscriber
 
+SUBSCRIBER_EXPORT_COLUMNS = [
+    ("Email", "email"),
+    ("Name", "name"),
+    ("Subscribed At", "subscribed_at"),
+    ("Is Active", "is_active"),
+]
+
 
 @admin.register(NewsletterSubscriber)
 class NewsletterSubscriberAdmin(admin.ModelAdmin):
@@ -14,21 +21,11 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
 
     def export_csv(self, request, queryset):
         """Export selected subscribers to CSV."""
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="newsletter_subscribers.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(["Email", "Name", "Subscribed At", "Is Active"])
-
-        for subscriber in queryset:
-            writer.writerow([
-                subscriber.email,
-                subscriber.name,
-                subscriber.subscribed_at.strftime("%Y-%m-%d %H:%M:%S"),
-                subscriber.is_active,
-            ])
-
-        return response
+        return stream_csv(
+            queryset.order_by("pk"),
+            SUBSCRIBER_EXPORT_COLUMNS,
+            "newsletter_subscribers.csv",
+        )
     export_csv.short_description = "Export selected to CSV"
 
     def export_latest(self, request, queryset):
@@ -40,22 +37,13 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
         latest_subscribers = NewsletterSubscriber.objects.filter(
             subscribed_at__gte=thirty_days_ago,
             is_active=True
-        )
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="latest_subscribers.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(["Email", "Name", "Subscribed At"])
+        ).order_by("pk")
 
-        for subscriber in latest_subscribers:
-            writer.writerow([
-                subscriber.email,
-                subscriber.name,
-                subscriber.subscribed_at.strftime("%Y-%m-%d %H:%M:%S"),
-            ])
-
-        return response
+        return stream_csv(
+            latest_subscribers,
+            SUBSCRIBER_EXPORT_COLUMNS[:3],
+            "latest_subscribers.csv",
+        )
     export_latest.short_description = "Export latest subscribers (last 30 days)"
 
 
@@ -1,6 +1,30 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Order, OrderItem
+
+from core.exports import stream_csv
+from . import inventory
+from .models import Order, OrderItem, StockReservation
+
+# One row per order line; orders without lines still get one row.
+ORDER_EXPORT_COLUMNS = [
+    ("Order Number", "order_number"),
+    ("Created At", "created_at"),
+    ("Status", "status"),
+    ("Email", "email"),
+    ("First Name", "first_name"),
+    ("Last Name", "last_name"),
+    ("Shipping City", "shipping_city"),
+    ("Shipping Country", "shipping_country"),
+    ("Order Subtotal", "subtotal"),
+    ("Tax", "tax"),
+    ("Shipping", "shipping_cost"),
+    ("Order Total", "total"),
+    ("Product SKU", "items__product_sku"),
+    ("Product Name", "items__product_name"),
+    ("Quantity", "items__quantity"),
+    ("Unit Price", "items__price"),
+    ("Line Subtotal", "items__subtotal"),
+]
 
 
 class OrderItemInline(admin.TabularInline):
@@ -24,6 +48,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ["order_number", "email", "user__email", "first_name", "last_name"]
     readonly_fields = ["order_number", "created_at", "updated_at"]
     inlines = [OrderItemInline]
+    actions = ["export_csv"]
     fieldsets = (
         ("Order Information", {
             "fields": ("order_number", "user", "email", "status", "created_at", "updated_at")
@@ -75,12 +100,23 @@ class OrderAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = "Status"
 
+    def export_csv(self, request, queryset):
+        """Export selected orders and their line items to CSV."""
+        return stream_csv(
+            queryset.order_by("pk", "items__pk"),
+            ORDER_EXPORT_COLUMNS,
+            "orders.csv",
+        )
+    export_csv.short_description = "Export selected orders with items to CSV"
+
     def save_model(self, request, obj, form, change):
         """Save the order and trigger confirmation when status changes."""
         super().save_model(request, obj, form, change)
         if change and "status" in form.changed_data:
             if obj.status == "accepted":
                 obj.send_confirmation_email()
+            elif obj.status == "cancelled":
+                inventory.release(obj, "cancelled", include_committed=True)
 
 
 @admin.register(OrderItem)
@@ -88,3 +124,15 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ["order", "product_name", "quantity", "price", "subtotal", "created_at"]
     list_filter = ["created_at"]
     search_fields = ["order__order_number", "product_name", "product_sku"]
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ["order", "product", "variation", "quantity", "status", "expires_at", "release_reason"]
+    list_filter = ["status", "release_reason"]
+    search_fields = ["order__order_number", "product__name", "product__sku"]
+    list_select_related = ["order", "product", "variation"]
+    readonly_fields = [
+        "order", "product", "variation", "quantity", "status",
+        "expires_at", "release_reason", "created_at", "updated_at",
+    ]
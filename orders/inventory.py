@@ -0,0 +1,210 @@
+"""Stock reservation for checkout.
+
+Stock is taken with conditional ``UPDATE ... SET stock = stock - n WHERE
+stock >= n`` statements, one per product (and tracked variation), inside the
+order's transaction. No row is locked before the update and rows are touched
+in id order, so concurrent checkouts on a hot product only queue for the
+duration of a single UPDATE and never deadlock; a short update count means
+someone else got there first and the whole order rolls back.
+
+The decrement is recorded as a time-limited hold (``StockReservation``) while
+the Stripe session is open. Payment commits the hold; cancel, a failure to
+create the session or expiry releases it and returns the stock. A failed
+payment keeps the hold because Checkout lets the customer retry. Every product stock change is also
+appended to the inventory ledger (``store.ledger``).
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from store import ledger
+from store.models import Product, ProductVariation
+
+from .models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+HELD = "held"
+COMMITTED = "committed"
+RELEASED = "released"
+
+
+class InsufficientStock(Exception):
+    """Raised when a product or variation cannot cover its cart lines."""
+
+    def __init__(self, item):
+        self.item = item
+        super().__init__(f"Not enough stock for {item}.")
+
+
+def hold_duration():
+    return timedelta(minutes=getattr(settings, "INVENTORY_HOLD_MINUTES", 35))
+
+
+def tracks_variation_stock():
+    """Variation stock defaults to 0, so it is only enforced when enabled."""
+    return getattr(settings, "INVENTORY_TRACK_VARIATION_STOCK", False)
+
+
+def _decrement(model, pk, quantity):
+    """Take ``quantity`` from one row if it has that much; return success."""
+    updates = {"stock": F("stock") - quantity}
+    if model is Product:
+        updates.update(updated_at=timezone.now(), cache_version=F("cache_version") + 1)
+    return model.objects.filter(pk=pk, stock__gte=quantity).update(**updates) == 1
+
+
+def _increment(model, pk, quantity):
+    updates = {"stock": F("stock") + quantity}
+    if model is Product:
+        updates.update(updated_at=timezone.now(), cache_version=F("cache_version") + 1)
+    model.objects.filter(pk=pk).update(**updates)
+
+
+def _stock_row(hold):
+    if hold.variation_id:
+        return ProductVariation, hold.variation_id
+    return Product, hold.product_id
+
+
+def _totals(lines):
+    """Sum ``(product_id, variation_ids, quantity)`` lines per stock row."""
+    products = Counter()
+    variations = Counter()
+    variation_products = {}
+    for product_id, variation_ids, quantity in lines:
+        products[product_id] += quantity
+        if tracks_variation_stock():
+            for variation_id in variation_ids or ():
+                variations[variation_id] += quantity
+                variation_products[variation_id] = product_id
+    return products, variations, variation_products
+
+
+def reserve(order, lines, hold_for=None):
+    """Decrement stock for every line and record holds for ``order``.
+
+    ``lines`` is an iterable of ``(product_id, variation_ids, quantity)``.
+    Either every line is reserved or :class:`InsufficientStock` is raised and
+    nothing is. Call it last in the checkout transaction so row locks are held
+    as briefly as possible.
+    """
+    products, variations, variation_products = _totals(lines)
+    expires_at = timezone.now() + (hold_for or hold_duration())
+    holds, movements = [], []
+    with transaction.atomic():
+        for product_id in sorted(products):
+            if not _decrement(Product, product_id, products[product_id]):
+                raise InsufficientStock(Product.objects.filter(pk=product_id).first() or product_id)
+            movements.append(ledger.movement(
+                product_id, -products[product_id], ledger.SALE, reference=order.order_number
+            ))
+            holds.append(StockReservation(
+                order=order,
+                product_id=product_id,
+                quantity=products[product_id],
+                expires_at=expires_at,
+            ))
+        for variation_id in sorted(variations):
+            if not _decrement(ProductVariation, variation_id, variations[variation_id]):
+                raise InsufficientStock(
+                    ProductVariation.objects.filter(pk=variation_id).first() or variation_id
+                )
+            holds.append(StockReservation(
+                order=order,
+                product_id=variation_products[variation_id],
+                variation_id=variation_id,
+                quantity=variations[variation_id],
+                expires_at=expires_at,
+            ))
+        StockReservation.objects.bulk_create(holds)
+        ledger.record_many(movements)
+    return holds
+
+
+def commit(order):
+    """Make an order's holds permanent once payment succeeds.
+
+    Holds released before the payment landed (other than by cancellation)
+    are taken again if the stock is still there; otherwise the shortfall is
+    logged for staff.
+    """
+    with transaction.atomic():
+        committed = StockReservation.objects.filter(order=order, status=HELD).update(
+            status=COMMITTED, updated_at=timezone.now()
+        )
+        released = StockReservation.objects.filter(order=order, status=RELEASED).exclude(
+            release_reason="cancelled"
+        )
+        for hold in released:
+            model, pk = _stock_row(hold)
+            if _decrement(model, pk, hold.quantity):
+                if model is Product:
+                    ledger.record(pk, -hold.quantity, ledger.SALE, reference=order.order_number)
+                hold.status = COMMITTED
+                hold.release_reason = ""
+                hold.save(update_fields=["status", "release_reason", "updated_at"])
+                committed += 1
+            else:
+                logger.error(
+                    "Paid order %s is short of %s x%s after its hold was released",
+                    order.order_number, model.__name__, pk,
+                )
+    return committed
+
+
+def shortfall(order):
+    """Return the holds of ``order`` that are not committed after payment."""
+    return StockReservation.objects.filter(order=order).exclude(status=COMMITTED)
+
+
+def _release(holds, reason):
+    """Return stock for holds, claiming each one so it is released only once."""
+    released = 0
+    now = timezone.now()
+    for hold in holds:
+        with transaction.atomic():
+            claimed = StockReservation.objects.filter(pk=hold.pk, status=hold.status).update(
+                status=RELEASED, release_reason=reason, updated_at=now
+            )
+            if not claimed:
+                continue
+            model, pk = _stock_row(hold)
+            _increment(model, pk, hold.quantity)
+            if model is Product:
+                ledger.record(
+                    pk,
+                    hold.quantity,
+                    ledger.RETURN if hold.status == COMMITTED else ledger.RELEASE,
+                    reference=hold.order.order_number,
+                    note=reason,
+                )
+            released += 1
+    return released
+
+
+def release(order, reason, include_committed=False):
+    """Release an order's holds (and, for cancellations, committed stock)."""
+    statuses = [HELD, COMMITTED] if include_committed else [HELD]
+    holds = StockReservation.objects.filter(order=order, status__in=statuses).select_related("order")
+    return _release(list(holds), reason)
+
+
+def release_expired(now=None, batch_size=500):
+    """Release every hold whose time is up; returns the number released."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        holds = list(
+            StockReservation.objects.filter(status=HELD, expires_at__lte=now)
+            .select_related("order")
+            .order_by("expires_at")[:batch_size]
+        )
+        if not holds:
+            return released
+        released += _release(holds, "expired")
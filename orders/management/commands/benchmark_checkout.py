@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+
+from orders import inventory
+from orders.models import Order, StockReservation
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent checkouts against a few hot products and verify that stock "
+        "is never oversold. Creates temporary products and orders and removes them "
+        "afterwards. Use PostgreSQL for meaningful throughput numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16, help="Concurrent checkout threads.")
+        parser.add_argument("--products", type=int, default=2, help="Number of hot products.")
+        parser.add_argument("--stock", type=int, default=200, help="Starting stock per product.")
+        parser.add_argument("--checkouts", type=int, default=1000, help="Total checkout attempts.")
+        parser.add_argument("--max-quantity", type=int, default=3, help="Largest quantity per line.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark rows.")
+
+    def _checkout(self, products, max_quantity):
+        with transaction.atomic():
+            order = Order.objects.create(
+                email="benchmark@example.com",
+                first_name="Bench",
+                last_name="Mark",
+                phone="0",
+                shipping_street="-",
+                shipping_city="-",
+                shipping_state="-",
+                shipping_postal_code="-",
+                subtotal=0,
+                total=0,
+                notes="benchmark_checkout",
+            )
+            lines = [
+                (product.pk, (), random.randint(1, max_quantity))
+                for product in random.sample(products, random.randint(1, len(products)))
+            ]
+            inventory.reserve(order, lines)
+
+    def _worker(self, next_attempt, products, max_quantity, results, lock):
+        counts = {"ok": 0, "short": 0, "error": 0}
+        try:
+            while next_attempt() is not None:
+                try:
+                    self._checkout(products, max_quantity)
+                    counts["ok"] += 1
+                except inventory.InsufficientStock:
+                    counts["short"] += 1
+                except OperationalError:
+                    counts["error"] += 1
+        finally:
+            connection.close()
+            with lock:
+                for key, value in counts.items():
+                    results[key] += value
+
+    def handle(self, *args, **options):
+        if options["products"] < 1 or options["workers"] < 1:
+            raise CommandError("--products and --workers must be at least 1.")
+
+        run_id = uuid.uuid4().hex[:8].upper()
+        products = [
+            Product.objects.create(
+                name=f"Benchmark item {run_id}-{index}",
+                sku=f"BENCH-{run_id}-{index}",
+                description="Temporary product created by benchmark_checkout.",
+                price=1,
+                stock=options["stock"],
+                is_active=False,
+            )
+            for index in range(options["products"])
+        ]
+
+        attempts = iter(range(options["checkouts"]))
+        attempts_lock = threading.Lock()
+
+        def next_attempt():
+            with attempts_lock:
+                return next(attempts, None)
+
+        results = {"ok": 0, "short": 0, "error": 0}
+        results_lock = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(next_attempt, products, options["max_quantity"], results, results_lock),
+            )
+            for _ in range(options["workers"])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        oversold = False
+        for product in products:
+            product.refresh_from_db()
+            held = StockReservation.objects.filter(product=product).aggregate(total=Sum("quantity"))["total"] or 0
+            balanced = product.stock >= 0 and product.stock + held == options["stock"]
+            oversold |= not balanced
+            self.stdout.write(
+                f"{product.sku}: sold {held} of {options['stock']}, {product.stock} left"
+                f"{'' if balanced else '  <-- MISMATCH'}"
+            )
+
+        attempted = sum(results.values())
+        self.stdout.write(
+            f"{attempted} checkouts by {options['workers']} workers in {elapsed:.2f}s: "
+            f"{results['ok']} reserved, {results['short']} rejected for stock, "
+            f"{results['error']} database errors; "
+            f"{attempted / elapsed if elapsed else attempted:.0f} checkouts/s."
+        )
+
+        if not options["keep"]:
+            Order.objects.filter(notes="benchmark_checkout", reservations__product__in=products).delete()
+            Order.objects.filter(notes="benchmark_checkout", reservations__isnull=True).delete()
+            for product in products:
+                product.delete()
+
+        if oversold:
+            raise CommandError("Stock did not balance: the benchmark detected overselling.")
+        self.stdout.write(self.style.SUCCESS("No overselling detected."))
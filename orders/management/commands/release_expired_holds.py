@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from orders import inventory
+
+
+class Command(BaseCommand):
+    help = "Return stock held by checkouts whose hold has expired. Run every few minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of holds loaded per query.",
+        )
+
+    def handle(self, *args, **options):
+        released = inventory.release_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired holds."))
@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.core.mail import send_mail
-from store.models import Product
+from store.models import Product, ProductVariation
 from accounts.models import Address
 import uuid
 
@@ -153,3 +153,45 @@ class OrderItem(models.Model):
             self.product_sku = self.product.sku
         self.subtotal = self.price * self.quantity
         super().save(*args, **kwargs)
+
+
+class StockReservation(models.Model):
+    """Stock taken from a product or variation for an order.
+
+    The stock is decremented when the hold is created; a hold is committed
+    when payment succeeds or released (stock returned) on cancel, failure or
+    expiry. ``variation`` is null for the product-level row.
+    """
+
+    STATUS_CHOICES = [
+        ("held", "Held"),
+        ("committed", "Committed"),
+        ("released", "Released"),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="reservations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    variation = models.ForeignKey(
+        ProductVariation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="reservations",
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="held")
+    expires_at = models.DateTimeField()
+    release_reason = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="orders_reservation_expiry_idx"),
+        ]
+
+    def __str__(self):
+        """Return the reserved item, quantity and status."""
+        target = self.variation or self.product
+        return f"{target} x{self.quantity} ({self.status})"
@@ -1,7 +1,207 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.utils import timezone
 
-class OrdersTests(TestCase):
-    """Placeholder orders test suite."""
+from payments.models import Payment
+from payments.views import (
+    handle_checkout_session_completed,
+    handle_payment_intent_failed,
+    handle_payment_intent_succeeded,
+)
+from store import ledger
+from store.models import Category, Product, ProductVariation
 
-    pass
+from . import inventory
+from .models import Order, StockReservation
+from .views import create_order_from_cart
+
+
+def make_order():
+    return Order.objects.create(
+        email="buyer@example.com",
+        first_name="Ada",
+        last_name="Buyer",
+        phone="555",
+        shipping_street="1 Main St",
+        shipping_city="Springfield",
+        shipping_state="IL",
+        shipping_postal_code="62701",
+        subtotal=0,
+        total=0,
+    )
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Dining")
+        self.table = Product.objects.create(
+            name="Oak Table", description="Table", price=400, stock=3, category=category
+        )
+        self.chair = Product.objects.create(
+            name="Oak Chair", description="Chair", price=90, stock=8, category=category
+        )
+
+    def test_guest_order_prices_session_lines(self):
+        leaf = ProductVariation.objects.create(
+            product=self.table, variation_type="size", name="Extra leaf", price_adjustment=50, stock=2
+        )
+        request = RequestFactory().post("/checkout/", {"email": "guest@example.com", "first_name": "Guest", "last_name": "User", "phone": "555"})
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        request.session["cart"] = {
+            f"{self.table.pk}_{leaf.pk}": {"product_id": self.table.pk, "quantity": 1, "variation_ids": [leaf.pk]},
+            str(self.chair.pk): {"product_id": self.chair.pk, "quantity": 4, "variation_ids": []},
+        }
+
+        order = create_order_from_cart(request)
+
+        self.assertEqual(order.subtotal, 810)
+        self.assertEqual(
+            sorted(order.items.values_list("product_name", "price", "subtotal")),
+            [("Oak Chair", 90, 360), ("Oak Table", 450, 450)],
+        )
+        self.assertEqual(request.session["cart"], {})
+        self.chair.refresh_from_db()
+        self.assertEqual(self.chair.stock, 4)
+
+    def test_reserve_takes_stock_and_records_holds(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 2), (self.chair.pk, [], 4), (self.chair.pk, [], 2)])
+
+        self.table.refresh_from_db()
+        self.chair.refresh_from_db()
+        self.assertEqual((self.table.stock, self.chair.stock), (1, 2))
+        holds = {hold.product_id: hold.quantity for hold in order.reservations.all()}
+        self.assertEqual(holds, {self.table.pk: 2, self.chair.pk: 6})
+
+    def test_short_line_rolls_back_every_line(self):
+        order = make_order()
+        with self.assertRaises(inventory.InsufficientStock) as raised:
+            inventory.reserve(order, [(self.chair.pk, [], 1), (self.table.pk, [], 4)])
+
+        self.assertEqual(raised.exception.item, self.table)
+        self.chair.refresh_from_db()
+        self.assertEqual(self.chair.stock, 8)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_release_returns_stock_once(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 3)])
+
+        self.assertEqual(inventory.release(order, "cancelled"), 1)
+        self.assertEqual(inventory.release(order, "cancelled"), 0)
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 3)
+        reasons = list(self.table.movements.order_by("id").values_list("delta", "reason"))
+        self.assertEqual(reasons, [(3, ledger.RESTOCK), (-3, ledger.SALE), (3, ledger.RELEASE)])
+
+    def test_commit_keeps_stock_until_cancelled_with_committed(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 2)])
+        inventory.commit(order)
+
+        self.assertEqual(inventory.release(order, "cancelled"), 0)
+        self.assertEqual(inventory.release(order, "cancelled", include_committed=True), 1)
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 3)
+
+    def test_release_expired_and_late_payment(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 2)], hold_for=timedelta(minutes=-1))
+        fresh = make_order()
+        inventory.reserve(fresh, [(self.chair.pk, [], 1)])
+
+        out = StringIO()
+        call_command("release_expired_holds", stdout=out)
+        self.assertIn("Released 1 expired holds", out.getvalue())
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 3)
+        self.assertEqual(fresh.reservations.get().status, inventory.HELD)
+
+        # Payment arriving after expiry takes the stock again while it lasts.
+        self.assertEqual(inventory.commit(order), 1)
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 1)
+        self.assertEqual(order.reservations.get().status, inventory.COMMITTED)
+
+    def test_failed_then_paid_keeps_the_stock_taken(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 2)])
+        Payment.objects.create(order=order, transaction_id="pi_retry", stripe_payment_intent_id="pi_retry", amount=800)
+
+        handle_payment_intent_failed({"id": "pi_retry", "last_payment_error": {"message": "Card declined"}})
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 1)
+        self.assertEqual(order.reservations.get().status, inventory.HELD)
+
+        handle_payment_intent_succeeded({"id": "pi_retry"})
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 1)
+        self.assertEqual(order.reservations.get().status, inventory.COMMITTED)
+
+    def test_commit_retakes_holds_released_other_than_by_cancelling(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 2)])
+        inventory.release(order, "payment_failed")
+        self.assertEqual(inventory.commit(order), 1)
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.stock, 1)
+
+        cancelled = make_order()
+        inventory.reserve(cancelled, [(self.table.pk, [], 1)])
+        inventory.release(cancelled, "cancelled")
+        self.assertEqual(inventory.commit(cancelled), 0)
+
+    def test_payment_for_cancelled_or_short_order_is_flagged(self):
+        cancelled = make_order()
+        inventory.reserve(cancelled, [(self.table.pk, [], 1)])
+        inventory.release(cancelled, "cancelled")
+        cancelled.status = "cancelled"
+        cancelled.save()
+        Payment.objects.create(order=cancelled, transaction_id="cs_1", amount=400)
+
+        handle_checkout_session_completed({"metadata": {"order_number": cancelled.order_number}})
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, "cancelled")
+        self.assertIn("restock or refund", cancelled.notes)
+
+        expired = make_order()
+        inventory.reserve(expired, [(self.table.pk, [], 3)])
+        inventory.release(expired, "expired")
+        Product.objects.filter(pk=self.table.pk).update(stock=1)
+        Payment.objects.create(order=expired, transaction_id="cs_2", amount=1200)
+
+        handle_checkout_session_completed({"metadata": {"order_number": expired.order_number}})
+        handle_checkout_session_completed({"metadata": {"order_number": expired.order_number}})
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, "new")
+        self.assertEqual(expired.notes.count("restock or refund"), 1)
+
+    def test_release_expired_ignores_future_holds(self):
+        order = make_order()
+        inventory.reserve(order, [(self.table.pk, [], 1)])
+        self.assertEqual(inventory.release_expired(now=timezone.now()), 0)
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    def test_benchmark_never_oversells(self):
+        out = StringIO()
+        call_command(
+            "benchmark_checkout",
+            workers=4,
+            products=2,
+            stock=5,
+            checkouts=40,
+            keep=True,
+            stdout=out,
+        )
+        self.assertIn("No overselling detected", out.getvalue())
+        for product in Product.objects.filter(sku__startswith="BENCH-"):
+            held = sum(product.reservations.values_list("quantity", flat=True))
+            self.assertGreaterEqual(product.stock, 0)
+            self.assertEqual(product.stock + held, 5)
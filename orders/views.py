@@ -3,10 +3,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
+from . import inventory
 from .models import Order, OrderItem
 from cart.models import Cart, CartItem
-from cart.utils import get_cart, get_session_cart, get_session_cart_total
-from store.models import Product
+from cart.utils import get_cart, get_session_cart_summary
 from accounts.models import Address
 
 
@@ -29,26 +29,11 @@ def create_order_from_cart(request, shipping_address_id=None, billing_address_id
     with transaction.atomic():
         if request.user.is_authenticated:
             cart = get_cart(request)
-            if not cart or not cart.items.exists():
-                return None
-            
-            cart_items = cart.items.all()
+            summary = cart.summary() if cart else None
         else:
-            session_cart = get_session_cart(request)
-            if not session_cart:
-                return None
-            
-            cart_items = []
-            for item_data in session_cart.values():
-                try:
-                    product = Product.objects.get(id=item_data["product_id"])
-                    cart_items.append({
-                        "product": product,
-                        "quantity": item_data["quantity"],
-                        "variations": item_data.get("variation_ids", []),
-                    })
-                except Product.DoesNotExist:
-                    continue
+            summary = get_session_cart_summary(request)
+        if not summary:
+            return None
 
         if request.user.is_authenticated:
             if shipping_address_id:
@@ -70,13 +55,7 @@ def create_order_from_cart(request, shipping_address_id=None, billing_address_id
             last_name = request.POST.get("last_name")
             phone = request.POST.get("phone")
 
-        subtotal = Decimal("0")
-        if request.user.is_authenticated:
-            for item in cart_items:
-                subtotal += Decimal(item.get_subtotal())
-        else:
-            subtotal = Decimal(get_session_cart_total(request))
-        
+        subtotal = summary.total
         tax_rate = Decimal("0.1")
         tax = subtotal * tax_rate
         shipping_cost = Decimal("0")
@@ -101,40 +80,27 @@ def create_order_from_cart(request, shipping_address_id=None, billing_address_id
             notes=request.POST.get("notes", ""),
         )
 
-        if request.user.is_authenticated:
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.get_item_price(),
-                    subtotal=cart_item.get_subtotal(),
-                )
-        else:
-            for item_data in cart_items:
-                product = item_data["product"]
-                quantity = item_data["quantity"]
-                price = product.price
-
-                if item_data.get("variations"):
-                    from store.models import ProductVariation
-                    variations = ProductVariation.objects.filter(id__in=item_data["variations"])
-                    price += sum(v.price_adjustment for v in variations)
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=price,
-                    subtotal=price * quantity,
-                )
+        for line in summary:
+            OrderItem.objects.create(
+                order=order,
+                product=line.product,
+                quantity=line.quantity,
+                price=line.item_price,
+                subtotal=line.subtotal,
+            )
 
+        lines = [(line.product.pk, line.variation_ids, line.quantity) for line in summary]
         if request.user.is_authenticated:
             cart.clear()
-        else:
+
+        # Last writes of the transaction, so hot product rows stay locked briefly.
+        # Raises InsufficientStock, rolling the order back, if a line is short.
+        inventory.reserve(order, lines)
+
+        if not request.user.is_authenticated:
             request.session["cart"] = {}
             request.session.modified = True
 
-        order.send_confirmation_email()
+        transaction.on_commit(order.send_confirmation_email)
 
         return order
@@ -8,62 +8,54 @@ from django.views.decorators.http import require_http_methods
 from decimal import Decimal
 import stripe
 import json
+import logging
 
+from orders import inventory
 from orders.models import Order
 from orders.views import create_order_from_cart
 from .models import Payment
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+logger = logging.getLogger(__name__)
+
+SHORTFALL_NOTE = "Paid after its stock was released: restock or refund before shipping."
+
+
+def accept_paid_order(order):
+    """Commit a paid order's stock and accept it; return False if it cannot be filled.
+
+    An order cancelled before the payment landed, or whose released holds
+    could not be taken again, is not accepted and is flagged for staff.
+    """
+    inventory.commit(order)
+    if order.status != "cancelled" and not inventory.shortfall(order).exists():
+        if order.status == "new":
+            order.status = "accepted"
+            order.save()
+        return True
+    logger.error("Order %s was paid but its stock could not be committed", order.order_number)
+    if SHORTFALL_NOTE not in order.notes:
+        order.notes = f"{order.notes}\n{SHORTFALL_NOTE}".strip()
+        order.save()
+    return False
+
 
 def checkout_view(request):
     """Checkout page view."""
-    from cart.utils import get_cart, get_session_cart
-    from cart.models import CartItem
-    from store.models import Product
+    from cart.utils import get_cart, get_session_cart_summary
 
     if request.user.is_authenticated:
         cart = get_cart(request)
-        if not cart or not cart.items.exists():
-            messages.warning(request, "Your cart is empty.")
-            return redirect("cart:view")
-        items = []
-        for cart_item in cart.items.all():
-            items.append({
-                "product": cart_item.product,
-                "quantity": cart_item.quantity,
-                "subtotal": cart_item.get_subtotal(),
-            })
-        total = cart.get_total()
+        summary = cart.summary() if cart else None
     else:
-        session_cart = get_session_cart(request)
-        if not session_cart:
-            messages.warning(request, "Your cart is empty.")
-            return redirect("cart:view")
-        
-        items = []
-        total = Decimal('0')
-        for item_data in session_cart.values():
-            try:
-                product = Product.objects.get(id=item_data["product_id"])
-                quantity = item_data["quantity"]
-                price = product.price
-
-                if item_data.get("variation_ids"):
-                    from store.models import ProductVariation
-                    variations = ProductVariation.objects.filter(id__in=item_data["variation_ids"])
-                    price += sum(Decimal(str(v.price_adjustment)) for v in variations)
-
-                items.append({
-                    "product": product,
-                    "quantity": quantity,
-                    "price": price,
-                    "subtotal": price * quantity,
-                })
-                total += price * quantity
-            except Product.DoesNotExist:
-                continue
-    
+        summary = get_session_cart_summary(request)
+    if not summary:
+        messages.warning(request, "Your cart is empty.")
+        return redirect("cart:view")
+    items = summary.lines
+    total = summary.total
+
     addresses = []
     if request.user.is_authenticated:
         try:
@@ -95,12 +87,22 @@ def checkout_view(request):
 def create_checkout_session(request):
     """Create Stripe checkout session."""
     try:
-        from orders.views import create_order_from_cart
         shipping_address_id = request.POST.get("shipping_address_id")
         order = create_order_from_cart(request, shipping_address_id=shipping_address_id)
 
         if not order:
             return JsonResponse({"error": "Failed to create order"}, status=400)
+    except inventory.InsufficientStock as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        session_options = {}
+        hold_expires_at = order.reservations.values_list("expires_at", flat=True).first()
+        if hold_expires_at:
+            # The session closes when the stock hold runs out.
+            session_options["expires_at"] = int(hold_expires_at.timestamp())
 
         line_items = []
         for item in order.items.all():
@@ -147,11 +149,12 @@ def create_checkout_session(request):
             line_items=line_items,
             mode="payment",
             success_url=request.build_absolute_uri(f"/payments/success/?order={order.order_number}"),
-            cancel_url=request.build_absolute_uri("/payments/cancel/"),
+            cancel_url=request.build_absolute_uri(f"/payments/cancel/?order={order.order_number}"),
             customer_email=order.email,
             metadata={
                 "order_number": order.order_number,
             },
+            **session_options,
         )
 
         Payment.objects.create(
@@ -163,9 +166,11 @@ def create_checkout_session(request):
             status="pending",
         )
 
+        request.session["pending_order"] = order.order_number
         return JsonResponse({"sessionId": checkout_session.id})
 
     except Exception as e:
+        inventory.release(order, "failed")
         return JsonResponse({"error": str(e)}, status=400)
 
 
@@ -181,8 +186,12 @@ def payment_success(request):
                 payment.status = "completed"
                 payment.save()
                 
-                order.status = "accepted"
-                order.save()
+                if not accept_paid_order(order):
+                    messages.warning(
+                        request,
+                        "Your payment was received, but some items are no longer available. "
+                        "We will contact you shortly.",
+                    )
             
             return render(request, "payments/success.html", {"order": order})
         except Order.DoesNotExist:
@@ -193,6 +202,14 @@ def payment_success(request):
 
 def payment_cancel(request):
     """Payment cancel page."""
+    order_number = request.GET.get("order")
+    if order_number and request.session.get("pending_order") == order_number:
+        order = Order.objects.filter(order_number=order_number, status="new").first()
+        if order:
+            inventory.release(order, "cancelled")
+            order.status = "cancelled"
+            order.save()
+        del request.session["pending_order"]
     messages.info(request, "Payment was cancelled.")
     return render(request, "payments/cancel.html")
 
@@ -222,6 +239,9 @@ def stripe_webhook(request):
     elif event["type"] == "payment_intent.payment_failed":
         payment_intent = event["data"]["object"]
         handle_payment_intent_failed(payment_intent)
+    elif event["type"] == "checkout.session.expired":
+        session = event["data"]["object"]
+        handle_checkout_session_expired(session)
     
     return HttpResponse(status=200)
 
@@ -239,12 +259,21 @@ def handle_checkout_session_completed(session):
                 payment.stripe_payment_intent_id = session.get("payment_intent", "")
                 payment.save()
                 
-                order.status = "accepted"
-                order.save()
+                accept_paid_order(order)
         except Order.DoesNotExist:
             pass
 
 
+def handle_checkout_session_expired(session):
+    """Return held stock when a checkout session expires unpaid."""
+    order_number = session.get("metadata", {}).get("order_number")
+    order = Order.objects.filter(order_number=order_number, status="new").first()
+    if order:
+        inventory.release(order, "expired")
+        order.status = "cancelled"
+        order.save()
+
+
 def handle_payment_intent_succeeded(payment_intent):
     """Handle successful payment intent."""
     payment_intent_id = payment_intent.get("id")
@@ -253,15 +282,17 @@ def handle_payment_intent_succeeded(payment_intent):
         payment.status = "completed"
         payment.save()
         
-        order = payment.order
-        order.status = "accepted"
-        order.save()
+        accept_paid_order(payment.order)
     except Payment.DoesNotExist:
         pass
 
 
 def handle_payment_intent_failed(payment_intent):
-    """Handle failed payment intent."""
+    """Handle failed payment intent.
+
+    Stock stays held: Checkout lets the customer retry in the same session,
+    and the hold is released when the session expires.
+    """
     payment_intent_id = payment_intent.get("id")
     try:
         payment = Payment.objects.get(stripe_payment_intent_id=payment_intent_id)
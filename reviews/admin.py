@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from store.models import Product
 from .models import Review
 
 
@@ -37,11 +38,15 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ["approve_reviews", "reject_reviews"]
 
     def approve_reviews(self, request, queryset):
-        queryset.update(is_approved=True)
-        self.message_user(request, f"{queryset.count()} reviews approved.")
+        product_ids = set(queryset.values_list("product_id", flat=True))
+        updated = queryset.update(is_approved=True)
+        Product.objects.recompute_ratings(product_ids)
+        self.message_user(request, f"{updated} reviews approved.")
     approve_reviews.short_description = "Approve selected reviews"
 
     def reject_reviews(self, request, queryset):
-        queryset.update(is_approved=False)
-        self.message_user(request, f"{queryset.count()} reviews rejected.")
+        product_ids = set(queryset.values_list("product_id", flat=True))
+        updated = queryset.update(is_approved=False)
+        Product.objects.recompute_ratings(product_ids)
+        self.message_user(request, f"{updated} reviews rejected.")
     reject_reviews.short_description = "Reject selected reviews"
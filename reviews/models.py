@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from store.models import Product
@@ -37,12 +39,25 @@ class Review(models.Model):
         unique_together = ["product", "user"]
         ordering = ["-created_at"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the published rating so saves can apply an incremental delta."""
+        instance = super().from_db(db, field_names, values)
+        instance._published_rating = instance.get_published_rating()
+        return instance
+
     def __str__(self):
         """Return the reviewer, product, and rating summary."""
         return f"{self.user.email} - {self.product.name} - {self.rating} stars"
 
+    def get_published_rating(self):
+        """Return (product_id, rating) when the review counts towards aggregates."""
+        if self.is_approved:
+            return (self.product_id, self.rating)
+        return None
+
     def save(self, *args, **kwargs):
-        """Persist review, marking verified purchases and refreshing product data."""
+        """Persist review, marking verified purchases."""
         if not self.pk:
             from orders.models import OrderItem
             has_purchased = OrderItem.objects.filter(
@@ -53,4 +68,34 @@ class Review(models.Model):
 
         super().save(*args, **kwargs)
 
-        self.product.save()
+
+@receiver(post_save, sender=Review)
+def update_product_rating_on_save(sender, instance, raw=False, **kwargs):
+    """Apply the rating delta of a created, approved, edited or unpublished review."""
+    if raw:
+        return
+    previous = getattr(instance, "_published_rating", None)
+    current = instance.get_published_rating()
+    instance._published_rating = current
+    if previous is None and current is None:
+        return
+
+    if previous and current and previous[0] != current[0]:
+        Product.objects.apply_rating_change(previous[0], old_rating=previous[1])
+        Product.objects.apply_rating_change(current[0], new_rating=current[1])
+        return
+
+    product_id = (current or previous)[0]
+    Product.objects.apply_rating_change(
+        product_id,
+        old_rating=previous[1] if previous else None,
+        new_rating=current[1] if current else None,
+    )
+
+
+@receiver(post_delete, sender=Review)
+def update_product_rating_on_delete(sender, instance, **kwargs):
+    """Remove a deleted review from the stored aggregates."""
+    previous = getattr(instance, "_published_rating", instance.get_published_rating())
+    if previous:
+        Product.objects.apply_rating_change(previous[0], old_rating=previous[1])
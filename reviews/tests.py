@@ -78,3 +78,63 @@ class ReviewManageViewTests(TestCase):
         )
         self.assertRedirects(response, reverse("store:product_detail", kwargs={"slug": self.product.slug}))
         self.assertFalse(Review.objects.filter(product=self.product, user=self.user).exists())
+
+
+class ProductRatingAggregateTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Oak Table",
+            description="Solid oak",
+            price=499,
+            stock=3,
+        )
+        self.users = [
+            User.objects.create_user(email=f"reviewer{i}@example.com", password="password123")
+            for i in range(3)
+        ]
+
+    def _review(self, user, rating, is_approved=True):
+        return Review.objects.create(
+            product=self.product,
+            user=user,
+            rating=rating,
+            comment="Review",
+            is_approved=is_approved,
+        )
+
+    def test_aggregates_follow_review_lifecycle(self):
+        first = self._review(self.users[0], 5)
+        pending = self._review(self.users[1], 1, is_approved=False)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.get_review_count(), 1)
+        self.assertEqual(self.product.get_average_rating(), 5)
+
+        pending.is_approved = True
+        pending.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.get_average_rating(), 3)
+
+        first = Review.objects.get(pk=first.pk)
+        first.rating = 4
+        first.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.get_average_rating(), 2.5)
+        self.assertEqual(self.product.rating_4_count, 1)
+        self.assertEqual(self.product.rating_5_count, 0)
+
+        Review.objects.get(pk=pending.pk).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.get_rating_histogram()[1], (4, 1))
+
+    def test_recompute_matches_incremental_updates(self):
+        self._review(self.users[0], 5)
+        self._review(self.users[1], 2)
+        Review.objects.filter(product=self.product).update(is_approved=False)
+        self._review(self.users[2], 3)
+
+        Product.objects.recompute_ratings()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.get_average_rating(), 3)
@@ -1,6 +1,36 @@
+from django import forms
 from django.contrib import admin
-from django.utils.html import format_html
-from .models import Category, Product, ProductImage, ProductVariation
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+
+from core.exports import stream_csv
+from .forms import StockDeltaMixin
+from .models import Category, InventoryMovement, Product, ProductImage, ProductVariation
+
+STOCK_HISTORY_LIMIT = 10
+MOVEMENT_COUNT_LIMIT = 10000
+
+# One row per variation; products without variations still get one row.
+PRODUCT_EXPORT_COLUMNS = [
+    ("ID", "id"),
+    ("SKU", "sku"),
+    ("Name", "name"),
+    ("Category", "category__name"),
+    ("Price", "price"),
+    ("Compare At Price", "compare_at_price"),
+    ("Stock", "stock"),
+    ("Is Active", "is_active"),
+    ("Updated At", "updated_at"),
+    ("Variation Type", "variations__variation_type"),
+    ("Variation Name", "variations__name"),
+    ("Variation SKU", "variations__sku"),
+    ("Variation Price Adjustment", "variations__price_adjustment"),
+    ("Variation Stock", "variations__stock"),
+    ("Variation Is Active", "variations__is_active"),
+]
 
 
 class ProductImageInline(admin.TabularInline):
@@ -15,10 +45,37 @@ class ProductVariationInline(admin.TabularInline):
     fields = ["variation_type", "name", "value", "price_adjustment", "stock", "sku", "is_active"]
 
 
+class ProductAdminForm(StockDeltaMixin, forms.ModelForm):
+    stock_reason = forms.ChoiceField(
+        choices=[
+            (InventoryMovement.RESTOCK, "Restock"),
+            (InventoryMovement.ADJUSTMENT, "Adjustment"),
+            (InventoryMovement.RETURN, "Return"),
+        ],
+        initial=InventoryMovement.ADJUSTMENT,
+        required=False,
+        help_text="Recorded in the inventory ledger when stock changes.",
+    )
+    stock_note = forms.CharField(max_length=255, required=False)
+
+    class Meta:
+        model = Product
+        fields = "__all__"
+
+
+class CappedCountPaginator(Paginator):
+    """Counts at most ``MOVEMENT_COUNT_LIMIT`` rows instead of the whole ledger."""
+
+    @cached_property
+    def count(self):
+        return self.object_list[:MOVEMENT_COUNT_LIMIT].count()
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ["name", "parent", "is_active", "created_at"]
+    list_display = ["name", "get_full_path", "is_active", "created_at"]
     list_filter = ["is_active", "parent"]
+    ordering = ["path"]
     search_fields = ["name", "description"]
     prepopulated_fields = {"slug": ("name",)}
 
@@ -38,13 +95,24 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ["is_active", "is_featured", "category", "created_at"]
     search_fields = ["name", "description", "sku"]
     prepopulated_fields = {"slug": ("name",)}
+    form = ProductAdminForm
     inlines = [ProductImageInline, ProductVariationInline]
+    actions = ["export_csv"]
+    readonly_fields = ["stock_history"]
     fieldsets = (
         ("Basic Information", {
             "fields": ("name", "slug", "category", "description", "short_description")
         }),
         ("Pricing & Inventory", {
-            "fields": ("price", "compare_at_price", "stock", "sku")
+            "fields": (
+                "price",
+                "compare_at_price",
+                "stock",
+                "stock_reason",
+                "stock_note",
+                "stock_history",
+                "sku",
+            )
         }),
         ("Status", {
             "fields": ("is_active", "is_featured")
@@ -65,6 +133,52 @@ class ProductAdmin(admin.ModelAdmin):
         return "No image"
     image_preview.short_description = "Image"
 
+    def save_model(self, request, obj, form, change):
+        """Apply the stock edit as a delta to the locked row and describe it for the ledger."""
+        obj._stock_reason = form.cleaned_data.get("stock_reason")
+        obj._stock_note = form.cleaned_data.get("stock_note", "")
+        obj._stock_user = request.user
+        with transaction.atomic():
+            if change:
+                form.apply_stock_delta(obj)
+            super().save_model(request, obj, form, change)
+
+    def stock_history(self, obj):
+        if not obj.pk:
+            return "-"
+        movements = obj.movements.select_related("created_by")[:STOCK_HISTORY_LIMIT]
+        rows = format_html_join(
+            "",
+            "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>",
+            (
+                (
+                    movement.created_at.strftime("%Y-%m-%d %H:%M"),
+                    f"{movement.delta:+d}",
+                    movement.get_reason_display(),
+                    movement.reference or movement.note,
+                    movement.created_by or "",
+                )
+                for movement in movements
+            ),
+        )
+        url = reverse("admin:store_inventorymovement_changelist")
+        return format_html(
+            '<table>{}</table><a href="{}?product__id__exact={}">Full history</a>',
+            rows,
+            url,
+            obj.pk,
+        )
+    stock_history.short_description = "Recent stock movements"
+
+    def export_csv(self, request, queryset):
+        """Export selected products with their variations and stock to CSV."""
+        return stream_csv(
+            queryset.order_by("pk", "variations__pk"),
+            PRODUCT_EXPORT_COLUMNS,
+            "products.csv",
+        )
+    export_csv.short_description = "Export selected products with variations to CSV"
+
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
@@ -85,3 +199,26 @@ class ProductVariationAdmin(admin.ModelAdmin):
     list_display = ["product", "variation_type", "name", "price_adjustment", "stock", "is_active"]
     list_filter = ["variation_type", "is_active"]
     search_fields = ["product__name", "name", "sku"]
+
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    """Read-only ledger; rows are only ever appended by stock changes."""
+
+    list_display = ["created_at", "product", "delta", "reason", "reference", "note", "created_by"]
+    list_filter = ["reason"]
+    list_select_related = ["product", "created_by"]
+    search_fields = ["=product__sku", "=reference"]
+    raw_id_fields = ["product"]
+    ordering = ["-id"]
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
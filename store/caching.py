@@ -0,0 +1,168 @@
+"""Versioned HTML fragment cache for product cards and detail sections.
+
+Fragments are keyed by product id, ``Product.cache_version`` and
+``updated_at``, so any change that bumps the version makes the old HTML
+unreachable instead of having to find and delete it. The fragment cache is a
+regular Django cache alias (file, database, memcached or Redis) shared by all
+workers; hit/miss counters are kept per process and flushed to it in batches.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+STATS_KEYS = {"hit": "fragment-stats:hits", "miss": "fragment-stats:misses"}
+STATS_FLUSH_EVERY = 50
+CATALOG_VERSION_KEY = "catalog-version"
+CATEGORY_VERSION_KEY = "category-version:{}"
+
+_local_stats = {"hit": 0, "miss": 0}
+_stats_lock = threading.Lock()
+
+
+def get_fragment_cache():
+    """Return the cache backend that stores rendered fragments."""
+    return caches[getattr(settings, "FRAGMENT_CACHE_ALIAS", "default")]
+
+
+def get_fragment_timeout():
+    return getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 86400)
+
+
+def product_fragment_key(name, product, vary_on=()):
+    """Build the cache key for a product fragment."""
+    updated = product.updated_at.timestamp() if product.updated_at else 0
+    parts = [str(part) for part in vary_on]
+    digest = hashlib.md5(":".join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f"fragment:{name}:{product.pk}:{product.cache_version}:{updated:.6f}:{digest}"
+
+
+def bump_product_versions(product_ids):
+    """Invalidate every cached fragment of the given products."""
+    from .models import Product
+
+    product_ids = {pk for pk in product_ids if pk is not None}
+    if not product_ids:
+        return 0
+    bump_catalog_version()
+    return Product.objects.filter(pk__in=product_ids).update(
+        cache_version=F("cache_version") + 1
+    )
+
+
+def _get_counter(key):
+    """Return a version counter, seeded from the clock on first use.
+
+    Seeding from the clock means a flushed or evicted cache never hands out
+    a value an earlier key or validator was built from.
+    """
+    cache = get_fragment_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_counter(key):
+    cache = get_fragment_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        _get_counter(key)
+        return cache.incr(key)
+
+
+def get_catalog_version():
+    """Return the shared counter that changes on every catalog write."""
+    return _get_counter(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidate conditional-GET validators of every catalog page."""
+    return _bump_counter(CATALOG_VERSION_KEY)
+
+
+def get_category_version(category_id):
+    """Return the counter that changes when products join, leave or hide from a category."""
+    return _get_counter(CATEGORY_VERSION_KEY.format(category_id))
+
+
+def bump_category_versions(category_ids):
+    """Invalidate cached product lists of the given categories."""
+    for category_id in {pk for pk in category_ids if pk is not None}:
+        _bump_counter(CATEGORY_VERSION_KEY.format(category_id))
+
+
+def record_lookup(outcome):
+    """Count a cache hit or miss, flushing to the shared cache in batches."""
+    with _stats_lock:
+        _local_stats[outcome] += 1
+        if sum(_local_stats.values()) < STATS_FLUSH_EVERY:
+            return
+        pending = dict(_local_stats)
+        _local_stats.update(hit=0, miss=0)
+    _flush(pending)
+
+
+def flush_stats():
+    """Push locally buffered counters to the shared cache."""
+    with _stats_lock:
+        pending = dict(_local_stats)
+        _local_stats.update(hit=0, miss=0)
+    _flush(pending)
+
+
+def _flush(pending):
+    cache = get_fragment_cache()
+    for outcome, count in pending.items():
+        if not count:
+            continue
+        key = STATS_KEYS[outcome]
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key, count)
+
+
+def get_stats():
+    """Return hit/miss totals across all workers plus this process's buffer."""
+    flush_stats()
+    cache = get_fragment_cache()
+    hits = cache.get(STATS_KEYS["hit"], 0)
+    misses = cache.get(STATS_KEYS["miss"], 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _local_stats.update(hit=0, miss=0)
+    get_fragment_cache().delete_many(list(STATS_KEYS.values()))
+
+
+def get_or_render(name, product, render, vary_on=()):
+    """Return cached HTML for a product fragment, rendering it on a miss."""
+    cache = get_fragment_cache()
+    key = product_fragment_key(name, product, vary_on)
+    html = cache.get(key)
+    if html is not None:
+        record_lookup("hit")
+        return html
+
+    record_lookup("miss")
+    html = render()
+    cache.set(key, html, get_fragment_timeout())
+    logger.debug("Fragment cache miss", extra={"fragment": name, "product": product.pk})
+    return html
@@ -0,0 +1,87 @@
+"""Conditional GET (ETag) for anonymous catalog pages.
+
+ETags are built from ``max(updated_at)`` of products and categories plus
+the shared catalog version counter, so checking them costs one or two indexed
+queries. No Last-Modified is sent: deleting or deactivating a product, a new
+image or a review does not advance any timestamp, so If-Modified-Since alone
+would get a stale 304. On a match Django's ``condition`` answers 304 without calling the
+view, so no template is rendered. Signed-in visitors and requests carrying
+flash messages always get a fresh page because their HTML is personalised.
+A guest's session cart (shown in the header badge) is folded into the ETag.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .caching import get_catalog_version
+from .models import Category, Product
+
+
+def _etag(*parts):
+    release = getattr(settings, "CATALOG_ETAG_RELEASE", "")
+    raw = ":".join(str(part) for part in (release, *parts))
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def catalog_validators(request, *args, **kwargs):
+    """Return an ETag covering every product and category."""
+    product_max = Product.objects.aggregate(latest=Max("updated_at"))["latest"]
+    category_max = Category.objects.aggregate(latest=Max("updated_at"))["latest"]
+    return _etag("catalog", get_catalog_version(), product_max, category_max)
+
+
+def product_validators(request, slug):
+    """Return the ETag of one product detail page.
+
+    The product's own ``cache_version`` covers its images, variations and
+    reviews; the catalog version covers related products.
+    """
+    row = (
+        Product.objects.filter(slug=slug, is_active=True)
+        .values_list("pk", "updated_at", "cache_version")
+        .first()
+    )
+    if row is None:
+        return None
+    pk, updated_at, cache_version = row
+    return _etag("product", pk, cache_version, updated_at, get_catalog_version())
+
+
+def is_conditional_request_allowed(request):
+    """Return True when the response is the same for every anonymous visitor."""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if request.user.is_authenticated:
+        return False
+    return not get_messages(request)
+
+
+def conditional_catalog_page(get_validators):
+    """Answer 304 Not Modified for anonymous visitors whose copy is current.
+
+    ``get_validators(request, *args, **kwargs)`` returns the ETag, or
+    ``None`` to fall through to the view (e.g. so it can raise 404).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not is_conditional_request_allowed(request):
+                return view(request, *args, **kwargs)
+            etag = get_validators(request, *args, **kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+            session_cart = request.session.get("cart")
+            if session_cart:
+                # The header badge shows the cart, so it is part of the page.
+                etag = _etag(etag, "cart", json.dumps(session_cart, sort_keys=True))
+            response = condition(etag_func=lambda *a, **kw: etag)(view)(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,189 @@
+"""Responsive derivatives (resized WebP/JPEG copies) of product images.
+
+Saving a ``ProductImage`` schedules its derivatives once the transaction
+commits. A small thread pool reads the original and writes the results
+through the configured storage; the Pillow work itself runs in a process
+pool (``store.imaging``) so resizing never competes with requests for the
+GIL. Names of the stored files are recorded in ``ProductImage.derivatives``
+together with the source name they were made from, and the product's
+fragment cache version is bumped so cards pick up the new ``srcset``.
+"""
+import logging
+import multiprocessing
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+
+from . import caching, imaging
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+DEFAULT_WIDTHS = (160, 320, 640, 1280)
+DEFAULT_FORMATS = ("webp", "jpeg")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_widths():
+    return tuple(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", DEFAULT_WIDTHS))
+
+
+def get_formats():
+    formats = getattr(settings, "IMAGE_DERIVATIVE_FORMATS", DEFAULT_FORMATS)
+    return imaging.supported_formats(formats)
+
+
+def get_workers():
+    """Process pool size; 0 renders inline in the calling thread."""
+    return getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2)
+
+
+def new_process_pool(workers):
+    # spawn, not fork: web and command processes have threads and open sockets.
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _get_pools():
+    """Return the process-wide ``(process_pool, io_pool)``, created on first use."""
+    with _pools_lock:
+        if _pools.get("pid") != os.getpid():
+            workers = get_workers()
+            _pools.update(
+                pid=os.getpid(),
+                process=new_process_pool(workers),
+                io=ThreadPoolExecutor(workers, thread_name_prefix="image-derivatives"),
+            )
+        return _pools["process"], _pools["io"]
+
+
+def derivative_name(name, width, fmt):
+    """``photos/products/sofa.jpg`` -> ``photos/products/derivatives/sofa-320w.webp``."""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, "derivatives", f"{stem}-{width}w.{EXTENSIONS[fmt]}")
+
+
+def is_current(image):
+    """True when ``image.derivatives`` were made from its current file."""
+    return bool(image.image) and image.derivatives.get("source") == image.image.name
+
+
+def srcset(image, fmt):
+    """Return ``[(width, url)]`` for one format, narrowest first, or []."""
+    if not is_current(image):
+        return []
+    storage = image.image.storage
+    files = image.derivatives.get(fmt, {})
+    return sorted((int(width), storage.url(name)) for width, name in files.items())
+
+
+def generate(image, pool=None):
+    """Render and store derivatives for one image; return the new mapping.
+
+    ``pool`` is a process pool to render in; without one the work runs here.
+    """
+    name = image.image.name
+    storage = image.image.storage
+    shared = getattr(storage, "content_addressed", False)
+    if shared:
+        # Another row backed by the same stored file already has derivatives.
+        twin = (
+            type(image).objects.filter(derivatives__source=name)
+            .exclude(pk=image.pk).values_list("derivatives", flat=True).first()
+        )
+        if twin:
+            return _record(image, twin)
+
+    widths, formats = get_widths(), get_formats()
+    quality = getattr(settings, "IMAGE_DERIVATIVE_QUALITY", 80)
+    try:
+        with storage.open(name, "rb") as source:
+            data = source.read()
+    except (FileNotFoundError, OSError) as error:
+        logger.warning("Cannot read %s for derivatives: %s", name, error)
+        return None
+
+    if pool is None:
+        _size, rendered = imaging.render_derivatives(data, widths, formats, quality)
+    else:
+        _size, rendered = pool.submit(imaging.render_derivatives, data, widths, formats, quality).result()
+
+    derivatives = {"source": name}
+    for fmt, files in rendered.items():
+        derivatives[fmt] = {
+            str(width): storage.save(derivative_name(name, width, fmt), ContentFile(content))
+            for width, content in files.items()
+        }
+    return _record(image, derivatives)
+
+
+def stored_names(derivatives):
+    """Return the file names recorded in a derivatives mapping."""
+    return [name for files in derivatives.values() if isinstance(files, dict) for name in files.values()]
+
+
+def _discard(names):
+    """Delete superseded derivative files."""
+    from .models import ProductImage
+
+    storage = ProductImage._meta.get_field("image").storage
+    # Content-addressed files may back other images too; the orphan sweep removes them.
+    if getattr(storage, "content_addressed", False):
+        return
+    for name in names:
+        storage.delete(name)
+
+
+def _discard_in_background(names):
+    try:
+        _discard(names)
+    except Exception:
+        logger.exception("Deleting superseded derivatives %s failed", names)
+
+
+def _record(image, derivatives):
+    type(image).objects.filter(pk=image.pk).update(derivatives=derivatives)
+    image.derivatives = derivatives
+    caching.bump_product_versions([image.product_id])
+    return derivatives
+
+
+def _generate_by_id(image_id, pool=None):
+    from .models import ProductImage
+
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is not None and image.image and not is_current(image):
+        generate(image, pool)
+
+
+def _generate_in_background(image_id):
+    try:
+        _generate_by_id(image_id, _get_pools()[0])
+    except Exception:
+        logger.exception("Generating derivatives for image %s failed", image_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(image_ids, stale=()):
+    """Queue derivative generation for images, off the request path.
+
+    ``stale`` names derivative files of replaced images to delete.
+    """
+    if not get_workers():
+        _discard(stale)
+        for image_id in image_ids:
+            _generate_by_id(image_id)
+        return
+    _process, io = _get_pools()
+    if stale:
+        io.submit(_discard_in_background, list(stale))
+    for image_id in image_ids:
+        io.submit(_generate_in_background, image_id)
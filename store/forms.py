@@ -2,7 +2,38 @@ from django import forms
 from .models import Product, Category, ProductImage
 
 
-class ProductForm(forms.ModelForm):
+class StockDeltaMixin:
+    """Applies a product form's stock edit as a delta instead of an absolute value.
+
+    Checkout may have taken stock since the form was rendered; writing the
+    typed value back would undo that sale.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Post back the stock the editor saw so the edit can be applied as a delta.
+        self.fields['stock'].show_hidden_initial = True
+
+    def stock_delta(self):
+        """Return the stock change the editor made, or None if unknown."""
+        try:
+            seen = self.fields['stock'].to_python(self.data.get(self.add_initial_prefix('stock')))
+        except forms.ValidationError:
+            return None
+        if seen is None:
+            return None
+        return self.cleaned_data['stock'] - seen
+
+    def apply_stock_delta(self, product):
+        """Rebase ``product.stock`` on the locked row. Call inside a transaction."""
+        current = Product.objects.select_for_update().values_list('stock', flat=True).get(pk=product.pk)
+        delta = self.stock_delta()
+        if delta is not None:
+            product.stock = max(current + delta, 0)
+        product._loaded_stock = current
+
+
+class ProductForm(StockDeltaMixin, forms.ModelForm):
     """Form for creating and updating products."""
     
     class Meta:
@@ -0,0 +1,118 @@
+"""Pillow work for product images: metadata and responsive derivatives.
+
+Kept free of Django imports so process-pool workers started with ``spawn``
+only import Pillow.
+"""
+import base64
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+PLACEHOLDER_SIZE = 16
+PALETTE_SAMPLE_SIZE = 64
+PALETTE_COLORS = 5
+# EXIF orientations that swap width and height.
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+SAVE_OPTIONS = {
+    "avif": {"speed": 8},
+    "webp": {"method": 4},
+    "jpeg": {"optimize": True, "progressive": True},
+}
+
+
+def _flatten(image):
+    """Return an RGB copy of ``image``, compositing transparency onto white."""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        return flat
+    return image.convert("RGB")
+
+
+def dominant_color(image):
+    """Most common colour of a small median-cut palette, as ``#rrggbb``."""
+    sample = image.copy()
+    sample.thumbnail((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE))
+    palette_image = sample.quantize(colors=PALETTE_COLORS, method=Image.Quantize.MEDIANCUT)
+    _count, index = max(palette_image.getcolors())
+    red, green, blue = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def placeholder(image):
+    """A tiny base64 data URI meant to be shown blurred while the image loads."""
+    thumb = image.copy()
+    thumb.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    fmt = "webp" if features.check("webp") else "jpeg"
+    buffer = BytesIO()
+    thumb.save(buffer, fmt.upper(), quality=40)
+    return f"data:image/{fmt};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def describe(fp):
+    """Return width, height, dominant colour and placeholder of an image file.
+
+    Reads from the file object, so an upload can be described before it is
+    stored. Returns ``{}`` when the file is not a readable image.
+    """
+    position = fp.tell() if hasattr(fp, "tell") else None
+    try:
+        if position is not None:
+            fp.seek(0)
+        with Image.open(fp) as source:
+            width, height = source.size
+            if source.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            # JPEG decodes straight to a reduced size; the metadata needs no more.
+            source.draft("RGB", (PALETTE_SAMPLE_SIZE * 2, PALETTE_SAMPLE_SIZE * 2))
+            image = _flatten(ImageOps.exif_transpose(source))
+    except (UnidentifiedImageError, OSError, ValueError):
+        return {}
+    finally:
+        if position is not None:
+            fp.seek(position)
+    return {
+        "width": width,
+        "height": height,
+        "dominant_color": dominant_color(image),
+        "placeholder": placeholder(image),
+    }
+
+
+def supported_formats(formats):
+    """Drop formats this Pillow build cannot encode."""
+    return [fmt for fmt in formats if fmt == "jpeg" or features.check(fmt)]
+
+
+def target_widths(source_width, widths):
+    """Configured widths narrower than the source, plus the source width if capped."""
+    targets = sorted(width for width in widths if width < source_width)
+    if not targets or max(widths) > source_width:
+        targets.append(source_width)
+    return targets
+
+
+def render_derivatives(data, widths, formats, quality=80):
+    """Return ``(size, {format: {width: bytes}})`` for an encoded source image."""
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    size = image.size
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    rendered = {fmt: {} for fmt in formats}
+    # Largest first so each step resizes from a smaller intermediate.
+    current = image
+    for width in sorted(target_widths(size[0], widths), reverse=True):
+        height = max(1, round(size[1] * width / size[0]))
+        if current.width != width:
+            current = current.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            frame = _flatten(current) if fmt == "jpeg" else current
+            buffer = BytesIO()
+            frame.save(buffer, fmt.upper(), quality=quality, **SAVE_OPTIONS.get(fmt, {}))
+            rendered[fmt][width] = buffer.getvalue()
+    return size, rendered
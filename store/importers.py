@@ -0,0 +1,443 @@
+"""Bulk catalog import from CSV or JSON Lines.
+
+Rows are streamed from the source and written in batches with
+``bulk_create``/``bulk_update``. Slugs and SKUs are allocated in memory
+against the set already in the database, categories and variations are
+resolved per batch, images are uploaded on a thread pool, and progress is
+checkpointed after every committed batch so an interrupted run can resume.
+
+Bulk writes skip ``Product.save()`` and model signals, so the importer keeps
+the search index, fragment cache versions, catalog version and the stored
+subtotals of carts holding updated products in step itself.
+"""
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import caching, imaging, ledger, search
+from .models import Category, Product, ProductImage, ProductVariation
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_SEPARATOR = ">"
+LIST_SEPARATOR = "|"
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+PRODUCT_FIELDS = [
+    "name",
+    "category",
+    "description",
+    "short_description",
+    "price",
+    "compare_at_price",
+    "stock",
+    "is_active",
+    "is_featured",
+    "meta_title",
+    "meta_description",
+    "meta_keywords",
+]
+VARIATION_FIELDS = ["value", "price_adjustment", "stock", "sku", "is_active"]
+
+
+class ImportRowError(ValueError):
+    """Raised for a source row that cannot be imported."""
+
+
+def read_rows(path):
+    """Yield ``(line_number, row)`` from a ``.csv`` or ``.jsonl`` file."""
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as handle:
+            for number, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield number, json.loads(line)
+        return
+
+    with open(path, encoding="utf-8", newline="") as handle:
+        for number, row in enumerate(csv.DictReader(handle), start=2):
+            yield number, row
+
+
+def _decimal(value, field, required=True, default=None):
+    if value in (None, ""):
+        if required:
+            raise ImportRowError(f"{field} is required")
+        return default
+    try:
+        return Decimal(str(value))
+    except InvalidOperation as exc:
+        raise ImportRowError(f"{field} is not a number: {value!r}") from exc
+
+
+def _integer(value, field, default=0):
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError) as exc:
+        raise ImportRowError(f"{field} is not an integer: {value!r}") from exc
+
+
+def _boolean(value, default):
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _list(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+
+def _variations(value):
+    """Variations are a JSON list of objects (a JSON string in CSV files)."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as exc:
+            raise ImportRowError("variations is not valid JSON") from exc
+    variations = []
+    for variation in value:
+        if not variation.get("variation_type") or not variation.get("name"):
+            raise ImportRowError("each variation needs a variation_type and a name")
+        variations.append({
+            "variation_type": variation["variation_type"],
+            "name": variation["name"],
+            "value": variation.get("value") or "",
+            "price_adjustment": _decimal(
+                variation.get("price_adjustment"), "price_adjustment", required=False, default=Decimal("0")
+            ),
+            "stock": _integer(variation.get("stock"), "stock"),
+            "sku": variation.get("sku") or "",
+            "is_active": _boolean(variation.get("is_active"), True),
+        })
+    return variations
+
+
+def parse_row(row):
+    """Normalise one source row into product values, images and variations."""
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ImportRowError("name is required")
+    values = {
+        "name": name,
+        "category": (row.get("category") or "").strip(),
+        "description": row.get("description") or "",
+        "short_description": row.get("short_description") or "",
+        "price": _decimal(row.get("price"), "price"),
+        "compare_at_price": _decimal(row.get("compare_at_price"), "compare_at_price", required=False),
+        "stock": _integer(row.get("stock"), "stock"),
+        "is_active": _boolean(row.get("is_active"), True),
+        "is_featured": _boolean(row.get("is_featured"), False),
+        "meta_title": row.get("meta_title") or "",
+        "meta_description": row.get("meta_description") or "",
+        "meta_keywords": row.get("meta_keywords") or "",
+    }
+    return {
+        "sku": (row.get("sku") or "").strip(),
+        "slug": (row.get("slug") or "").strip(),
+        "values": values,
+        "images": _list(row.get("images")),
+        "variations": _variations(row.get("variations")),
+    }
+
+
+class UniqueAllocator:
+    """Hand out unique values against an in-memory set of taken ones."""
+
+    def __init__(self, taken):
+        self.taken = set(taken)
+
+    def allocate(self, base, separator="-"):
+        candidate = base
+        suffix = 2
+        while candidate in self.taken:
+            candidate = f"{base}{separator}{suffix}"
+            suffix += 1
+        self.taken.add(candidate)
+        return candidate
+
+    def claim(self, value):
+        self.taken.add(value)
+
+
+class CatalogImporter:
+    """Import catalog rows in batches; see the module docstring."""
+
+    def __init__(self, batch_size=1000, image_root="", image_workers=8):
+        self.batch_size = batch_size
+        self.image_root = image_root
+        self.image_workers = image_workers
+        self.stats = {
+            "created": 0,
+            "updated": 0,
+            "skipped": 0,
+            "images": 0,
+            "image_errors": 0,
+            "variations": 0,
+        }
+        self.errors = []
+        self._categories = {}
+        self._slugs = None
+        self._skus = None
+        self._storage = ProductImage._meta.get_field("image").storage
+
+    def _load_taken_values(self):
+        if self._slugs is not None:
+            return
+        rows = Product.objects.values_list("slug", "sku").iterator(chunk_size=5000)
+        slugs, skus = set(), set()
+        for slug, sku in rows:
+            slugs.add(slug)
+            skus.add(sku)
+        self._slugs = UniqueAllocator(slugs)
+        self._skus = UniqueAllocator(skus)
+
+    def run(self, rows, skip=0, on_batch=None):
+        """Import ``(line_number, row)`` pairs, skipping the first ``skip``.
+
+        ``on_batch(rows_done)`` is called after each committed batch.
+        """
+        self._load_taken_values()
+        done = 0
+        batch = []
+        for line_number, row in rows:
+            done += 1
+            if done <= skip:
+                continue
+            try:
+                batch.append(parse_row(row))
+            except ImportRowError as exc:
+                self.stats["skipped"] += 1
+                self.errors.append((line_number, str(exc)))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                if on_batch:
+                    on_batch(done)
+        if batch:
+            self.import_batch(batch)
+        if on_batch:
+            on_batch(done)
+        caching.bump_catalog_version()
+        return self.stats
+
+    def _resolve_categories(self, batch):
+        """Return {path: Category}, creating any missing ones along each path."""
+        wanted = {entry["values"]["category"] for entry in batch} - {""} - set(self._categories)
+        names = {
+            name.strip()
+            for path in wanted
+            for name in path.split(CATEGORY_SEPARATOR)
+            if name.strip()
+        }
+        existing = Category.objects.filter(name__in=names).in_bulk(field_name="name")
+        for path in sorted(wanted):
+            parent = None
+            for name in (part.strip() for part in path.split(CATEGORY_SEPARATOR)):
+                if not name:
+                    continue
+                category = existing.get(name)
+                if category is None:
+                    # New categories are rare; save() maintains the tree path.
+                    category = Category.objects.create(name=name, parent=parent)
+                    existing[name] = category
+                parent = category
+            self._categories[path] = parent
+        return self._categories
+
+    def import_batch(self, batch):
+        """Write one batch of parsed rows in a single transaction."""
+        # A SKU repeated within a batch is applied once, last row wins.
+        batch = list({entry["sku"] or id(entry): entry for entry in batch}.values())
+        categories = self._resolve_categories(batch)
+        skus = [entry["sku"] for entry in batch if entry["sku"]]
+        existing = Product.objects.filter(sku__in=skus).in_bulk(field_name="sku")
+        now = timezone.now()
+
+        to_create, to_update, pairs = [], [], []
+        previous_stock = {}
+        for entry in batch:
+            values = dict(entry["values"])
+            values["category"] = categories.get(values["category"])
+            product = existing.get(entry["sku"])
+            if product is None:
+                product = Product(**values)
+                product.slug = self._slugs.allocate(
+                    entry["slug"] or slugify(values["name"]) or "product"
+                )
+                if entry["sku"]:
+                    self._skus.claim(entry["sku"])
+                    product.sku = entry["sku"]
+                else:
+                    base = slugify(values["name"]).upper()[:8] or "SKU"
+                    product.sku = self._skus.allocate(base)
+                product.created_at = product.updated_at = now
+                to_create.append(product)
+            else:
+                previous_stock[product.pk] = product.stock
+                for field, value in values.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                to_update.append(product)
+            pairs.append((product, entry))
+
+        # Uploads run before the transaction so no locks are held during I/O.
+        uploads = self._upload_images(pairs)
+        with transaction.atomic():
+            Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+            if to_update:
+                # Checkout may have sold stock during the uploads; apply the
+                # imported change on top of the locked rows instead of over it.
+                locked = dict(
+                    Product.objects.select_for_update()
+                    .filter(pk__in=[p.pk for p in to_update])
+                    .order_by("pk")
+                    .values_list("pk", "stock")
+                )
+                for product in to_update:
+                    change = product.stock - previous_stock[product.pk]
+                    previous_stock[product.pk] = locked[product.pk]
+                    product.stock = max(locked[product.pk] + change, 0)
+                Product.objects.bulk_update(
+                    to_update, PRODUCT_FIELDS + ["updated_at"], batch_size=self.batch_size
+                )
+                Product.objects.filter(pk__in=[p.pk for p in to_update]).update(
+                    cache_version=F("cache_version") + 1
+                )
+                # Updated variations belong to these products, so this covers them too.
+                from cart.models import Cart
+
+                Cart.objects.invalidate_subtotals(product_ids=[p.pk for p in to_update])
+            ledger.record_many(
+                [
+                    ledger.movement(product.pk, product.stock, ledger.RESTOCK, note="Imported")
+                    for product in to_create
+                    if product.stock
+                ] + [
+                    ledger.movement(
+                        product.pk,
+                        product.stock - previous_stock[product.pk],
+                        ledger.ADJUSTMENT,
+                        note="Imported",
+                    )
+                    for product in to_update
+                    if product.stock != previous_stock[product.pk]
+                ],
+                batch_size=self.batch_size,
+            )
+            self._import_variations(pairs)
+            images = [
+                ProductImage(product=product, is_primary=order == 0, order=order, **fields)
+                for product, order, fields in uploads
+            ]
+            ProductImage.objects.bulk_create(images, batch_size=self.batch_size)
+
+        search.index_products([product.pk for product, _entry in pairs])
+        moved = [p for p in to_update if p._loaded_listing != (p.category_id, p.is_active)]
+        caching.bump_category_versions(
+            [p.category_id for p in to_create + moved] + [p._loaded_listing[0] for p in moved]
+        )
+        self.stats["created"] += len(to_create)
+        self.stats["updated"] += len(to_update)
+        self.stats["images"] += len(uploads)
+
+    def _import_variations(self, pairs):
+        wanted = {
+            (product.pk, variation["variation_type"], variation["name"]): variation
+            for product, entry in pairs
+            for variation in entry["variations"]
+        }
+        if not wanted:
+            return
+        existing = {
+            (variation.product_id, variation.variation_type, variation.name): variation
+            for variation in ProductVariation.objects.filter(
+                product_id__in={key[0] for key in wanted}
+            )
+        }
+        to_create, to_update = [], []
+        for key, data in wanted.items():
+            variation = existing.get(key)
+            if variation is None:
+                variation = ProductVariation(
+                    product_id=key[0], variation_type=key[1], name=key[2]
+                )
+                to_create.append(variation)
+            else:
+                to_update.append(variation)
+            for field in VARIATION_FIELDS:
+                setattr(variation, field, data[field])
+        ProductVariation.objects.bulk_create(to_create, batch_size=self.batch_size)
+        ProductVariation.objects.bulk_update(to_update, VARIATION_FIELDS, batch_size=self.batch_size)
+        self.stats["variations"] += len(to_create) + len(to_update)
+
+    def _upload_images(self, pairs):
+        """Upload images for products that have none yet, concurrently.
+
+        Returns ``(product, order, image_fields)`` for every successful upload.
+        """
+        candidates = [(product, entry["images"]) for product, entry in pairs if entry["images"]]
+        if not candidates:
+            return []
+        has_images = set(
+            ProductImage.objects.filter(
+                product_id__in=[product.pk for product, _sources in candidates if product.pk]
+            )
+            .values_list("product_id", flat=True)
+            .distinct()
+        )
+        jobs = [
+            (product, order, source)
+            for product, sources in candidates
+            if product.pk is None or product.pk not in has_images
+            for order, source in enumerate(sources)
+        ]
+        with ThreadPoolExecutor(max_workers=self.image_workers) as pool:
+            uploads = list(pool.map(lambda job: self._upload(job[2]), jobs))
+        self.stats["image_errors"] += uploads.count(None)
+        return [
+            (product, order, fields)
+            for (product, order, _source), fields in zip(jobs, uploads)
+            if fields
+        ]
+
+    def _upload(self, source):
+        """Store one image from a URL or a path under ``image_root``.
+
+        Returns the ``ProductImage`` fields for it: the stored name plus the
+        dimensions and placeholder read from the bytes already in memory.
+        """
+        try:
+            if urlparse(source).scheme in ("http", "https"):
+                with urlopen(source, timeout=30) as response:
+                    content = response.read()
+            else:
+                with open(os.path.join(self.image_root, source), "rb") as handle:
+                    content = handle.read()
+            filename = os.path.basename(urlparse(source).path) or "image.jpg"
+            upload_to = ProductImage._meta.get_field("image").upload_to
+            name = self._storage.save(os.path.join(upload_to, filename), ContentFile(content))
+            return {"image": name, **imaging.describe(BytesIO(content))}
+        except Exception as exc:  # noqa: BLE001 - one bad image must not abort the batch
+            logger.warning("Image import failed for %s: %s", source, exc)
+            return None
@@ -0,0 +1,163 @@
+"""Inventory ledger: append-only stock movements rolled up into snapshots.
+
+Every change to ``Product.stock`` is also written as an ``InventoryMovement``
+row (a plain INSERT, never updated or deleted). ``compact`` periodically
+folds new movements into one ``InventorySnapshot`` per product, so the
+ledger stock of a product is its snapshot plus the short tail of movements
+written since, read through the ``(product, id)`` index.
+
+``Product.stock`` stays the counter checkout decrements atomically; the
+ledger is its history and ``drift`` reconciles the two.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import InventoryMovement, InventorySnapshot, Product
+
+SALE = InventoryMovement.SALE
+RESTOCK = InventoryMovement.RESTOCK
+ADJUSTMENT = InventoryMovement.ADJUSTMENT
+RETURN = InventoryMovement.RETURN
+RELEASE = InventoryMovement.RELEASE
+
+# Movements younger than this are left in the tail: ids are allocated before
+# commit, so a slow transaction can still commit a lower id than one folded.
+DEFAULT_SETTLE = timedelta(minutes=5)
+
+
+def movement(product_id, delta, reason, reference="", note="", user=None):
+    """Build an unsaved movement, for callers that ``bulk_create`` several."""
+    return InventoryMovement(
+        product_id=product_id,
+        delta=delta,
+        reason=reason,
+        reference=reference,
+        note=note,
+        created_by=user,
+    )
+
+
+def record(product_id, delta, reason, reference="", note="", user=None):
+    """Append one movement to the ledger."""
+    return InventoryMovement.objects.create(
+        product_id=product_id,
+        delta=delta,
+        reason=reason,
+        reference=reference,
+        note=note,
+        created_by=user,
+    )
+
+
+def record_many(movements, batch_size=1000):
+    """Append movements built with :func:`movement` in bulk."""
+    return InventoryMovement.objects.bulk_create(movements, batch_size=batch_size)
+
+
+def current_stock(product_id):
+    """Return ledger stock as the snapshot plus the movements after it."""
+    snapshot = (
+        InventorySnapshot.objects.filter(product_id=product_id)
+        .values_list("quantity", "last_movement_id")
+        .first()
+    )
+    quantity, last_movement_id = snapshot or (0, 0)
+    tail = InventoryMovement.objects.filter(
+        product_id=product_id, id__gt=last_movement_id
+    ).aggregate(total=Sum("delta"))["total"]
+    return quantity + (tail or 0)
+
+
+def compact(settle=DEFAULT_SETTLE, batch_size=1000, now=None):
+    """Fold settled movements into snapshots; return the products updated.
+
+    Only movements after the newest folded id are read, so each run costs
+    the size of the new tail rather than of the ledger.
+    """
+    now = now or timezone.now()
+    low = InventorySnapshot.objects.aggregate(last=Max("last_movement_id"))["last"] or 0
+    high = InventoryMovement.objects.filter(
+        id__gt=low, created_at__lte=now - settle
+    ).aggregate(last=Max("id"))["last"]
+    if not high:
+        return 0
+
+    # One row per product touched since the last run, summed in the database.
+    rollup = list(
+        InventoryMovement.objects.filter(id__gt=low, id__lte=high)
+        .order_by()
+        .values("product_id")
+        .annotate(total=Sum("delta"), last=Max("id"))
+        .order_by("product_id")
+    )
+    updated = 0
+    # One transaction: the next run starts after the highest folded id, so a
+    # partial run must not leave some products behind that watermark.
+    with transaction.atomic():
+        for start in range(0, len(rollup), batch_size):
+            updated += _apply(rollup[start:start + batch_size], now)
+    return updated
+
+
+def _apply(rows, now):
+    snapshots = InventorySnapshot.objects.select_for_update().in_bulk(
+        [row["product_id"] for row in rows]
+    )
+    to_create, to_update = [], []
+    for row in rows:
+        snapshot = snapshots.get(row["product_id"])
+        if snapshot is None:
+            to_create.append(InventorySnapshot(
+                product_id=row["product_id"],
+                quantity=row["total"],
+                last_movement_id=row["last"],
+                compacted_at=now,
+            ))
+        elif row["last"] > snapshot.last_movement_id:
+            snapshot.quantity += row["total"]
+            snapshot.last_movement_id = row["last"]
+            snapshot.compacted_at = now
+            to_update.append(snapshot)
+    InventorySnapshot.objects.bulk_create(to_create)
+    InventorySnapshot.objects.bulk_update(
+        to_update, ["quantity", "last_movement_id", "compacted_at"]
+    )
+    return len(to_create) + len(to_update)
+
+
+def drift(batch_size=1000):
+    """Yield ``(product_id, stock, ledger_stock)`` where the two disagree."""
+    products = Product.objects.order_by("pk").values_list("pk", "stock")
+    batch = []
+    for row in products.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from _drift(batch)
+            batch = []
+    if batch:
+        yield from _drift(batch)
+
+
+def _drift(rows):
+    ids = [pk for pk, _stock in rows]
+    snapshots = {
+        product_id: (quantity, last)
+        for product_id, quantity, last in InventorySnapshot.objects.filter(
+            product_id__in=ids
+        ).values_list("product_id", "quantity", "last_movement_id")
+    }
+    low = min((last for _quantity, last in snapshots.values()), default=0)
+    if len(snapshots) < len(ids):
+        low = 0
+    tails = {}
+    movements = InventoryMovement.objects.filter(product_id__in=ids, id__gt=low)
+    for product_id, movement_id, delta in movements.values_list("product_id", "id", "delta"):
+        if movement_id > snapshots.get(product_id, (0, 0))[1]:
+            tails[product_id] = tails.get(product_id, 0) + delta
+    for pk, stock in rows:
+        ledger = snapshots.get(pk, (0, 0))[0] + tails.get(pk, 0)
+        if ledger != stock:
+            yield pk, stock, ledger
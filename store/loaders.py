@@ -0,0 +1,96 @@
+"""Loaders that assemble whole storefront pages in a bounded number of queries."""
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+
+from . import caching
+from .models import Product, ProductImage, ProductVariation
+
+DETAIL_REVIEW_LIMIT = 10
+RELATED_PRODUCT_LIMIT = 4
+RELATED_PRODUCTS_TIMEOUT = 60 * 60
+
+
+def detail_queryset():
+    """Return products with everything the detail page renders prefetched."""
+    from reviews.models import Review
+
+    latest_reviews = (
+        Review.objects.filter(is_approved=True)
+        .select_related("user")
+        .order_by("-created_at")[:DETAIL_REVIEW_LIMIT]
+    )
+    return Product.objects.select_related("category").prefetch_related(
+        Prefetch(
+            "images",
+            queryset=ProductImage.objects.all(),
+            to_attr="gallery_images",
+        ),
+        Prefetch(
+            "variations",
+            queryset=ProductVariation.objects.filter(is_active=True),
+            to_attr="active_variations",
+        ),
+        Prefetch("reviews", queryset=latest_reviews, to_attr="latest_reviews"),
+    )
+
+
+def related_product_ids(product, limit=RELATED_PRODUCT_LIMIT):
+    """Return ids of products shown next to ``product``, cached per product.
+
+    The key includes the category's version, so new, moved or reactivated
+    products show up as soon as they are saved, while stock and price
+    changes elsewhere in the catalog leave the list cached.
+    """
+    if not product.category_id:
+        return []
+    cache = caching.get_fragment_cache()
+    version = caching.get_category_version(product.category_id)
+    key = f"related-products:{version}:{product.pk}:{product.category_id}:{limit}"
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(
+            Product.objects.filter(category_id=product.category_id, is_active=True)
+            .exclude(pk=product.pk)
+            .order_by("-created_at", "-id")
+            .values_list("pk", flat=True)[:limit]
+        )
+        cache.set(key, ids, RELATED_PRODUCTS_TIMEOUT)
+    return ids
+
+
+def load_related_products(product, limit=RELATED_PRODUCT_LIMIT):
+    """Return related product cards, in cached order, skipping ones since hidden."""
+    ids = related_product_ids(product, limit)
+    if not ids:
+        return []
+    cards = Product.objects.filter(is_active=True).for_cards().in_bulk(ids)
+    return [cards[pk] for pk in ids if pk in cards]
+
+
+def load_product_detail(slug, user):
+    """Return the template context for the product detail page.
+
+    Costs one query for the product and category, one each for the gallery,
+    active variations and latest reviews, one for the visitor's own review,
+    and two for related product cards (none for their ids on a cache hit).
+    Ratings come from the stored aggregates on ``Product``.
+    """
+    product = get_object_or_404(detail_queryset(), slug=slug, is_active=True)
+
+    can_review = False
+    user_review = None
+    if user.is_authenticated:
+        user_review = product.reviews.filter(user=user).first()
+        can_review = not user_review or not user_review.is_approved
+
+    return {
+        "product": product,
+        "images": product.gallery_images,
+        "variations": product.active_variations,
+        "reviews": product.latest_reviews,
+        "average_rating": product.get_average_rating(),
+        "review_count": product.get_review_count(),
+        "can_review": can_review,
+        "user_review": user_review,
+        "related_products": load_related_products(product),
+    }
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import caching, imaging
+from store.models import ProductImage
+
+METADATA_FIELDS = ["width", "height", "dominant_color", "placeholder"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Store dimensions, dominant colour and placeholder for product images "
+        "uploaded before they were recorded, reading files concurrently."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Concurrent file reads.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Images loaded and updated per query.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Describe every image again, not only those missing dimensions.",
+        )
+
+    def _describe(self, image):
+        try:
+            with image.image.storage.open(image.image.name, "rb") as handle:
+                return imaging.describe(handle)
+        except OSError as error:
+            self.stderr.write(f"Image {image.pk} ({image.image.name}) unreadable: {error}")
+            return {}
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+
+        images = ProductImage.objects.exclude(image="").only("pk", "image", "product_id").order_by("pk")
+        if not options["force"]:
+            images = images.filter(width__isnull=True)
+
+        started = time.monotonic()
+        done = failed = 0
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                # Keyset batches: no cursor stays open while rows are updated.
+                batch = list(images.filter(pk__gt=last_pk)[:options["batch_size"]])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                described = []
+                for image, metadata in zip(batch, pool.map(self._describe, batch)):
+                    if not metadata:
+                        failed += 1
+                        continue
+                    for field in METADATA_FIELDS:
+                        setattr(image, field, metadata[field])
+                    described.append(image)
+                ProductImage.objects.bulk_update(described, METADATA_FIELDS)
+                caching.bump_product_versions({image.product_id for image in described})
+                done += len(described)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  {done + failed} images")
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else done
+        self.stdout.write(self.style.SUCCESS(
+            f"Described {done} images ({failed} unreadable) in {elapsed:.1f}s ({rate:.1f} images/s)."
+        ))
@@ -0,0 +1,57 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll new inventory movements up into per-product snapshots. Schedule it "
+        "regularly (e.g. hourly) to keep the tail read by ledger stock short."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--settle-minutes",
+            type=int,
+            default=int(ledger.DEFAULT_SETTLE.total_seconds() // 60),
+            help="Leave movements younger than this in the tail.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of snapshots written per query.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report products whose stock disagrees with the ledger.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        started = time.monotonic()
+        updated = ledger.compact(
+            settle=timedelta(minutes=options["settle_minutes"]),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted movements into {updated} snapshots in {time.monotonic() - started:.1f}s."
+        ))
+
+        if options["verify"]:
+            mismatches = 0
+            for product_id, stock, ledger_stock in ledger.drift(options["batch_size"]):
+                mismatches += 1
+                self.stderr.write(
+                    f"Product {product_id}: stock {stock}, ledger {ledger_stock} "
+                    f"({stock - ledger_stock:+d})"
+                )
+            if mismatches:
+                raise CommandError(f"{mismatches} products disagree with the ledger.")
+            self.stdout.write("Stock matches the ledger for every product.")
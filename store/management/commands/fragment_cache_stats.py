@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from store import caching
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counts of the product fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = caching.get_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} "
+            f"hit_ratio={stats['hit_ratio']:.1%}"
+        )
+        if options["reset"]:
+            caching.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,84 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store import derivatives
+from store.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate responsive WebP/JPEG derivatives for product images that do not "
+        "have them yet, rendering on a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 2,
+            help="Rendering processes; 0 renders in this process.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Images dispatched per batch.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate derivatives for every image, e.g. after changing widths.",
+        )
+
+    def _generate(self, pool, image_id):
+        try:
+            image = ProductImage.objects.get(pk=image_id)
+            return derivatives.generate(image, pool) is not None
+        except Exception as error:
+            self.stderr.write(f"Image {image_id} failed: {error}")
+            return False
+        finally:
+            if pool is not None:
+                connection.close()
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["workers"] < 0:
+            raise CommandError("--batch-size must be at least 1 and --workers at least 0.")
+
+        images = ProductImage.objects.exclude(image="").order_by("pk")
+        if not options["force"]:
+            images = images.filter(derivatives={})
+        image_ids = list(images.values_list("pk", flat=True))
+        self.stdout.write(f"Generating derivatives for {len(image_ids)} images.")
+
+        started = time.monotonic()
+        done = failed = 0
+        workers = options["workers"]
+        pool = derivatives.new_process_pool(workers) if workers else None
+        io = ThreadPoolExecutor(workers * 2) if workers else None
+        try:
+            for start in range(0, len(image_ids), options["batch_size"]):
+                batch = image_ids[start:start + options["batch_size"]]
+                if io is None:
+                    results = [self._generate(None, image_id) for image_id in batch]
+                else:
+                    results = list(io.map(lambda image_id: self._generate(pool, image_id), batch))
+                done += sum(results)
+                failed += len(results) - sum(results)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  {done + failed}/{len(image_ids)} images")
+        finally:
+            if io is not None:
+                io.shutdown()
+                pool.shutdown()
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else done
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated derivatives for {done} images ({failed} failed) "
+            f"in {elapsed:.1f}s ({rate:.1f} images/s)."
+        ))
@@ -0,0 +1,100 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importers import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import products from a CSV or JSON Lines file in batches. Rows are matched "
+        "on sku; images are attached only to products that have none yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Path to a .csv or .jsonl file.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows written per transaction.",
+        )
+        parser.add_argument(
+            "--image-root",
+            default="",
+            help="Directory that relative image paths are resolved against.",
+        )
+        parser.add_argument(
+            "--image-workers",
+            type=int,
+            default=8,
+            help="Number of concurrent image uploads.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording progress; defaults to <source>.checkpoint.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the first row.",
+        )
+
+    def _read_checkpoint(self, path, source):
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get("source") != os.path.abspath(source):
+            raise CommandError(f"Checkpoint {path} belongs to {checkpoint.get('source')}.")
+        return checkpoint.get("rows", 0)
+
+    def _write_checkpoint(self, path, source, rows):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"source": os.path.abspath(source), "rows": rows}, handle)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if not os.path.exists(source):
+            raise CommandError(f"{source} does not exist.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        checkpoint = options["checkpoint"] or f"{source}.checkpoint"
+        skip = 0 if options["restart"] else self._read_checkpoint(checkpoint, source)
+        if skip:
+            self.stdout.write(f"Resuming after row {skip} from {checkpoint}.")
+
+        importer = CatalogImporter(
+            batch_size=options["batch_size"],
+            image_root=options["image_root"],
+            image_workers=options["image_workers"],
+        )
+        started = time.monotonic()
+
+        def on_batch(rows):
+            self._write_checkpoint(checkpoint, source, rows)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {rows} rows done")
+
+        stats = importer.run(read_rows(source), skip=skip, on_batch=on_batch)
+        os.remove(checkpoint)
+
+        for line_number, error in importer.errors:
+            self.stderr.write(f"Row {line_number} skipped: {error}")
+
+        elapsed = time.monotonic() - started
+        imported = stats["created"] + stats["updated"]
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} and updated {stats['updated']} products "
+            f"({stats['variations']} variations, {stats['images']} images, "
+            f"{stats['image_errors']} image errors, {stats['skipped']} rows skipped) "
+            f"in {elapsed:.1f}s ({rate:.0f} products/s)."
+        ))
+        if stats["images"]:
+            self.stdout.write("Run generate_image_derivatives to build responsive copies of new images.")
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from store import search
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=search.INDEX_BATCH_SIZE,
+            help="Number of products indexed per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING(
+                "The configured database has no search index backend; nothing to do."
+            ))
+            return
+
+        batch_size = options["batch_size"]
+        search.clear_index()
+
+        indexed = 0
+        batch = []
+        for product_id in Product.objects.order_by("id").values_list("id", flat=True).iterator(
+            chunk_size=batch_size
+        ):
+            batch.append(product_id)
+            if len(batch) >= batch_size:
+                search.index_products(batch)
+                indexed += len(batch)
+                batch = []
+        if batch:
+            search.index_products(batch)
+            indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute stored product rating aggregates from approved reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products recomputed per grouped query.",
+        )
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            dest="product_ids",
+            help="Limit the run to the given product id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        updated = Product.objects.recompute_ratings(
+            product_ids=options["product_ids"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Updated rating aggregates for {updated} products."))
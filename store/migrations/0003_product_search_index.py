@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            """
+            CREATE TABLE store_product_search (
+                product_id bigint PRIMARY KEY
+                    REFERENCES store_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+                document tsvector NOT NULL
+            )
+            """
+        )
+        schema_editor.execute(
+            "CREATE INDEX store_product_search_document_gin "
+            "ON store_product_search USING gin (document)"
+        )
+        schema_editor.execute(
+            """
+            INSERT INTO store_product_search (product_id, document)
+            SELECT id,
+                   setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+                   setweight(to_tsvector('english', coalesce(short_description, '')), 'B') ||
+                   setweight(to_tsvector('english', coalesce(description, '')), 'C')
+            FROM store_product
+            """
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_search USING fts5("
+            "name, short_description, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_search (rowid, name, short_description, description) "
+            "SELECT id, name, short_description, description FROM store_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("postgresql", "sqlite"):
+        schema_editor.execute("DROP TABLE IF EXISTS store_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0002_alter_productimage_image"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
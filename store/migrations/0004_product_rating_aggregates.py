@@ -0,0 +1,84 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    Review = apps.get_model("reviews", "Review")
+
+    histograms = {}
+    rows = (
+        Review.objects.filter(is_approved=True)
+        .values_list("product_id", "rating")
+        .annotate(total=Count("pk"))
+        .order_by()
+    )
+    for product_id, rating, total in rows:
+        histograms.setdefault(product_id, {})[rating] = total
+
+    products = []
+    for product in Product.objects.filter(pk__in=histograms):
+        histogram = histograms[product.pk]
+        count = sum(histogram.values())
+        for stars in range(1, 6):
+            setattr(product, f"rating_{stars}_count", histogram.get(stars, 0))
+        product.rating_count = count
+        product.rating_avg = sum(stars * total for stars, total in histogram.items()) / count
+        products.append(product)
+
+    Product.objects.bulk_update(
+        products,
+        ["rating_avg", "rating_count"] + [f"rating_{stars}_count" for stars in range(1, 6)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0003_product_search_index"),
+        ("reviews", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-rating_avg", "-rating_count"], name="store_product_rating_idx"),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0004_product_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="store_product_rating_idx",
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-rating_avg", "-rating_count", "-id"], name="store_product_rating_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-created_at", "-id"], name="store_product_newest_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["price", "id"], name="store_product_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["name", "id"], name="store_product_name_idx"),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    Category = apps.get_model("store", "Category")
+
+    categories = list(Category.objects.all())
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    pending = [(category, None) for category in children.get(None, [])]
+    while pending:
+        category, parent = pending.pop()
+        segment = f"{category.pk:08d}/"
+        crumb = {"name": category.name, "slug": category.slug}
+        if parent is None:
+            category.path, category.depth, category.breadcrumbs = segment, 0, [crumb]
+        else:
+            category.path = parent.path + segment
+            category.depth = parent.depth + 1
+            category.breadcrumbs = parent.breadcrumbs + [crumb]
+        pending.extend((child, category) for child in children.get(category.pk, []))
+
+    Category.objects.bulk_update(categories, ["path", "depth", "breadcrumbs"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_product_cache_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="breadcrumbs",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,109 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_snapshots(apps, schema_editor):
+    """Open the ledger with the current stock of every product."""
+    Product = apps.get_model("store", "Product")
+    InventorySnapshot = apps.get_model("store", "InventorySnapshot")
+
+    snapshots = [
+        InventorySnapshot(product_id=pk, quantity=stock, last_movement_id=0)
+        for pk, stock in Product.objects.values_list("pk", "stock").iterator(chunk_size=2000)
+    ]
+    InventorySnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_product_updated_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventorySnapshot",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="inventory_snapshot",
+                        serialize=False,
+                        to="store.product",
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                ("last_movement_id", models.BigIntegerField(db_index=True, default=0)),
+                ("compacted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="InventoryMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delta", models.IntegerField()),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("sale", "Sale"),
+                            ("restock", "Restock"),
+                            ("adjustment", "Adjustment"),
+                            ("return", "Return"),
+                            ("release", "Checkout hold released"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True,
+                        help_text="Order number or import source",
+                        max_length=100,
+                    ),
+                ),
+                ("note", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="store.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-id"],
+                "indexes": [
+                    models.Index(fields=["product", "-id"], name="store_movement_product_idx"),
+                    models.Index(fields=["created_at"], name="store_movement_created_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(seed_snapshots, migrations.RunPython.noop),
+    ]
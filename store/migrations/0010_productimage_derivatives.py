@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_inventory_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="derivatives",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Resized copies by format and width, see store.derivatives",
+            ),
+        ),
+    ]
@@ -1,15 +1,42 @@
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import (
+    Case, Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Prefetch, Value, When,
+)
+from django.db.models.functions import Cast
+from django.db.models.lookups import StartsWith
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.text import slugify
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.conf import settings
 
 
+from . import caching, derivatives, imaging, search
+
+
+CATEGORY_PATH_WIDTH = 8
+
+
+def build_category_path(category, parent):
+    """Return (path, depth, breadcrumbs) for a category below ``parent``."""
+    segment = f"{category.pk:0{CATEGORY_PATH_WIDTH}d}/"
+    crumb = {"name": category.name, "slug": category.slug}
+    if parent is None:
+        return segment, 0, [crumb]
+    return parent.path + segment, parent.depth + 1, parent.breadcrumbs + [crumb]
+
+
 class Category(models.Model):
-    """Product category model with parent-child relationship."""
+    """Product category model with parent-child relationship.
+
+    ``path`` is a materialized path of zero-padded ancestor ids
+    (``00000001/00000004/``), so a subtree is a single indexed prefix match.
+    ``breadcrumbs`` caches the names and slugs from the root down to this
+    category for rendering without walking ``parent``.
+    """
     
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
@@ -23,6 +50,9 @@ class Category(models.Model):
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to="categories/", blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    breadcrumbs = models.JSONField(default=list, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -34,26 +64,76 @@ class Category(models.Model):
         """Return the category name."""
         return self.name
 
+    def clean(self):
+        """Reject parents that would create a cycle."""
+        super().clean()
+        if self.parent_id and self.pk and self._is_own_ancestor(self.parent):
+            raise ValidationError({"parent": "A category cannot be moved below itself."})
+
+    def _is_own_ancestor(self, parent):
+        if parent.pk == self.pk:
+            return True
+        return bool(self.path) and parent.path.startswith(self.path)
+
     def save(self, *args, **kwargs):
-        """Generate slug before saving the category."""
+        """Generate slug before saving and keep the subtree's paths in sync."""
         if not self.slug:
             self.slug = slugify(self.name)
+        parent = self.parent if self.parent_id else None
+        if parent is not None and self.pk and self._is_own_ancestor(parent):
+            raise ValueError("A category cannot be moved below itself.")
         super().save(*args, **kwargs)
 
+        old_path = self.path
+        path, depth, breadcrumbs = build_category_path(self, parent)
+        if (path, depth, breadcrumbs) == (self.path, self.depth, self.breadcrumbs):
+            return
+        self.path, self.depth, self.breadcrumbs = path, depth, breadcrumbs
+        Category.objects.filter(pk=self.pk).update(
+            path=path, depth=depth, breadcrumbs=breadcrumbs
+        )
+        if old_path:
+            self._rebuild_descendants(old_path)
+
+    def _rebuild_descendants(self, old_path):
+        """Rewrite path, depth and breadcrumbs below this category after a move or rename."""
+        nodes = {self.pk: self}
+        descendants = list(
+            Category.objects.filter(path__startswith=old_path)
+            .exclude(pk=self.pk)
+            .order_by("depth")
+        )
+        for node in descendants:
+            node.path, node.depth, node.breadcrumbs = build_category_path(
+                node, nodes[node.parent_id]
+            )
+            nodes[node.pk] = node
+        Category.objects.bulk_update(descendants, ["path", "depth", "breadcrumbs"])
+
     def get_absolute_url(self):
         """Return the category detail URL."""
         return reverse("store:category", kwargs={"slug": self.slug})
 
     def get_full_path(self):
         """Get full category path including parent categories."""
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
+        if self.breadcrumbs:
+            return " > ".join(crumb["name"] for crumb in self.breadcrumbs)
         return self.name
 
+    def get_descendants(self, include_self=True):
+        """Return this category's subtree using the materialized path."""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
+
+RATING_STARS = (1, 2, 3, 4, 5)
+
+
+class ProductQuerySet(models.QuerySet):
+    """Chainable queries for Product."""
 
-class ProductManager(models.Manager):
-    """Custom manager for Product model."""
-    
     def active(self):
         """Return active products with stock available."""
         return self.filter(is_active=True, stock__gt=0)
@@ -66,6 +146,124 @@ class ProductManager(models.Manager):
         """Return products with zero stock."""
         return self.filter(stock=0)
 
+    def in_category(self, category):
+        """Return products in ``category`` or any descendant not under an inactive category."""
+        if not category.path:
+            # An empty path would match every category.
+            return self.filter(category=category, category__is_active=True)
+        hidden = Category.objects.filter(
+            StartsWith(OuterRef("category__path"), F("path")),
+            path__startswith=category.path,
+            is_active=False,
+        )
+        return self.filter(category__path__startswith=category.path).exclude(Exists(hidden))
+
+    def for_cards(self):
+        """Load everything a product card renders in a fixed number of queries.
+
+        Category comes from a join, the primary image from one windowed
+        prefetch for the whole page; ratings and discounts read stored columns.
+        """
+        primary_image = ProductImage.objects.order_by("-is_primary", "order", "created_at")[:1]
+        return self.select_related("category").prefetch_related(
+            Prefetch("images", queryset=primary_image, to_attr="card_images")
+        )
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    """Custom manager for Product model."""
+
+    def apply_rating_change(self, product_id, old_rating=None, new_rating=None):
+        """Move one approved rating in or out of the stored aggregates.
+
+        Runs as a single UPDATE so concurrent review changes never lose counts.
+        """
+        deltas = {stars: 0 for stars in RATING_STARS}
+        if old_rating:
+            deltas[old_rating] -= 1
+        if new_rating:
+            deltas[new_rating] += 1
+
+        new_counts = {
+            stars: F(f"rating_{stars}_count") + delta for stars, delta in deltas.items()
+        }
+        new_total = F("rating_count") + sum(deltas.values())
+        new_sum = sum(stars * count for stars, count in new_counts.items())
+
+        updates = {
+            f"rating_{stars}_count": count
+            for stars, count in new_counts.items()
+            if deltas[stars]
+        }
+        updates["rating_count"] = new_total
+        updates["rating_avg"] = Case(
+            When(rating_count__lte=-sum(deltas.values()), then=Value(0.0)),
+            default=ExpressionWrapper(
+                Cast(new_sum, FloatField()) / new_total,
+                output_field=FloatField(),
+            ),
+            output_field=FloatField(),
+        )
+        updates["updated_at"] = timezone.now()
+        updates["cache_version"] = F("cache_version") + 1
+        return self.filter(pk=product_id).update(**updates)
+
+    def recompute_ratings(self, product_ids=None, batch_size=1000):
+        """Rebuild stored rating aggregates from approved reviews in bulk."""
+        from reviews.models import Review
+
+        products = self.order_by("pk")
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+
+        fields = ["rating_avg", "rating_count"] + [
+            f"rating_{stars}_count" for stars in RATING_STARS
+        ]
+        updated = 0
+        batch = []
+        for product in products.only("pk", "cache_version", *fields).iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                updated += self._recompute_rating_batch(Review, batch, fields)
+                batch = []
+        if batch:
+            updated += self._recompute_rating_batch(Review, batch, fields)
+        return updated
+
+    def _recompute_rating_batch(self, review_model, products, fields):
+        """Recompute aggregates for one batch with a single grouped query."""
+        histograms = {product.pk: dict.fromkeys(RATING_STARS, 0) for product in products}
+        rows = (
+            review_model.objects.filter(product_id__in=histograms, is_approved=True)
+            .values_list("product_id", "rating")
+            .annotate(total=Count("pk"))
+            .order_by()
+        )
+        for product_id, rating, total in rows:
+            histograms[product_id][rating] = total
+
+        now = timezone.now()
+        changed = []
+        for product in products:
+            histogram = histograms[product.pk]
+            count = sum(histogram.values())
+            values = {f"rating_{stars}_count": histogram[stars] for stars in RATING_STARS}
+            values["rating_count"] = count
+            values["rating_avg"] = (
+                sum(stars * total for stars, total in histogram.items()) / count
+                if count else 0.0
+            )
+            if all(getattr(product, field) == value for field, value in values.items()):
+                continue
+            for field, value in values.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            product.cache_version += 1
+            changed.append(product)
+        if not changed:
+            return 0
+        return self.bulk_update(changed, fields + ["updated_at", "cache_version"])
+
 
 class Product(models.Model):
     """Product model."""
@@ -89,6 +287,15 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
 
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
+
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.TextField(max_length=300, blank=True)
     meta_keywords = models.CharField(max_length=255, blank=True)
@@ -100,6 +307,13 @@ class Product(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-rating_avg", "-rating_count", "-id"], name="store_product_rating_idx"),
+            models.Index(fields=["-created_at", "-id"], name="store_product_newest_idx"),
+            models.Index(fields=["price", "id"], name="store_product_price_idx"),
+            models.Index(fields=["name", "id"], name="store_product_name_idx"),
+            models.Index(fields=["updated_at"], name="store_product_updated_idx"),
+        ]
 
     def __str__(self):
         """Return the product name."""
@@ -112,8 +326,21 @@ class Product(models.Model):
         if not self.sku:
             base_sku = slugify(self.name).upper()[:8]
             self.sku = f"{base_sku}-{self.id}" if self.id else base_sku
+        if self.pk:
+            self.cache_version += 1
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded stock, price and listing fields so saves can tell what changed."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stock = instance.__dict__.get("stock")
+        instance._loaded_price = instance.__dict__.get("price")
+        instance._loaded_listing = (
+            instance.__dict__.get("category_id"), instance.__dict__.get("is_active")
+        )
+        return instance
+
     def get_absolute_url(self):
         """Return the product detail URL."""
         return reverse("store:product_detail", kwargs={"slug": self.slug})
@@ -130,22 +357,27 @@ class Product(models.Model):
         return 0
 
     def get_primary_image(self):
-        """Get the primary product image."""
+        """Get the primary product image, using the for_cards prefetch when present."""
+        if hasattr(self, "card_images"):
+            return self.card_images[0] if self.card_images else None
         return self.images.filter(is_primary=True).first() or self.images.first()
 
     def get_average_rating(self):
-        """Get average rating from reviews."""
-        from reviews.models import Review
-        from django.db.models import Avg
-        reviews = Review.objects.filter(product=self, is_approved=True)
-        if reviews.exists():
-            return round(reviews.aggregate(Avg("rating"))["rating__avg"] or 0, 1)
-        return 0
+        """Get average rating from the stored review aggregates."""
+        if not self.rating_count:
+            return 0
+        return round(self.rating_avg, 1)
 
     def get_review_count(self):
-        """Get total review count."""
-        from reviews.models import Review
-        return Review.objects.filter(product=self, is_approved=True).count()
+        """Get approved review count from the stored review aggregates."""
+        return self.rating_count
+
+    def get_rating_histogram(self):
+        """Return (stars, count) pairs from five stars down to one."""
+        return [
+            (stars, getattr(self, f"rating_{stars}_count"))
+            for stars in reversed(RATING_STARS)
+        ]
 
 
 class ProductImage(models.Model):
@@ -156,6 +388,16 @@ class ProductImage(models.Model):
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized copies by format and width, see store.derivatives",
+    )
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    dominant_color = models.CharField(max_length=7, blank=True, editable=False)
+    placeholder = models.TextField(blank=True, editable=False, help_text="Tiny base64 preview")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -166,7 +408,14 @@ class ProductImage(models.Model):
         return f"{self.product.name} - Image {self.id}"
 
     def save(self, *args, **kwargs):
-        """Ensure only one primary image per product before saving."""
+        """Describe a new upload and keep a single primary image per product."""
+        if self.image and not self.image._committed:
+            # Read from the upload in memory, before it goes to storage.
+            metadata = imaging.describe(self.image.file)
+            self.width = metadata.get("width")
+            self.height = metadata.get("height")
+            self.dominant_color = metadata.get("dominant_color", "")
+            self.placeholder = metadata.get("placeholder", "")
         if self.is_primary:
             ProductImage.objects.filter(product=self.product, is_primary=True).exclude(
                 pk=self.pk
@@ -208,181 +457,162 @@ class ProductVariation(models.Model):
         """Return the variation label for the product."""
         return f"{self.product.name} - {self.variation_type}: {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded adjustment so saves can tell whether it changed."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price_adjustment = instance.__dict__.get("price_adjustment")
+        return instance
+
     def get_final_price(self):
         """Get final price including variation adjustment."""
         return self.product.price + self.price_adjustment
 
 
-@receiver(post_save, sender=ProductImage)
-def set_s3_acl_on_product_image(sender, instance, created, **kwargs):
-    """Ensure S3 images receive public-read ACL after saves when AWS is enabled."""
-    if not getattr(settings, "USE_AWS", False) or not instance.image:
-        return
+class InventoryMovement(models.Model):
+    """Append-only record of one change to a product's stock."""
+
+    SALE = "sale"
+    RESTOCK = "restock"
+    ADJUSTMENT = "adjustment"
+    RETURN = "return"
+    RELEASE = "release"
+    REASON_CHOICES = [
+        (SALE, "Sale"),
+        (RESTOCK, "Restock"),
+        (ADJUSTMENT, "Adjustment"),
+        (RETURN, "Return"),
+        (RELEASE, "Checkout hold released"),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="movements")
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=100, blank=True, help_text="Order number or import source")
+    note = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
 
-    import threading
-    import time
-    import boto3
-    from botocore.exceptions import ClientError
-    import logging
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["product", "-id"], name="store_movement_product_idx"),
+            models.Index(fields=["created_at"], name="store_movement_created_idx"),
+        ]
 
-    logger = logging.getLogger(__name__)
-    normalized_name = instance.image.name
+    def __str__(self):
+        """Return a short description of the movement."""
+        return f"{self.product_id} {self.delta:+d} ({self.reason})"
 
-    def set_acl_after_delay():
-        """Set ACL after a short delay to ensure file is uploaded."""
-        time.sleep(1)
 
-        try:
-            bucket_name = getattr(settings, "AWS_STORAGE_BUCKET_NAME", "")
-            region_name = getattr(settings, "AWS_S3_REGION_NAME", "")
-            aws_access_key_id = getattr(settings, "AWS_ACCESS_KEY_ID", "")
-            aws_secret_access_key = getattr(settings, "AWS_SECRET_ACCESS_KEY", "")
+class InventorySnapshot(models.Model):
+    """Stock of a product with every movement up to ``last_movement_id`` applied."""
 
-            if not all([bucket_name, region_name, aws_access_key_id, aws_secret_access_key]):
-                logger.warning("Signal: AWS settings not complete, skipping ACL setting")
-                return
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="inventory_snapshot",
+    )
+    quantity = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField(default=0, db_index=True)
+    compacted_at = models.DateTimeField(default=timezone.now)
 
-            storage = instance.image.storage
-            image_name = instance.image.name
+    def __str__(self):
+        """Return the product and snapshot quantity."""
+        return f"{self.product_id}: {self.quantity} @ {self.last_movement_id}"
 
-            logger.info(
-                "Signal: Processing image",
-                extra={"name": image_name, "storage": storage.__class__.__name__},
-            )
 
-            if hasattr(storage, "location") and storage.location:
-                location = storage.location.strip("/") if storage.location else ""
-            else:
-                location = getattr(settings, "AWS_LOCATION", "media").strip("/")
-
-            if location.startswith("app/"):
-                location = location[4:]
-
-            if image_name.startswith("app/media/"):
-                image_name = image_name[10:]
-            elif image_name.startswith("app/"):
-                image_name = image_name[4:]
-
-            normalized_name = image_name.lstrip("/")
-            if hasattr(storage, "_normalize_name") and hasattr(storage, "_clean_name"):
-                try:
-                    normalized_name = storage._normalize_name(storage._clean_name(image_name))
-                except Exception:
-                    normalized_name = image_name.lstrip("/")
-
-            if normalized_name.startswith(f"{location}/"):
-                s3_key = normalized_name
-            elif normalized_name.startswith("/"):
-                s3_key = f"{location}{normalized_name}"
-            else:
-                s3_key = f"{location}/{normalized_name}" if location else normalized_name
-
-            s3_client = boto3.client(
-                "s3",
-                region_name=region_name,
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-            )
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, raw=False, **kwargs):
+    """Keep the full-text search document in sync with the product."""
+    if raw:
+        return
+    search.index_products([instance.pk])
 
-            clean_image_name = image_name
-            if clean_image_name.startswith("app/media/"):
-                clean_image_name = clean_image_name[10:]
-            elif clean_image_name.startswith("app/"):
-                clean_image_name = clean_image_name[4:]
-
-            possible_keys = [
-                s3_key,
-                clean_image_name,
-                image_name,
-                f"{location}/{clean_image_name}",
-                f"{location}/{image_name}",
-                f"media/{clean_image_name}",
-                f"media/{image_name}",
-                f"/{clean_image_name}",
-                f"/{image_name}",
-                f"{location}{clean_image_name}",
-                f"{location}{image_name}",
-            ]
-
-            seen = set()
-            unique_keys = []
-            for key in possible_keys:
-                if key not in seen:
-                    seen.add(key)
-                    unique_keys.append(key)
-
-            logger.error(
-                "Signal: S3 key resolution debug",
-                extra={
-                    "image_name_original": instance.image.name,
-                    "image_name_cleaned": image_name,
-                    "normalized_name": normalized_name,
-                    "location": location,
-                    "constructed_s3_key": s3_key,
-                    "possible_keys": possible_keys,
-                    "unique_keys": unique_keys,
-                    "bucket": bucket_name,
-                },
-            )
 
-            file_found = False
-            for key in unique_keys:
-                try:
-                    logger.info(
-                        "Signal: head_object check",
-                        extra={"bucket": bucket_name, "key": key},
-                    )
-                    s3_client.head_object(Bucket=bucket_name, Key=key)
-                    file_found = True
-                    logger.error(
-                        "Signal: File found; attempting ACL",
-                        extra={"key": key, "bucket": bucket_name},
-                    )
-
-                    try:
-                        logger.info(
-                            "Signal: put_object_acl public-read",
-                            extra={"bucket": bucket_name, "key": key},
-                        )
-                        s3_client.put_object_acl(
-                            Bucket=bucket_name,
-                            Key=key,
-                            ACL="public-read",
-                        )
-                        logger.info("Signal: Set ACL to public-read for %s", key)
-                        break
-                    except ClientError as e:
-                        error_code = e.response.get("Error", {}).get("Code", "")
-                        if "BlockPublicAccess" in str(e) or error_code == "AccessDenied":
-                            logger.error(
-                                "Signal: Cannot set ACL for %s", key,
-                                extra={"error": str(e)},
-                            )
-                        else:
-                            logger.warning(
-                                "Signal: Could not set ACL for %s", key,
-                                extra={"error": str(e)},
-                            )
-                    break
-                except ClientError as e:
-                    if e.response["Error"]["Code"] != "404":
-                        logger.warning(
-                            "Signal: Error checking file %s", key,
-                            extra={"error": str(e)},
-                        )
-                    continue
-
-            if not file_found:
-                logger.warning(
-                    "Signal: File not found in S3 for keys",
-                    extra={"keys": unique_keys},
-                )
-
-        except Exception as e:
-            logger.error(f"Error setting S3 ACL for product image: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-
-    thread = threading.Thread(target=set_acl_after_delay)
-    thread.daemon = True
-    thread.start()
+@receiver(post_save, sender=Product)
+def record_stock_change(sender, instance, created, raw=False, **kwargs):
+    """Log stock set through ``save()`` (admin forms, shell) as a ledger movement.
+
+    Set ``_stock_reason``, ``_stock_note`` and ``_stock_user`` on the instance
+    to describe the change; it is logged as an adjustment otherwise.
+    """
+    if raw:
+        return
+    previous = None if created else getattr(instance, "_loaded_stock", None)
+    if previous is None and not created:
+        return
+    delta = instance.stock - (previous or 0)
+    if delta:
+        InventoryMovement.objects.create(
+            product=instance,
+            delta=delta,
+            reason=getattr(instance, "_stock_reason", "") or (
+                InventoryMovement.RESTOCK if created else InventoryMovement.ADJUSTMENT
+            ),
+            note=getattr(instance, "_stock_note", "") or ("Opening stock" if created else ""),
+            created_by=getattr(instance, "_stock_user", None),
+        )
+    instance._loaded_stock = instance.stock
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_search_index(sender, instance, **kwargs):
+    """Drop the search document of a deleted product."""
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_catalog_version(sender, instance, raw=False, **kwargs):
+    """Invalidate conditional-GET validators of catalog pages."""
+    if raw:
+        return
+    caching.bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_category_versions(sender, instance, signal, raw=False, created=False, **kwargs):
+    """Invalidate related-product lists when a product joins, leaves or hides from a category."""
+    if raw:
+        return
+    listing = (instance.category_id, instance.is_active)
+    loaded = getattr(instance, "_loaded_listing", None)
+    if signal is post_save and not created and loaded == listing:
+        return
+    caching.bump_category_versions([instance.category_id, loaded[0] if loaded else None])
+    instance._loaded_listing = listing
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+def bump_product_cache_version(sender, instance, raw=False, **kwargs):
+    """Invalidate cached product fragments when images or variations change."""
+    if raw:
+        return
+    caching.bump_product_versions([instance.product_id])
+
+
+@receiver(post_save, sender=ProductImage)
+def schedule_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Generate resized copies of a new or replaced image after commit."""
+    if raw or not instance.image or derivatives.is_current(instance):
+        return
+    stale = derivatives.stored_names(instance.derivatives)
+    if instance.derivatives:
+        # Replaced file: stop serving the old copies right away.
+        ProductImage.objects.filter(pk=instance.pk).update(derivatives={})
+        instance.derivatives = {}
+    transaction.on_commit(lambda: derivatives.schedule([instance.pk], stale=stale))
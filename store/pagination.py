@@ -0,0 +1,205 @@
+"""Keyset (cursor) pagination for catalog listings.
+
+Pages are fetched with ``WHERE (sort_key, id) > (last_key, last_id)`` style
+filters instead of OFFSET, and without a ``COUNT(*)``, so the cost of a page
+depends on the page size rather than on how deep the visitor has browsed.
+Legacy ``?page=N`` URLs keep working through a bounded OFFSET fallback.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+
+CURSOR_SALT = "store.pagination.cursor"
+CURSOR_PARAM = "cursor"
+PAGE_PARAM = "page"
+MAX_OFFSET_PAGE = 50
+
+
+def _encode_value(value):
+    """Make a sort key JSON-safe without losing precision."""
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["dec", str(value)]
+    return value
+
+
+def _decode_value(value):
+    """Reverse :func:`_encode_value`."""
+    if isinstance(value, list) and len(value) == 2:
+        kind, raw = value
+        if kind == "dt":
+            return parse_datetime(raw)
+        if kind == "d":
+            return parse_date(raw)
+        if kind == "dec":
+            return Decimal(raw)
+    return value
+
+
+def encode_cursor(ordering, values, direction):
+    """Return an opaque, signed token pointing before or after a row."""
+    payload = {
+        "o": list(ordering),
+        "v": [_encode_value(value) for value in values],
+        "d": direction,
+    }
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, ordering):
+    """Return (values, direction) for a valid token, or None."""
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if payload.get("o") != list(ordering) or payload.get("d") not in ("next", "prev"):
+        return None
+    values = [_decode_value(value) for value in payload.get("v", [])]
+    if len(values) != len(ordering):
+        return None
+    return values, payload["d"]
+
+
+def _keyset_filter(ordering, values, forward):
+    """Build the lexicographic "row comes after/before" condition."""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith("-")
+        name = field.lstrip("-")
+        lookup = "lt" if descending == forward else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing.
+
+    Mirrors the parts of Django's ``Page`` API the templates use and adds
+    ``next_query_string``/``previous_query_string`` for building links.
+    """
+
+    def __init__(self, object_list, ordering, query, has_next, has_previous, number=None):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.query = query
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.number = number
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _key(self, obj):
+        return [getattr(obj, field.lstrip("-")) for field in self.ordering]
+
+    def _query_string(self, token):
+        query = self.query.copy()
+        query.pop(PAGE_PARAM, None)
+        query[CURSOR_PARAM] = token
+        return query.urlencode()
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor(self.ordering, self._key(self.object_list[-1]), "next")
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor(self.ordering, self._key(self.object_list[0]), "prev")
+
+    @property
+    def next_query_string(self):
+        cursor = self.next_cursor
+        return self._query_string(cursor) if cursor else ""
+
+    @property
+    def previous_query_string(self):
+        cursor = self.previous_cursor
+        if cursor:
+            return self._query_string(cursor)
+        if self._has_previous and self.number:
+            query = self.query.copy()
+            query[PAGE_PARAM] = self.number - 1
+            return query.urlencode()
+        return ""
+
+
+def paginate(request, queryset, ordering, per_page):
+    """Return a :class:`KeysetPage` for the request.
+
+    ``ordering`` must end with a unique field (normally ``id``) so every row
+    has a distinct key. A ``cursor`` parameter selects a keyset page; a
+    ``page`` number falls back to OFFSET, capped at ``MAX_OFFSET_PAGE``.
+    """
+    ordering = list(ordering)
+    query = request.GET.copy()
+    query.pop(CURSOR_PARAM, None)
+    query.pop(PAGE_PARAM, None)
+
+    token = request.GET.get(CURSOR_PARAM)
+    cursor = decode_cursor(token, ordering) if token else None
+
+    if cursor:
+        values, direction = cursor
+        forward = direction == "next"
+        page_ordering = ordering if forward else _reverse_ordering(ordering)
+        rows = list(
+            queryset.filter(_keyset_filter(ordering, values, forward))
+            .order_by(*page_ordering)[:per_page + 1]
+        )
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if forward:
+            return KeysetPage(rows, ordering, query, has_next=has_more, has_previous=True)
+        rows.reverse()
+        return KeysetPage(rows, ordering, query, has_next=True, has_previous=has_more)
+
+    try:
+        number = int(request.GET.get(PAGE_PARAM, 1))
+    except (TypeError, ValueError):
+        number = 1
+    number = min(max(number, 1), MAX_OFFSET_PAGE)
+    offset = (number - 1) * per_page
+    rows = list(queryset.order_by(*ordering)[offset:offset + per_page + 1])
+    has_next = len(rows) > per_page
+    return KeysetPage(
+        rows[:per_page],
+        ordering,
+        query,
+        has_next=has_next,
+        has_previous=number > 1,
+        number=number,
+    )
@@ -0,0 +1,154 @@
+"""Full-text product search backed by a maintained search index.
+
+On PostgreSQL the index is a ``tsvector`` table with a GIN index, on SQLite
+it is an FTS5 virtual table. Other database backends fall back to the
+original ``icontains`` filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = "store_product_search"
+SEARCH_CONFIG = "english"
+INDEX_BATCH_SIZE = 500
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_supported():
+    """Return True when the active database has a search index backend."""
+    return connection.vendor in ("postgresql", "sqlite")
+
+
+def _terms(query):
+    """Split a raw search string into safe lowercase terms."""
+    return _TERM_RE.findall((query or "").lower())
+
+
+def _postgres_query(terms):
+    """Build a prefix-matching ``to_tsquery`` expression."""
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _sqlite_query(terms):
+    """Build a prefix-matching FTS5 MATCH expression."""
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def index_products(product_ids):
+    """Insert or refresh search documents for the given product ids."""
+    product_ids = [int(pk) for pk in product_ids if pk is not None]
+    if not product_ids or not is_supported():
+        return
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+            batch = product_ids[start:start + INDEX_BATCH_SIZE]
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SEARCH_TABLE} (product_id, document)
+                    SELECT id,
+                           setweight(to_tsvector(%s, coalesce(name, '')), 'A') ||
+                           setweight(to_tsvector(%s, coalesce(short_description, '')), 'B') ||
+                           setweight(to_tsvector(%s, coalesce(description, '')), 'C')
+                    FROM store_product
+                    WHERE id = ANY(%s)
+                    ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document
+                    """,
+                    [SEARCH_CONFIG, SEARCH_CONFIG, SEARCH_CONFIG, batch],
+                )
+            else:
+                placeholders = ", ".join(["%s"] * len(batch))
+                cursor.execute(
+                    f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+                    batch,
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SEARCH_TABLE} (rowid, name, short_description, description)
+                    SELECT id, name, short_description, description
+                    FROM store_product
+                    WHERE id IN ({placeholders})
+                    """,
+                    batch,
+                )
+
+
+def remove_products(product_ids):
+    """Drop search documents for deleted products."""
+    product_ids = [int(pk) for pk in product_ids if pk is not None]
+    if not product_ids or not is_supported():
+        return
+
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    key = "product_id" if connection.vendor == "postgresql" else "rowid"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN ({placeholders})",
+            product_ids,
+        )
+
+
+def clear_index():
+    """Remove every search document."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+def search_products(queryset, query, ranked=False):
+    """Filter a product queryset by a search string.
+
+    When ``ranked`` is True the queryset is annotated with ``search_rank``
+    (higher is more relevant) and ordered by it.
+    """
+    terms = _terms(query)
+    if not terms or not is_supported():
+        # Punctuation-only queries have nothing indexed; match them as typed.
+        query = (query or "").strip()
+        if not terms and not query:
+            return queryset
+        condition = Q()
+        for term in terms or [query]:
+            condition &= (
+                Q(name__icontains=term) |
+                Q(description__icontains=term) |
+                Q(short_description__icontains=term)
+            )
+        queryset = queryset.filter(condition)
+        if ranked:
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset
+
+    if connection.vendor == "postgresql":
+        expression = _postgres_query(terms)
+        matches = RawSQL(
+            f"SELECT product_id FROM {SEARCH_TABLE} "
+            f"WHERE document @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+            [expression],
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('{SEARCH_CONFIG}', %s)) "
+            f"FROM {SEARCH_TABLE} WHERE product_id = store_product.id",
+            [expression],
+        )
+    else:
+        expression = _sqlite_query(terms)
+        matches = RawSQL(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            [expression],
+        )
+        rank = RawSQL(
+            f"SELECT -bm25({SEARCH_TABLE}, 10.0, 4.0, 1.0) FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND rowid = store_product.id",
+            [expression],
+        )
+
+    queryset = queryset.filter(id__in=matches)
+    if ranked:
+        queryset = queryset.annotate(search_rank=rank).order_by("-search_rank", "-id")
+    return queryset
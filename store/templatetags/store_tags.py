@@ -0,0 +1,121 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from store import derivatives
+from store.caching import get_or_render
+
+register = template.Library()
+
+
+class ProductCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, product, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.product = product
+        self.vary_on = vary_on
+
+    def render(self, context):
+        product = self.product.resolve(context)
+        if product is None or getattr(product, "pk", None) is None:
+            return self.nodelist.render(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_render(
+            self.fragment_name,
+            product,
+            lambda: self.nodelist.render(context),
+            vary_on,
+        )
+
+
+@register.tag("productcache")
+def do_productcache(parser, token):
+    """
+    Cache a product fragment until the product's cache version changes.
+
+    Usage::
+
+        {% load store_tags %}
+        {% productcache "card" product [var1] [var2] .. %}
+            .. product markup ..
+        {% endproductcache %}
+    """
+    nodelist = parser.parse(("endproductcache",))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires a fragment name and a product."
+        )
+    fragment_name = tokens[1]
+    if fragment_name[0] in "\"'" and fragment_name[-1] == fragment_name[0]:
+        fragment_name = fragment_name[1:-1]
+    return ProductCacheNode(
+        nodelist,
+        fragment_name,
+        parser.compile_filter(tokens[2]),
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+    )
+
+
+DEFAULT_SIZES = "100vw"
+SOURCE_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def placeholder_style(image):
+    """Inline background showing the image's colour and preview until it loads."""
+    layers = [image.dominant_color or "transparent"]
+    if image.placeholder:
+        layers.append(f"url({image.placeholder}) center / cover no-repeat")
+    return f"background: {' '.join(layers)};"
+
+
+def _srcset(candidates):
+    return ", ".join(f"{url} {width}w" for width, url in candidates)
+
+
+@register.simple_tag
+def product_image(image, sizes=DEFAULT_SIZES, **attrs):
+    """
+    Render a product image as ``<picture>`` with responsive derivatives.
+
+    Falls back to a plain ``<img>`` of the original until the derivatives
+    exist. Stored dimensions become ``width``/``height`` so the layout does
+    not shift, and the dominant colour and blurred placeholder fill the box
+    while the file loads. Extra keyword arguments become ``<img>``
+    attributes; ``loading`` defaults to ``lazy``.
+
+    Usage::
+
+        {% product_image image sizes="(min-width: 992px) 33vw, 100vw" class="img-fluid" alt=product.name %}
+    """
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    if image.width and image.height:
+        attrs.setdefault("width", image.width)
+        attrs.setdefault("height", image.height)
+    if image.placeholder or image.dominant_color:
+        attrs.setdefault("style", placeholder_style(image))
+    attributes = format_html_join(" ", '{}="{}"', sorted(attrs.items()))
+    fallback = derivatives.srcset(image, "jpeg")
+    sources = []
+    for fmt, mime in SOURCE_TYPES.items():
+        candidates = derivatives.srcset(image, fmt)
+        if candidates:
+            sources.append((mime, candidates))
+    if not fallback and not sources:
+        return format_html('<img src="{}" {}>', image.image.url, attributes)
+
+    # Medium-sized JPEG for browsers without srcset support.
+    src = fallback[min(len(fallback) - 1, 2)][1] if fallback else image.image.url
+    return format_html(
+        '<picture>{}<img src="{}"{} sizes="{}" {}></picture>',
+        format_html_join(
+            "",
+            '<source type="{}" srcset="{}" sizes="{}">',
+            ((mime, _srcset(candidates), sizes) for mime, candidates in sources),
+        ),
+        src,
+        format_html(' srcset="{}"', _srcset(fallback)) if fallback else "",
+        sizes,
+        attributes,
+    )
@@ -1 +1,822 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from PIL import Image
+
+from cart.models import Cart, CartItem
+from furniture_store import s3_acl
+from reviews.models import Review
+
+from . import caching, derivatives, importers, ledger, loaders
+from .models import (
+    Category,
+    InventoryMovement,
+    InventorySnapshot,
+    Product,
+    ProductImage,
+    ProductVariation,
+)
+from .search import search_products
+
+User = get_user_model()
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "template_fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragment-tests",
+    },
+}
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Living Room")
+        self.sofa = Product.objects.create(
+            name="Velvet Sofa",
+            description="A deep three seater with plush cushions.",
+            price=899,
+            stock=4,
+            category=self.category,
+        )
+        self.chair = Product.objects.create(
+            name="Oak Chair",
+            description="Solid oak dining chair, pairs well with any sofa.",
+            price=149,
+            stock=12,
+            category=self.category,
+        )
+
+    def test_search_matches_indexed_fields_and_prefixes(self):
+        results = search_products(Product.objects.all(), "velv")
+        self.assertEqual(list(results), [self.sofa])
+
+    def test_ranked_search_prefers_name_matches(self):
+        results = search_products(Product.objects.all(), "sofa", ranked=True)
+        self.assertEqual(list(results), [self.sofa, self.chair])
+
+    def test_query_without_words_falls_back_to_icontains(self):
+        Product.objects.create(name="C++ Desk", description="Desk", price=300)
+        self.assertEqual(list(search_products(Product.objects.all(), "++").values_list("name", flat=True)),
+                         ["C++ Desk"])
+        self.assertEqual(search_products(Product.objects.all(), "  ").count(), 3)
+        response = self.client.get(reverse("store:shop"), {"q": "++"})
+        self.assertEqual([p.name for p in response.context["products"]], ["C++ Desk"])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.chair.name = "Walnut Stool"
+        self.chair.description = "Compact stool."
+        self.chair.save()
+        self.assertFalse(search_products(Product.objects.all(), "oak").exists())
+        self.assertTrue(search_products(Product.objects.all(), "walnut").exists())
+
+        self.sofa.delete()
+        self.assertFalse(search_products(Product.objects.all(), "velvet").exists())
+
+    def test_shop_view_uses_search_with_filters(self):
+        response = self.client.get(reverse("store:shop"), {"q": "sofa", "max_price": "500"})
+        self.assertEqual(list(response.context["products"]), [self.chair])
+        self.assertEqual(response.context["sort_by"], "relevance")
+
+
+class ProductCardLoaderTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Bedroom")
+
+    def _add_products(self, count):
+        for index in range(count):
+            product = Product.objects.create(
+                name=f"Bed {Product.objects.count()}",
+                description="Bed",
+                price=300,
+                stock=1,
+                category=self.category,
+            )
+            ProductImage.objects.create(product=product, image=f"photos/products/bed-{product.pk}-a.jpg")
+            ProductImage.objects.create(
+                product=product, image=f"photos/products/bed-{product.pk}-b.jpg", is_primary=True
+            )
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_for_cards_returns_primary_image(self):
+        self._add_products(1)
+        product = Product.objects.for_cards().get()
+        with self.assertNumQueries(0):
+            image = product.get_primary_image()
+            self.assertTrue(image.is_primary)
+            self.assertEqual(product.category.name, "Bedroom")
+
+    def test_listing_query_count_is_independent_of_page_size(self):
+        self._add_products(2)
+        few = self._count_queries(reverse("store:shop"))
+        self._add_products(8)
+        many = self._count_queries(reverse("store:shop"))
+        self.assertEqual(few, many)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for index in range(30):
+            Product.objects.create(
+                name=f"Lamp {index:02d}",
+                description="Lamp",
+                price=10 + index % 7,
+                stock=1,
+            )
+        self.expected = list(
+            Product.objects.order_by("price", "id").values_list("id", flat=True)
+        )
+
+    def _ids(self, response):
+        return [product.id for product in response.context["products"]]
+
+    def test_cursor_walk_covers_every_product_in_order(self):
+        seen = []
+        query = "sort=price_low"
+        pages = []
+        while True:
+            response = self.client.get(f"{reverse('store:shop')}?{query}")
+            page = response.context["products"]
+            pages.append(page)
+            seen.extend(self._ids(response))
+            if not page.has_next():
+                break
+            query = page.next_query_string
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(f"{reverse('store:shop')}?{pages[-1].previous_query_string}")
+        self.assertEqual(self._ids(response), self.expected[12:24])
+
+    def test_listing_issues_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("store:shop"), {"page": 2})
+        self.assertFalse(any("COUNT(" in query["sql"].upper() for query in queries))
+
+    def test_page_number_fallback_and_bad_cursor(self):
+        response = self.client.get(reverse("store:shop"), {"sort": "price_low", "page": 3})
+        self.assertEqual(self._ids(response), self.expected[24:])
+        self.assertTrue(response.context["products"].has_previous())
+
+        response = self.client.get(reverse("store:shop"), {"sort": "price_low", "cursor": "tampered"})
+        self.assertEqual(self._ids(response), self.expected[:12])
+
+
+@override_settings(CACHES=TEST_CACHES, FRAGMENT_CACHE_ALIAS="template_fragments")
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        caching.get_fragment_cache().clear()
+        caching.reset_stats()
+        self.product = Product.objects.create(
+            name="Linen Armchair", description="Armchair", price=420, stock=3
+        )
+
+    def _render_detail(self):
+        response = self.client.get(reverse("store:product_detail", args=[self.product.slug]))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_render_is_served_from_cache(self):
+        self._render_detail()
+        self.assertEqual(caching.get_stats()["hits"], 0)
+        self._render_detail()
+        stats = caching.get_stats()
+        self.assertEqual(stats["hits"], stats["misses"])
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_image_change_invalidates_product_fragments(self):
+        self._render_detail()
+        ProductImage.objects.create(product=self.product, image="photos/products/armchair.jpg")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.cache_version, 1)
+        response = self._render_detail()
+        self.assertContains(response, "photos/products/armchair.jpg")
+        self.assertEqual(caching.get_stats()["hits"], 0)
+
+    def test_product_save_bumps_version(self):
+        self._render_detail()
+        self.product.price = 399
+        self.product.save()
+        self.assertContains(self._render_detail(), "$399")
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.rooms = Category.objects.create(name="Rooms")
+        self.living = Category.objects.create(name="Living", parent=self.rooms)
+        self.sofas = Category.objects.create(name="Sofas", parent=self.living)
+        self.outdoor = Category.objects.create(name="Outdoor")
+        self.sofa = Product.objects.create(
+            name="Corner Sofa", description="Sofa", price=999, stock=1, category=self.sofas
+        )
+        self.bench = Product.objects.create(
+            name="Garden Bench", description="Bench", price=199, stock=1, category=self.outdoor
+        )
+
+    def test_path_and_breadcrumbs_follow_ancestors(self):
+        self.assertTrue(self.sofas.path.startswith(self.living.path))
+        self.assertEqual(self.sofas.depth, 2)
+        self.assertEqual(self.sofas.get_full_path(), "Rooms > Living > Sofas")
+
+    def test_move_and_rename_rewrite_subtree(self):
+        self.living.parent = self.outdoor
+        self.living.save()
+        self.rooms.refresh_from_db()
+        self.outdoor.name = "Garden"
+        self.outdoor.save()
+        self.sofas.refresh_from_db()
+        self.assertTrue(self.sofas.path.startswith(self.outdoor.path))
+        self.assertEqual(self.sofas.get_full_path(), "Garden > Living > Sofas")
+        self.assertEqual(list(self.rooms.get_descendants(include_self=False)), [])
+
+    def test_cycles_are_rejected(self):
+        self.rooms.parent = self.sofas
+        with self.assertRaises(ValueError):
+            self.rooms.save()
+
+    def test_category_page_includes_descendants(self):
+        response = self.client.get(reverse("store:category", args=[self.rooms.slug]))
+        self.assertEqual(list(response.context["products"]), [self.sofa])
+        response = self.client.get(reverse("store:shop"), {"category": self.living.slug})
+        self.assertEqual(list(response.context["products"]), [self.sofa])
+
+    def test_inactive_category_hides_its_subtree(self):
+        self.living.is_active = False
+        self.living.save()
+        self.assertEqual(list(Product.objects.in_category(self.rooms)), [])
+        self.assertEqual(list(Product.objects.in_category(self.living)), [])
+
+        unsaved_path = Category(pk=self.outdoor.pk, name="Outdoor", is_active=True)
+        self.assertEqual(list(Product.objects.in_category(unsaved_path)), [self.bench])
+
+    def test_breadcrumbs_render_without_queries(self):
+        category = Category.objects.get(pk=self.sofas.pk)
+        with self.assertNumQueries(0):
+            html = render_to_string(
+                "store/includes/breadcrumbs.html", {"crumbs": category.breadcrumbs}
+            )
+        self.assertIn(reverse("store:category", args=[self.living.slug]), html)
+
+
+@override_settings(CACHES=TEST_CACHES, FRAGMENT_CACHE_ALIAS="template_fragments")
+class ProductDetailLoaderTests(TestCase):
+    def setUp(self):
+        caching.get_fragment_cache().clear()
+        self.category = Category.objects.create(name="Dining")
+        self.table = Product.objects.create(
+            name="Oak Table", description="Table", price=700, stock=2, category=self.category
+        )
+        self.user = User.objects.create_user(email="diner@example.com", password="pass12345")
+        self._add_content(self.table, 1)
+
+    def _add_content(self, product, count):
+        start = product.images.count()
+        for index in range(start, start + count):
+            ProductImage.objects.create(product=product, image=f"photos/products/{product.pk}-{index}.jpg")
+            ProductVariation.objects.create(
+                product=product, variation_type="color", name=f"Color {index}", value=f"c{index}"
+            )
+            reviewer = User.objects.create_user(
+                email=f"reviewer-{product.pk}-{index}@example.com", password="pass12345"
+            )
+            Review.objects.create(
+                product=product, user=reviewer, rating=4, comment="Solid.", is_approved=True
+            )
+            related = Product.objects.create(
+                name=f"Chair {product.pk}-{index}", sku=f"CHAIR-{product.pk}-{index}",
+                description="Chair", price=90, stock=1, category=self.category,
+            )
+            ProductImage.objects.create(product=related, image=f"photos/products/chair-{related.pk}.jpg")
+
+    def _count_queries(self):
+        url = reverse("store:product_detail", args=[self.table.slug])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_detail_page_query_count_is_pinned(self):
+        # One of these is the conditional-GET validator lookup.
+        self.assertEqual(self._count_queries(), 8)
+        # Related ids and rendered fragments now come from the cache.
+        self.assertEqual(self._count_queries(), 7)
+
+    def test_query_count_does_not_grow_with_content(self):
+        few = self._count_queries()
+        self._add_content(self.table, 4)
+        caching.get_fragment_cache().clear()
+        self.assertEqual(self._count_queries(), few)
+
+    def test_loader_context_uses_prefetched_rows(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("store:product_detail", args=[self.table.slug]))
+        context = response.context
+        self.assertEqual(len(context["images"]), 1)
+        self.assertEqual(len(context["related_products"]), 1)
+        self.assertEqual(context["review_count"], 1)
+        self.assertTrue(context["can_review"])
+
+    def test_related_products_follow_catalog_changes(self):
+        self.assertEqual(len(loaders.load_related_products(self.table)), 1)
+        stool = Product.objects.create(
+            name="Stool", description="Stool", price=40, stock=3, category=Category.objects.create(name="Bar")
+        )
+        stool.category = self.category
+        stool.save()
+        self.assertEqual(loaders.load_related_products(self.table)[0], stool)
+
+    def test_stock_and_price_changes_keep_related_products_cached(self):
+        loaders.related_product_ids(self.table)
+        chair = Product.objects.exclude(pk=self.table.pk).get()
+        chair.stock = 0
+        chair.price = 85
+        chair.save()
+        Product.objects.create(name="Rug", description="Rug", price=60, category=Category.objects.create(name="Rugs"))
+        with self.assertNumQueries(0):
+            loaders.related_product_ids(self.table)
+
+
+@override_settings(CACHES=TEST_CACHES, FRAGMENT_CACHE_ALIAS="template_fragments")
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caching.get_fragment_cache().clear()
+        self.category = Category.objects.create(name="Storage")
+        self.product = Product.objects.create(
+            name="Pine Shelf", description="Shelf", price=120, stock=5, category=self.category
+        )
+        self.urls = [
+            reverse("store:product_detail", args=[self.product.slug]),
+            reverse("store:category", args=[self.category.slug]),
+            reverse("store:shop"),
+            "/sitemap.xml",
+        ]
+
+    def _revalidate(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_pages_answer_not_modified_without_rendering(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self._revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertNotIn("Last-Modified", response)
+
+    def test_deleting_a_product_is_not_hidden_by_if_modified_since(self):
+        url = reverse("store:shop")
+        self.client.get(url)
+        self.product.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Pine Shelf")
+
+    def test_catalog_changes_change_validators(self):
+        etags = {url: self.client.get(url)["ETag"] for url in self.urls}
+        ProductImage.objects.create(product=self.product, image="photos/products/shelf.jpg")
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    def test_guest_cart_changes_change_validators(self):
+        url = reverse("store:shop")
+        etag = self.client.get(url)["ETag"]
+
+        def add_to_cart():
+            self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": 1})
+            self.client.get(url)  # shows the flash message
+
+        add_to_cart()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._revalidate(url).status_code, 304)
+
+        add_to_cart()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response.context["cart_count"]), 2)
+
+    def test_signed_in_users_always_get_fresh_pages(self):
+        user = User.objects.create_user(email="shopper@example.com", password="pass12345")
+        etag = self.client.get(self.urls[0])["ETag"]
+        self.client.force_login(user)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media_root = os.path.join(self.tmp.name, "media")
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        with open(os.path.join(self.tmp.name, "desk.jpg"), "wb") as handle:
+            handle.write(b"jpeg-bytes")
+        self.source = os.path.join(self.tmp.name, "catalog.csv")
+        self._write_csv([
+            {"sku": "DESK-1", "name": "Study Desk", "price": "250", "stock": "3",
+             "category": "Office > Desks", "images": "desk.jpg",
+             "variations": '[{"variation_type": "color", "name": "Oak", "price_adjustment": "15"}]'},
+            {"sku": "DESK-2", "name": "Study Desk", "price": "275", "category": "Office > Desks"},
+            {"sku": "", "name": "Filing Cabinet", "price": "180", "category": "Office"},
+            {"sku": "BROKEN", "name": "Broken Row", "price": "n/a"},
+        ])
+
+    def _write_csv(self, rows):
+        fields = ["sku", "name", "price", "stock", "category", "images", "variations"]
+        with open(self.source, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def _import(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_catalog", self.source, "--image-root", self.tmp.name, "--batch-size", "2",
+            *args, stdout=stdout, stderr=stderr,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_creates_products_categories_variations_and_images(self):
+        _stdout, stderr = self._import()
+        self.assertIn("Row 5 skipped", stderr)
+        desk = Product.objects.get(sku="DESK-1")
+        self.assertEqual(desk.category.get_full_path(), "Office > Desks")
+        self.assertEqual(desk.variations.get().price_adjustment, 15)
+        self.assertTrue(desk.images.get().is_primary)
+        slugs = set(Product.objects.values_list("slug", flat=True))
+        self.assertEqual(slugs, {"study-desk", "study-desk-2", "filing-cabinet"})
+        self.assertTrue(Product.objects.get(name="Filing Cabinet").sku.startswith("FILING-C"))
+        self.assertEqual(list(search_products(Product.objects.all(), "cabinet")),
+                         [Product.objects.get(name="Filing Cabinet")])
+
+    def test_reimport_updates_by_sku_without_duplicates(self):
+        self._import()
+        user = User.objects.create_user(email="importer@example.com", password="password123")
+        cart = Cart.objects.create(user=user, item_count=1, subtotal=250)
+        CartItem.objects.create(cart=cart, product=Product.objects.get(sku="DESK-1"), quantity=1)
+        self._write_csv([{"sku": "DESK-1", "name": "Study Desk", "price": "199", "images": "desk.jpg"}])
+        self._import()
+        desk = Product.objects.get(sku="DESK-1")
+        self.assertEqual(desk.price, 199)
+        self.assertEqual(desk.cache_version, 1)
+        self.assertEqual(desk.images.count(), 1)
+        cart.refresh_from_db()
+        self.assertIsNone(cart.subtotal)
+
+    def test_reimport_keeps_sales_made_during_uploads(self):
+        self._import()
+        desk = Product.objects.get(sku="DESK-1")
+        upload_images = importers.CatalogImporter._upload_images
+
+        def upload_during_checkout(importer, pairs):
+            # A checkout sells one desk while the importer downloads images.
+            Product.objects.filter(pk=desk.pk).update(stock=F("stock") - 1)
+            ledger.record(desk.pk, -1, ledger.SALE, reference="ORD-1")
+            return upload_images(importer, pairs)
+
+        self._write_csv([{"sku": "DESK-1", "name": "Study Desk", "price": "250", "stock": "8"}])
+        with mock.patch.object(importers.CatalogImporter, "_upload_images", upload_during_checkout):
+            self._import()
+
+        desk.refresh_from_db()
+        self.assertEqual(desk.stock, 7)
+        self.assertEqual(ledger.current_stock(desk.pk), 7)
+
+    def test_resumes_from_checkpoint(self):
+        with open(f"{self.source}.checkpoint", "w", encoding="utf-8") as handle:
+            json.dump({"source": os.path.abspath(self.source), "rows": 2}, handle)
+        self._import()
+        self.assertEqual(list(Product.objects.values_list("name", flat=True)), ["Filing Cabinet"])
+        self.assertFalse(os.path.exists(f"{self.source}.checkpoint"))
+
+
+class InventoryLedgerTests(TestCase):
+    def setUp(self):
+        self.lamp = Product.objects.create(name="Arc Lamp", description="Lamp", price=120, stock=10)
+
+    def _change_stock(self, stock, reason=None):
+        product = Product.objects.get(pk=self.lamp.pk)
+        product.stock = stock
+        product._stock_reason = reason
+        product.save()
+
+    def test_stock_changes_are_logged_as_movements(self):
+        self._change_stock(14, ledger.RESTOCK)
+        self._change_stock(11)
+        Product.objects.get(pk=self.lamp.pk).save()
+
+        movements = list(self.lamp.movements.order_by("id").values_list("delta", "reason"))
+        self.assertEqual(
+            movements,
+            [(10, ledger.RESTOCK), (4, ledger.RESTOCK), (-3, ledger.ADJUSTMENT)],
+        )
+        self.assertEqual(ledger.current_stock(self.lamp.pk), 11)
+
+    def test_compaction_folds_tail_into_snapshot(self):
+        self._change_stock(7)
+        self.assertEqual(ledger.compact(settle=timedelta(0)), 1)
+        snapshot = InventorySnapshot.objects.get(product=self.lamp)
+        self.assertEqual(snapshot.quantity, 7)
+
+        self._change_stock(9)
+        self.assertEqual(ledger.compact(settle=timedelta(hours=1)), 0)
+        with self.assertNumQueries(2):
+            self.assertEqual(ledger.current_stock(self.lamp.pk), 9)
+
+        self.assertEqual(ledger.compact(settle=timedelta(0)), 1)
+        snapshot.refresh_from_db()
+        latest = InventoryMovement.objects.latest("id")
+        self.assertEqual((snapshot.quantity, snapshot.last_movement_id), (9, latest.id))
+        self.assertEqual(ledger.compact(settle=timedelta(0)), 0)
+
+    def test_verify_reports_stock_written_around_the_ledger(self):
+        call_command("compact_inventory_ledger", "--verify", "--settle-minutes=0", stdout=StringIO())
+
+        Product.objects.filter(pk=self.lamp.pk).update(stock=3)
+        stderr = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("compact_inventory_ledger", "--verify", stdout=StringIO(), stderr=stderr)
+        self.assertIn(f"Product {self.lamp.pk}: stock 3, ledger 10 (-7)", stderr.getvalue())
+
+    def test_admin_shows_history(self):
+        admin_user = User.objects.create_superuser(email="admin@example.com", password="pass12345")
+        self.client.force_login(admin_user)
+        self._change_stock(12, ledger.RESTOCK)
+
+        response = self.client.get(reverse("admin:store_product_change", args=[self.lamp.pk]))
+        self.assertContains(response, "Recent stock movements")
+        self.assertContains(response, "+2")
+
+        response = self.client.get(
+            reverse("admin:store_inventorymovement_changelist"), {"product__id__exact": self.lamp.pk}
+        )
+        self.assertContains(response, "Opening stock")
+
+    def test_admin_stock_edit_applies_on_top_of_concurrent_sales(self):
+        admin_user = User.objects.create_superuser(email="admin@example.com", password="pass12345")
+        self.client.force_login(admin_user)
+        url = reverse("admin:store_product_change", args=[self.lamp.pk])
+        self.assertContains(self.client.get(url), 'name="initial-stock" value="10"')
+
+        # A checkout takes 3 while the editor restocks 10 -> 15.
+        Product.objects.filter(pk=self.lamp.pk).update(stock=7)
+        ledger.record(self.lamp.pk, -3, ledger.SALE, reference="ORD-1")
+        data = {
+            "name": self.lamp.name, "slug": self.lamp.slug, "description": "Lamp", "price": "120",
+            "stock": "15", "initial-stock": "10", "stock_reason": ledger.RESTOCK, "sku": self.lamp.sku,
+            "is_active": "on", "category": Category.objects.create(name="Lighting").pk,
+        }
+        for prefix in ("images", "variations"):
+            data.update({f"{prefix}-TOTAL_FORMS": "0", f"{prefix}-INITIAL_FORMS": "0"})
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 12)
+        self.assertEqual(ledger.current_stock(self.lamp.pk), 12)
+        self.assertEqual(self.lamp.movements.first().delta, 5)
+
+    def test_staff_stock_edit_applies_on_top_of_concurrent_sales(self):
+        staff = User.objects.create_user(email="staff@example.com", password="pass12345", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("store:admin_product_update", args=[self.lamp.pk])
+        self.assertContains(self.client.get(url), 'name="initial-stock" value="10"')
+
+        Product.objects.filter(pk=self.lamp.pk).update(stock=7)
+        ledger.record(self.lamp.pk, -3, ledger.SALE, reference="ORD-1")
+        response = self.client.post(url, {
+            "name": self.lamp.name, "slug": self.lamp.slug, "description": "Lamp", "price": "120",
+            "stock": "15", "initial-stock": "10", "sku": self.lamp.sku, "is_active": "on",
+            "category": Category.objects.create(name="Lighting").pk,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 12)
+        self.assertEqual(ledger.current_stock(self.lamp.pk), 12)
+
+
+class FakeS3Client:
+    """Records put_object_acl calls and fails keys listed in ``errors`` first."""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.calls = []
+
+    def put_object_acl(self, Bucket, Key, ACL):
+        self.calls.append(Key)
+        codes = self.errors.get(Key)
+        if codes:
+            raise ClientError({"Error": {"Code": codes.pop(0)}}, "PutObjectAcl")
+
+
+class S3AclQueueTests(TestCase):
+    def _queue(self, client, **kwargs):
+        acl_queue = s3_acl.AclQueue(client_factory=lambda: client, retry_base=0.01, **kwargs)
+        self.addCleanup(acl_queue.shutdown, 1)
+        return acl_queue
+
+    def test_jobs_are_deduplicated_and_drained(self):
+        client = FakeS3Client()
+        acl_queue = self._queue(client, workers=2)
+        for key in ["media/a.jpg", "media/b.jpg", "media/a.jpg"]:
+            acl_queue.enqueue("bucket", key)
+
+        self.assertTrue(acl_queue.flush(timeout=5))
+        self.assertLessEqual(client.calls.count("media/a.jpg"), 2)
+        metrics = acl_queue.metrics()
+        self.assertEqual(metrics["succeeded"], metrics["enqueued"])
+        self.assertEqual(metrics["queue_depth"], 0)
+
+    def test_missing_object_is_retried_with_backoff(self):
+        client = FakeS3Client(errors={"media/late.jpg": ["NoSuchKey", "SlowDown"]})
+        acl_queue = self._queue(client, workers=1)
+        acl_queue.enqueue("bucket", "media/late.jpg")
+
+        self.assertTrue(acl_queue.flush(timeout=5))
+        self.assertEqual(client.calls, ["media/late.jpg"] * 3)
+        self.assertEqual(acl_queue.metrics()["retried"], 2)
+
+    def test_access_denied_is_not_retried(self):
+        client = FakeS3Client(errors={"media/locked.jpg": ["AccessDenied"]})
+        acl_queue = self._queue(client, workers=1)
+        with self.assertLogs("furniture_store.s3_acl", "ERROR"):
+            acl_queue.enqueue("bucket", "media/locked.jpg")
+            self.assertTrue(acl_queue.flush(timeout=5))
+        self.assertEqual(client.calls, ["media/locked.jpg"])
+        self.assertEqual(acl_queue.metrics()["failed"], 1)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        acl_queue = self._queue(FakeS3Client(), workers=0, maxsize=1)
+        self.assertTrue(acl_queue.enqueue("bucket", "media/one.jpg"))
+        with self.assertLogs("furniture_store.s3_acl", "WARNING"):
+            self.assertFalse(acl_queue.enqueue("bucket", "media/two.jpg"))
+        self.assertEqual(acl_queue.metrics()["dropped"], 1)
+
+
+def make_image_file(name="photo.png", size=(800, 600), mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, size, (120, 80, 40, 255) if mode == "RGBA" else (120, 80, 40)).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(IMAGE_DERIVATIVE_WORKERS=0, IMAGE_DERIVATIVE_FORMATS=["webp", "jpeg"])
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.product = Product.objects.create(name="Pine Desk", description="Desk", price=250)
+
+    def _create_image(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=make_image_file(**kwargs))
+        image.refresh_from_db()
+        return image
+
+    def test_upload_generates_widths_up_to_source(self):
+        image = self._create_image()
+
+        self.assertEqual(image.derivatives["source"], image.image.name)
+        self.assertEqual(sorted(image.derivatives["webp"], key=int), ["160", "320", "640", "800"])
+        jpeg = image.image.storage.open(image.derivatives["jpeg"]["320"])
+        with Image.open(jpeg) as rendered:
+            self.assertEqual((rendered.format, rendered.size), ("JPEG", (320, 240)))
+
+    def test_tag_falls_back_until_derivatives_exist(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            image = ProductImage.objects.create(product=self.product, image=make_image_file())
+        template = Template('{% load store_tags %}{% product_image image sizes="50vw" class="thumb" alt="Desk" %}')
+
+        html = template.render(Context({"image": image}))
+        self.assertTrue(html.startswith("<img "))
+        self.assertIn(f'src="{image.image.url}"', html)
+
+        derivatives.generate(image)
+        html = template.render(Context({"image": image}))
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn("-160w.webp 160w", html)
+        self.assertIn("-640w.jpg 640w", html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('class="thumb"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_replaced_file_resets_derivatives(self):
+        image = self._create_image()
+        image.image = make_image_file("wide.png", size=(2000, 500), mode="RGB")
+        with self.captureOnCommitCallbacks(execute=False):
+            image.save()
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, {})
+
+    def test_replaced_file_deletes_old_derivatives(self):
+        image = self._create_image()
+        old_names = derivatives.stored_names(image.derivatives)
+        image.image = make_image_file("wide.png", size=(2000, 500), mode="RGB")
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+
+        storage = image.image.storage
+        self.assertFalse(any(storage.exists(name) for name in old_names))
+        self.assertEqual(image.derivatives["source"], image.image.name)
+        self.assertTrue(all(storage.exists(name) for name in derivatives.stored_names(image.derivatives)))
+
+    def test_content_addressed_images_share_files_and_derivatives(self):
+        storages = {
+            "default": {"BACKEND": "furniture_store.storage.ContentAddressedFileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }
+        with override_settings(STORAGES=storages):
+            first = self._create_image(name="front.png")
+            other = Product.objects.create(name="Oak Desk", description="Desk", price=300)
+            with self.captureOnCommitCallbacks(execute=True):
+                second = ProductImage.objects.create(product=other, image=make_image_file(name="copy.png"))
+            second.refresh_from_db()
+
+            self.assertEqual(second.image.name, first.image.name)
+            self.assertEqual(second.derivatives, first.derivatives)
+            derivatives.generate(first)
+            for name in second.derivatives["webp"].values():
+                self.assertTrue(second.image.storage.exists(name))
+
+    def test_backfill_command(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            image = ProductImage.objects.create(product=self.product, image=make_image_file(size=(100, 80)))
+        out = StringIO()
+        call_command("generate_image_derivatives", workers=0, stdout=out)
+
+        image.refresh_from_db()
+        self.assertIn("Generated derivatives for 1 images (0 failed)", out.getvalue())
+        self.assertEqual(list(image.derivatives["webp"]), ["100"])
+
+
+class ImageMetadataTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.product = Product.objects.create(name="Wool Rug", description="Rug", price=180)
+
+    def test_upload_records_dimensions_color_and_placeholder(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            image = ProductImage.objects.create(
+                product=self.product, image=make_image_file(size=(640, 480), mode="RGB")
+            )
+        image.refresh_from_db()
+
+        self.assertEqual((image.width, image.height), (640, 480))
+        self.assertEqual(image.dominant_color, "#785028")
+        self.assertTrue(image.placeholder.startswith("data:image/"))
+
+        html = Template("{% load store_tags %}{% product_image image %}").render(Context({"image": image}))
+        self.assertIn('width="640"', html)
+        self.assertIn('height="480"', html)
+        self.assertIn("background: #785028 url(data:image/", html)
+
+    def test_backfill_reads_existing_files(self):
+        storage = ProductImage._meta.get_field("image").storage
+        name = storage.save("photos/products/rug.png", make_image_file(size=(300, 200)))
+        image = ProductImage.objects.create(product=self.product, image=name)
+        ProductImage.objects.create(product=self.product, image="photos/products/missing.png")
+        self.assertIsNone(image.width)
+
+        out, err = StringIO(), StringIO()
+        call_command("backfill_image_metadata", workers=2, stdout=out, stderr=err)
+
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (300, 200))
+        self.assertIn("Described 1 images (1 unreadable)", out.getvalue())
+        self.assertIn("missing.png", err.getvalue())
@@ -1,16 +1,28 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q, Avg, Count
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from .models import Product, Category, ProductImage
+from .conditional import catalog_validators, conditional_catalog_page, product_validators
 from .forms import ProductForm, ProductImageForm
+from .loaders import load_product_detail
+from .pagination import paginate
+from .search import search_products
+
+PRODUCT_SORT_ORDERINGS = {
+    "newest": ["-created_at", "-id"],
+    "price_low": ["price", "id"],
+    "price_high": ["-price", "-id"],
+    "name": ["name", "id"],
+    "rating": ["-rating_avg", "-rating_count", "-id"],
+}
 
 
 def home(request):
     """Home page view."""
-    featured_products = Product.objects.filter(is_featured=True, is_active=True)[:8]
-    latest_products = Product.objects.filter(is_active=True).order_by("-created_at")[:8]
+    featured_products = Product.objects.filter(is_featured=True, is_active=True).for_cards()[:8]
+    latest_products = Product.objects.filter(is_active=True).for_cards().order_by("-created_at")[:8]
     
     context = {
         "featured_products": featured_products,
@@ -19,23 +31,23 @@ def home(request):
     return render(request, "store/home.html", context)
 
 
+@conditional_catalog_page(catalog_validators)
 def shop(request):
     """Shop page with search and filtering."""
     products = Product.objects.filter(is_active=True)
 
-    search_query = request.GET.get("q", "")
+    search_query = request.GET.get("q", "").strip()
+    sort_by = request.GET.get("sort", "relevance" if search_query else "newest")
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(short_description__icontains=search_query)
+        products = search_products(
+            products, search_query, ranked=(sort_by == "relevance")
         )
 
     category_slug = request.GET.get("category", "")
     if category_slug:
         try:
             category = Category.objects.get(slug=category_slug, is_active=True)
-            products = products.filter(category=category)
+            products = products.in_category(category)
         except Category.DoesNotExist:
             pass
 
@@ -58,23 +70,12 @@ def shop(request):
     elif in_stock == "false":
         products = products.filter(stock=0)
 
-    sort_by = request.GET.get("sort", "newest")
-    if sort_by == "price_low":
-        products = products.order_by("price")
-    elif sort_by == "price_high":
-        products = products.order_by("-price")
-    elif sort_by == "name":
-        products = products.order_by("name")
-    elif sort_by == "rating":
-        products = products.annotate(
-            avg_rating=Avg("reviews__rating")
-        ).order_by("-avg_rating")
+    if sort_by == "relevance" and search_query:
+        ordering = ["-search_rank", "-id"]
     else:
-        products = products.order_by("-created_at")
+        ordering = PRODUCT_SORT_ORDERINGS.get(sort_by, PRODUCT_SORT_ORDERINGS["newest"])
 
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, products.for_cards(), ordering, 12)
 
     categories = Category.objects.filter(is_active=True, parent=None)
 
@@ -92,52 +93,22 @@ def shop(request):
     return render(request, "store/shop.html", context)
 
 
+@conditional_catalog_page(product_validators)
 def product_detail(request, slug):
     """Product detail page."""
-    product = get_object_or_404(Product, slug=slug, is_active=True)
-    images = product.images.all()
-    variations = product.variations.filter(is_active=True)
-
-    reviews = product.reviews.filter(is_approved=True).order_by("-created_at")[:10]
-    average_rating = product.get_average_rating()
-    review_count = product.get_review_count()
-
-    can_review = False
-    user_review = None
-    if request.user.is_authenticated:
-        user_review = product.reviews.filter(user=request.user).first()
-        can_review = not user_review or not user_review.is_approved
-
-    related_products = Product.objects.filter(
-        category=product.category,
-        is_active=True
-    ).exclude(id=product.id)[:4]
-
-    context = {
-        "product": product,
-        "images": images,
-        "variations": variations,
-        "reviews": reviews,
-        "average_rating": average_rating,
-        "review_count": review_count,
-        "can_review": can_review,
-        "user_review": user_review,
-        "related_products": related_products,
-    }
-    
+    context = load_product_detail(slug, request.user)
     return render(request, "store/product_detail.html", context)
 
 
+@conditional_catalog_page(catalog_validators)
 def category_view(request, slug):
     """Category page view."""
     category = get_object_or_404(Category, slug=slug, is_active=True)
-    products = Product.objects.filter(category=category, is_active=True)
+    products = Product.objects.filter(is_active=True).in_category(category).for_cards()
 
     subcategories = category.children.filter(is_active=True)
 
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, products, PRODUCT_SORT_ORDERINGS["newest"], 12)
 
     context = {
         "category": category,
@@ -213,9 +184,7 @@ def admin_product_list(request):
     elif status_filter == 'inactive':
         products = products.filter(is_active=False)
 
-    paginator = Paginator(products, 20)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, products.select_related('category'), ['-created_at', '-id'], 20)
 
     context = {
         'products': page_obj,
@@ -264,7 +233,9 @@ def admin_product_update(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            product = form.save()
+            with transaction.atomic():
+                form.apply_stock_delta(product)
+                product = form.save()
             messages.success(request, f'Product "{product.name}" updated successfully!')
             return redirect('store:admin_product_list')
     else: